@@ -1,17 +1,19 @@
 # app.py — Nexus Load Balancer (Enhanced Dark Theme)
 
 import streamlit as st
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
+import os
 import time
-from collections import deque
-from datetime import datetime
-import random
 import base64
 
-# ======================= PROBE =======================
-from probe import probe_server
+# ======================= COLLECTOR =======================
+from collector import Collector, DEFAULT_RETENTION_MIN
+from probe_engine import DEFAULT_DEADLINE
+from nexus_client import RemoteCollector, DEFAULT_URL as NEXUS_DEFAULT_URL
+from charts import ChartCache
+from policies import POLICIES, DEFAULT_POLICY
+from probe_scheduler import DEFAULT_MAX_INTERVAL
+from profiling import StageTimer, breakdown
 
 # ======================= PAGE CONFIG =======================
 st.set_page_config(
@@ -77,32 +79,32 @@ st.markdown("""
 
 
 # ======================= DEFAULT SERVERS =======================
+SNAPSHOT_POLL_INTERVAL = 0.25
+
 DEFAULT_SERVERS = [
     "https://www.google.com",
     "https://www.github.com",
     "https://www.wikipedia.org"
 ]
 
-if "SERVERS" not in st.session_state:
-    st.session_state.SERVERS = DEFAULT_SERVERS.copy()
+# A running nexus daemon (python nexus.py) owns the probe loop when there is one;
+# otherwise the dashboard runs the same collector in-process.
+NEXUS_URL = os.environ.get("NEXUS_URL", NEXUS_DEFAULT_URL)
 
-# ======================= SCORING FUNCTION =======================
-def compute_score(pred_rtt, pred_load, pred_health, error_rate, pred_bandwidth,
-                  alpha=1.0, beta=0.5, gamma=0.3, delta=0.2, epsilon=0.4):
+@st.cache_resource
+def get_collector():
+    """The nexus daemon's API, or one in-process collector shared by every browser session."""
+    return RemoteCollector.connect(NEXUS_URL) or Collector(DEFAULT_SERVERS)
 
-    if pred_rtt is None:
-        return float("inf")
+collector = get_collector()
 
-    health_penalty = (100 - pred_health) / 100.0
-    bandwidth_penalty = (1000 - pred_bandwidth) / 1000.0 if pred_bandwidth else 1.0
+@st.cache_resource
+def get_render_timer():
+    """How long this dashboard takes to redraw a round (all sessions)."""
+    return StageTimer()
 
-    return (
-        alpha * pred_rtt +
-        beta * (pred_load / 100.0) +
-        gamma * health_penalty +
-        delta * error_rate +
-        epsilon * bandwidth_penalty
-    )
+if "SERVERS" not in st.session_state:
+    st.session_state.SERVERS = list(collector.targets)
 
 # ======================= THEME (FIXED TO DARK) =======================
 st.session_state.theme = "dark"
@@ -452,6 +454,10 @@ with st.sidebar:
         </p>
     </div>
     """, unsafe_allow_html=True)
+    if isinstance(collector, RemoteCollector):
+        st.caption(f"🛰️ Connected to nexus daemon at {collector.url}")
+    else:
+        st.caption("🧩 Embedded collector (start `python nexus.py` to run headless)")
 
     st.markdown("---")
 
@@ -477,30 +483,7 @@ with st.sidebar:
             st.warning("Please enter at least one server")
         else:
             st.session_state.SERVERS = parsed
-
-            st.session_state.monitoring_data = {
-                "plot_time": [],
-                "plot_data": {
-                    s: {
-                        "rtt": [],
-                        "load": [],
-                        "health": [],
-                        "errors": [],
-                        "bandwidth": [],
-                        "chosen": []
-                    } for s in parsed
-                },
-                "rtt_history": {s: deque(maxlen=10) for s in parsed},
-                "load_history": {s: deque(maxlen=10) for s in parsed},
-                "health_history": {s: deque(maxlen=10) for s in parsed},
-                "error_history": {s: deque(maxlen=10) for s in parsed},
-                "bandwidth_history": {s: deque(maxlen=10) for s in parsed},
-                "selection_count": {s: 0 for s in parsed},
-            }
-
-            st.session_state.current_round = 0
-            st.session_state.prev_best = None
-            st.session_state.monitoring_active = False
+            collector.configure(servers=parsed)
 
             st.success("✅ Server list updated")
             st.rerun()
@@ -511,6 +494,15 @@ with st.sidebar:
     st.markdown("### ⏱ Monitoring Settings")
     st.session_state.rounds = st.slider("Rounds", 5, 100, st.session_state.get("rounds", 20))
     st.session_state.interval = st.slider("Interval (seconds)", 0.5, 5.0, st.session_state.get("interval", 1.0), 0.5)
+    st.session_state.deadline = st.slider("Round deadline (seconds)", 0.5, 5.0, st.session_state.get("deadline", DEFAULT_DEADLINE), 0.5)
+    st.session_state.retention = st.slider("History retention (minutes)", 5, 1440, st.session_state.get("retention", DEFAULT_RETENTION_MIN), 5,
+                                           help="Older rounds are overwritten")
+    st.session_state.max_probe_interval = st.slider("Max probe interval (seconds)", 0.5, 120.0,
+                                                    st.session_state.get("max_probe_interval", DEFAULT_MAX_INTERVAL), 0.5,
+                                                    help="Stable or clearly losing servers are probed this rarely; set to Interval to probe every server every round")
+    st.session_state.probe_budget = st.number_input("Probe budget (probes/s, 0 = unlimited)", 0.0, 1000.0,
+                                                    st.session_state.get("probe_budget", 0.0), 1.0)
+    st.caption("Settings apply on the next START and are shared by every viewer.")
 
     st.markdown("---")
 
@@ -526,12 +518,17 @@ with st.sidebar:
 
     # -------- BANDIT SETTINGS --------
     st.markdown("### 🎲 Selection Strategy")
+    policy_names = list(POLICIES)
+    st.session_state.policy = st.selectbox("Policy", policy_names,
+                                           index=policy_names.index(st.session_state.get("policy", DEFAULT_POLICY)),
+                                           help="ε and anti-stickiness apply to epsilon-greedy only")
     st.session_state.eps = st.slider("Exploration ε", 0.0, 0.6, st.session_state.get("eps", 0.2), 0.05)
     st.session_state.anti_stick = st.slider("Anti-stickiness", 0.0, 0.2, st.session_state.get("anti_stick", 0.03), 0.01)
 
     st.markdown("---")
 
     if st.button("🔄 RESET SESSION", use_container_width=True):
+        collector.reset()
         for k in list(st.session_state.keys()):
             if k not in ("theme",):
                 del st.session_state[k]
@@ -542,45 +539,17 @@ with st.sidebar:
 # ======================= EXTRACT VALUES FROM SESSION STATE =======================
 rounds = st.session_state.get("rounds", 20)
 interval = st.session_state.get("interval", 1.0)
+deadline = st.session_state.get("deadline", DEFAULT_DEADLINE)
 alpha = st.session_state.get("alpha", 1.0)
 beta = st.session_state.get("beta", 0.5)
 gamma = st.session_state.get("gamma", 0.3)
 delta = st.session_state.get("delta", 0.2)
 eps = st.session_state.get("eps", 0.2)
 anti_stick = st.session_state.get("anti_stick", 0.03)
-
-# ======================= SESSION STATE =======================
-if "monitoring_data" not in st.session_state:
-    st.session_state.monitoring_data = {
-        "plot_time": [],
-        "plot_data": {
-            p: {
-                "rtt": [],
-                "load": [],
-                "health": [],
-                "errors": [],
-                "bandwidth": [],
-                "chosen": []
-            } for p in st.session_state.SERVERS
-        },
-        "rtt_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "load_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "health_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "error_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "bandwidth_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "selection_count": {p: 0 for p in st.session_state.SERVERS},
-        "session_start": None,
-        "session_end": None
-    }
-
-if "monitoring_active" not in st.session_state:
-    st.session_state.monitoring_active = False
-
-if "current_round" not in st.session_state:
-    st.session_state.current_round = 0
-
-if "prev_best" not in st.session_state:
-    st.session_state.prev_best = None
+policy = st.session_state.get("policy", DEFAULT_POLICY)
+retention = st.session_state.get("retention", DEFAULT_RETENTION_MIN)
+max_probe_interval = st.session_state.get("max_probe_interval", DEFAULT_MAX_INTERVAL)
+probe_budget = st.session_state.get("probe_budget", 0.0) or None
 
 # ======================= HEADER =======================
 st.markdown(f"""
@@ -615,121 +584,43 @@ chart_container = st.container()
 st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
 
 analytics_expander = st.expander("📊 Detailed Analytics", expanded=False)
+timing_expander = st.expander("⏱️ Round Timing", expanded=False)
 
 
 # ======================= BUTTON HANDLERS =======================
 if stop_btn:
-    st.session_state.monitoring_active = False
+    collector.stop()
 
 if start_btn:
-    st.session_state.monitoring_active = True
-    st.session_state.current_round = 0
-    st.session_state.prev_best = None
-
-    st.session_state.monitoring_data = {
-        "plot_time": [],
-        "plot_data": {
-            p: {
-                "rtt": [],
-                "load": [],
-                "health": [],
-                "errors": [],
-                "bandwidth": [],
-                "chosen": []
-            } for p in st.session_state.SERVERS
-        },
-        "rtt_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "load_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "health_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "error_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "bandwidth_history": {p: deque(maxlen=10) for p in st.session_state.SERVERS},
-        "selection_count": {p: 0 for p in st.session_state.SERVERS},
-        "session_start": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "session_end": None
-    }
-
-# ======================= BANDIT SELECTION =======================
-def bandit_select(score_map, prev_best, epsilon, anti_stick):
-    adjusted = {}
-    for s, v in score_map.items():
-        penalty = anti_stick if prev_best and s == prev_best else 0.0
-        adjusted[s] = v + penalty
-
-    if random.random() < epsilon:
-        scores = np.array(list(adjusted.values()), dtype=float)
-        inv = 1.0 / np.clip(scores, 1e-6, None)
-        prob = inv / inv.sum()
-        return np.random.choice(list(adjusted.keys()), p=prob)
-
-    return min(adjusted, key=lambda k: adjusted[k])
-
-# ======================= MONITOR ONE ROUND =======================
-def monitor_round(round_idx, alpha, beta, gamma, delta, epsilon, anti_stick):
-    data = st.session_state.monitoring_data
-    results = {}
-
-    for server in st.session_state.SERVERS:
-        results[server] = probe_server(server)
-
-    for server, m in results.items():
-        data["rtt_history"][server].append(m["rtt"])
-        data["load_history"][server].append(m["load"])
-        data["health_history"][server].append(m["health_score"])
-
-        handled = m.get("total_handled")
-        errors = m.get("total_errors")
-
-        handled = handled if isinstance(handled, (int, float)) and handled > 0 else 1
-        errors = errors if isinstance(errors, (int, float)) else 0
-
-        err_rate = errors / handled
-        data["error_history"][server].append(err_rate)
-        data["bandwidth_history"][server].append(m["bandwidth_mbps"])
-
-    scores = {}
-    for server in st.session_state.SERVERS:
-        rtt_vals = [v for v in data["rtt_history"][server] if v is not None]
-        pred_rtt = np.mean(rtt_vals) if rtt_vals else 10.0
-
-        scores[server] = compute_score(
-            pred_rtt,
-            np.mean(data["load_history"][server]),
-            np.mean(data["health_history"][server]),
-            np.mean(data["error_history"][server]),
-            np.mean(data["bandwidth_history"][server]),
-            alpha, beta, gamma, delta, epsilon
-        )
-
-    prev = st.session_state.prev_best
-    best = bandit_select(scores, prev, epsilon, anti_stick)
-
-    if prev and best != prev:
-        st.info(f"🔁 Switched server: {prev} → {best}")
-
-    st.session_state.prev_best = best
-    data["selection_count"][best] += 1
-    data["plot_time"].append(round_idx)
-
-    for server in st.session_state.SERVERS:
-        data["plot_data"][server]["rtt"].append(data["rtt_history"][server][-1])
-        data["plot_data"][server]["load"].append(data["load_history"][server][-1])
-        data["plot_data"][server]["health"].append(data["health_history"][server][-1])
-        data["plot_data"][server]["errors"].append(data["error_history"][server][-1] * 100)
-        data["plot_data"][server]["bandwidth"].append(data["bandwidth_history"][server][-1])
-        data["plot_data"][server]["chosen"].append(1 if server == best else 0)
-
-    return best
+    collector.configure(
+        servers=st.session_state.SERVERS,
+        rounds=rounds,
+        interval=interval,
+        deadline=deadline,
+        retention=retention,
+        max_probe_interval=max_probe_interval,
+        probe_budget=probe_budget,
+        weights=dict(alpha=alpha, beta=beta, gamma=gamma, delta=delta),
+        policy=policy,
+        eps=eps,
+        anti_stick=anti_stick
+    )
+    collector.start()
 
 # ======================= METRIC CARDS =======================
-def render_metrics():
-    data = st.session_state.monitoring_data
-    cols = st.columns(len(st.session_state.SERVERS))
+def render_metrics(snap):
+    servers = snap["servers"]
+    latest = snap["latest"]
+    cols = st.columns(len(servers))
 
-    for i, server in enumerate(st.session_state.SERVERS):
+    for i, server in enumerate(servers):
         with cols[i]:
-            online = len(data["rtt_history"][server]) > 0
+            online = snap["round"] > 0
+            breaker = snap["breakers"][server]
             badge = "badge-online" if online else "badge-waiting"
             status = "ONLINE" if online else "WAITING"
+            if breaker["state"] != "closed":
+                badge, status = "badge-waiting", "EJECTED" if breaker["state"] == "open" else "HALF-OPEN"
 
             st.markdown(f"""
             <div class="custom-card">
@@ -741,48 +632,91 @@ def render_metrics():
             """, unsafe_allow_html=True)
 
             if online:
-                raw_rtt = data["rtt_history"][server][-1]
-                rtt = f"{raw_rtt * 1000:.1f} ms" if raw_rtt is not None else "N/A"
-                load = data["load_history"][server][-1]
-                health = data["health_history"][server][-1]
-                raw_bw = data["bandwidth_history"][server][-1]
-                bw = f"{raw_bw:.0f} Mbps" if raw_bw is not None else "N/A"
-                raw_err = data["error_history"][server][-1]
-                xerr = f"{raw_err * 100:.2f} %" if raw_err is not None else "N/A"
+                raw_rtt = latest["rtt"][i]
+                rtt = f"{raw_rtt * 1000:.1f} ms" if not np.isnan(raw_rtt) else "N/A"
+                load = latest["load"][i]
+                health = latest["health"][i]
+                raw_bw = latest["bandwidth"][i]
+                bw = f"{raw_bw:.0f} Mbps" if not np.isnan(raw_bw) else "N/A"
+                raw_err = latest["errors"][i]
+                xerr = f"{raw_err * 100:.2f} %" if not np.isnan(raw_err) else "N/A"
+                period = snap["probe_period"].get(server)
                 st.metric("⚡ RTT", rtt)
-                st.metric("💻 Load", f"{load:.0f} %")
-                st.metric("💚 Health", f"{health:.0f}/100")
+                st.metric("💻 Load", f"{load:.0f} %" if not np.isnan(load) else "N/A")
+                st.metric("💚 Health", f"{health:.0f}/100" if not np.isnan(health) else "N/A")
                 st.metric("📡 Bandwidth", bw)
                 st.metric("⚠️ Errors", xerr)
+                st.caption(f"🔭 Probed every {period:.1f}s" if period is not None else "🔭 Not probed")
+                if breaker["reason"]:
+                    st.caption(f"⛔ {breaker['reason']}")
+                timing = snap["timing"][server]
+                if "ttfb" in timing:
+                    stages = [f"{name} {timing[key] * 1000:.1f}" for name, key in
+                              (("DNS", "dns"), ("TCP", "connect"), ("TLS", "tls"), ("TTFB", "ttfb"))
+                              if timing.get(key) is not None]
+                    st.caption(f"⏲️ {' · '.join(stages)} ms" + (" (reused)" if timing.get("reused") else ""))
+                if snap["simulated"][server]:
+                    # An agent reports host load and bandwidth, never the edge server's own counters
+                    source = ("not reported by the metrics agent" if snap.get("agent", {}).get(server)
+                              else "no metrics agent")
+                    st.caption(f"🧪 Simulated: {', '.join(snap['simulated'][server])} ({source})")
             else:
                 st.info("Awaiting data...")
 
-# ======================= LIVE MONITORING =======================
-info_placeholder = st.empty()
-
-if st.session_state.monitoring_active:
-    progress = st.progress(st.session_state.current_round / rounds)
-
-    for r in range(st.session_state.current_round, rounds):
-        if not st.session_state.monitoring_active:
-            st.warning("Monitoring stopped")
-            break
+# ======================= ROUND TIMING =======================
+def render_timing(snap):
+    stats = snap["stats"]
+    render_timer = get_render_timer()
+    stages = {**stats["stages"], **render_timer.state()}
+    last = {**stats["stage_last"], **render_timer.last}
+    if not stages:
+        st.info("Awaiting data...")
+        return
 
-        try:
-            best = monitor_round(r, alpha, beta, gamma, delta, eps, anti_stick)
+    rows = [{
+        "Stage": row["stage"],
+        "Last (ms)": row["last"] * 1000,
+        "Mean (ms)": row["mean"] * 1000,
+        "p50 (ms)": row["p50"] * 1000,
+        "p95 (ms)": row["p95"] * 1000,
+        "Share": row["share"] * 100,
+    } for row in breakdown(stages, last)]
+    st.dataframe(rows, hide_index=True, use_container_width=True, column_config={
+        "Share": st.column_config.ProgressColumn("Share of round", format="%.1f %%", min_value=0, max_value=100),
+        **{col: st.column_config.NumberColumn(format="%.3f")
+           for col in ("Last (ms)", "Mean (ms)", "p50 (ms)", "p95 (ms)")},
+    })
+    st.caption("probe → select run in the collector each round; render is this dashboard redrawing it. "
+               "Percentiles are estimated from histogram buckets.")
 
-            prev = st.session_state.prev_best
+# ======================= LIVE MONITORING =======================
+# The collector probes in the background; this loop only reads its snapshots,
+# so reruns and extra viewers never restart or duplicate probing.
+info_placeholder = st.empty()
+metrics_placeholder = analytics_expander.empty()
+timing_placeholder = timing_expander.empty()
+snap = collector.snapshot()
+
+if snap["running"]:
+    continuous = snap["rounds"] is None
+    round_of = " (continuous)" if continuous else f" of {snap['rounds']}"
+    progress = None if continuous else st.progress(min(1.0, snap["round"] / snap["rounds"]))
+    seen_round = None
+
+    while snap["running"]:
+        if snap["round"] != seen_round and snap["round"] > 0:
+            seen_round = snap["round"]
+            mark = get_render_timer().start()
+            best = snap["best"]
+            prev = snap["prev_best"]
             if prev is not None and prev != best:
                 st.toast(f"🔁 Switched to {best}", icon="🔄")
 
-            st.session_state.prev_best = best
-            st.session_state.current_round = r + 1
-
             info_placeholder.markdown(f"""
             <div class="custom-card glow-effect" style="text-align:center">
                 <h2 style="margin-bottom:0.75rem;">🔄 Monitoring in Progress</h2>
                 <p style="color: var(--text-secondary); margin-bottom:1rem;">
-                    Round {st.session_state.current_round} of {rounds}
+                    Round {snap["round"]}{round_of}
                 </p>
                 <div style="margin-top:1.5rem; padding:1.25rem; background: rgba(59, 130, 246, 0.1); border-radius:12px; border: 1px solid rgba(59, 130, 246, 0.2);">
                     <p style="font-size:0.875rem; color: var(--text-secondary); margin-bottom:0.5rem; font-weight:600; letter-spacing:0.05em; text-transform:uppercase;">
@@ -795,47 +729,54 @@ if st.session_state.monitoring_active:
             </div>
             """, unsafe_allow_html=True)
 
-            progress.progress(st.session_state.current_round / rounds)
-
-            with analytics_expander:
-                render_metrics()
+            if progress is not None:
+                progress.progress(min(1.0, snap["round"] / snap["rounds"]))
 
-            if r < rounds - 1:
-                time.sleep(interval)
+            with metrics_placeholder.container():
+                render_metrics(snap)
+            get_render_timer().lap("render", mark)
+            with timing_placeholder.container():
+                render_timing(snap)
 
-        except Exception as e:
-            st.error(f"Monitoring error: {e}")
-            break
+        time.sleep(SNAPSHOT_POLL_INTERVAL)
+        snap = collector.snapshot()
 
     info_placeholder.empty()
 
-    if st.session_state.current_round >= rounds:
-        st.session_state.monitoring_active = False
-        st.session_state.monitoring_data["session_end"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
+if snap["error"]:
+    st.error(f"Monitoring error: {snap['error']}")
+elif not snap["running"] and snap["round"] > 0:
+    with metrics_placeholder.container():
+        render_metrics(snap)
+    with timing_placeholder.container():
+        render_timing(snap)
+
+if snap["session_end"] and snap["rounds"] is not None and snap["round"] >= snap["rounds"]:
+    if st.session_state.get("celebrated") != snap["session_start"]:
+        st.session_state.celebrated = snap["session_start"]
         st.balloons()
 
-        counts = st.session_state.monitoring_data["selection_count"]
-        best_overall = max(counts, key=lambda k: counts[k])
+    counts = snap["selection_count"]
+    best_overall = max(counts, key=lambda k: counts[k])
 
-        st.markdown(f"""
-        <div class="custom-card" style="text-align:center">
-            <h2 style="margin-bottom:1rem;">🏆 Monitoring Complete</h2>
-            <div style="padding:1.5rem; background: rgba(16, 185, 129, 0.1); border-radius:12px; border: 1px solid rgba(16, 185, 129, 0.2);">
-                <p style="font-size:0.875rem; color: var(--text-secondary); margin-bottom:0.75rem; font-weight:600;">
-                    OPTIMAL SERVER
-                </p>
-                <p style="word-break:break-all; font-size:1.25rem; font-weight:600; color:#10b981; margin-bottom:0.5rem; font-family: 'JetBrains Mono', monospace;">
-                    {best_overall}
-                </p>
-                <p style="color: var(--text-secondary); font-size:0.875rem;">
-                    Selected {counts[best_overall]} times out of {rounds} rounds
-                </p>
-            </div>
+    st.markdown(f"""
+    <div class="custom-card" style="text-align:center">
+        <h2 style="margin-bottom:1rem;">🏆 Monitoring Complete</h2>
+        <div style="padding:1.5rem; background: rgba(16, 185, 129, 0.1); border-radius:12px; border: 1px solid rgba(16, 185, 129, 0.2);">
+            <p style="font-size:0.875rem; color: var(--text-secondary); margin-bottom:0.75rem; font-weight:600;">
+                OPTIMAL SERVER
+            </p>
+            <p style="word-break:break-all; font-size:1.25rem; font-weight:600; color:#10b981; margin-bottom:0.5rem; font-family: 'JetBrains Mono', monospace;">
+                {best_overall}
+            </p>
+            <p style="color: var(--text-secondary); font-size:0.875rem;">
+                Selected {counts[best_overall]} times out of {snap["rounds"]} rounds
+            </p>
         </div>
-        """, unsafe_allow_html=True)
+    </div>
+    """, unsafe_allow_html=True)
 
-else:
+elif not snap["running"] and snap["round"] == 0:
     with info_container:
         st.markdown("""
         <div class="custom-card" style="text-align:center; padding:2.5rem;">
@@ -848,146 +789,17 @@ else:
         """, unsafe_allow_html=True)
 
 # ======================= PLOTLY DASHBOARD =======================
-def render_charts(best_server=None):
-    data = st.session_state.monitoring_data
-    if not data["plot_time"]:
-        return
-
-    fig = make_subplots(
-        rows=3, cols=2,
-        subplot_titles=[
-            "⚡ RTT (ms)",
-            "💻 Load (%)",
-            "💚 Health Score",
-            "⚠️ Error Rate (%)",
-            "📡 Bandwidth (Mbps)",
-            "🎯 Selection History"
-        ],
-        vertical_spacing=0.12,
-        horizontal_spacing=0.10
-    )
-
-    colors = ["#3b82f6", "#8b5cf6", "#10b981", "#f59e0b", "#06b6d4"]
-
-    for idx, server in enumerate(st.session_state.SERVERS):
-        color = colors[idx % len(colors)]
-        width = 3 if server == best_server else 2
-        opacity = 1.0 if server == best_server else 0.6
-
-        t = data["plot_time"]
-
-        fig.add_trace(
-            go.Scatter(
-                x=t,
-                y=[(v * 1000) if v is not None else None for v in data["plot_data"][server]["rtt"]],
-                name=server,
-                line=dict(color=color, width=width),
-                opacity=opacity,
-                mode='lines+markers',
-                marker=dict(size=4)
-            ),
-            row=1, col=1
-        )
-
-        fig.add_trace(
-            go.Scatter(
-                x=t,
-                y=data["plot_data"][server]["load"],
-                showlegend=False,
-                line=dict(color=color, width=width),
-                opacity=opacity,
-                mode='lines+markers',
-                marker=dict(size=4)
-            ),
-            row=1, col=2
-        )
-
-        fig.add_trace(
-            go.Scatter(
-                x=t,
-                y=data["plot_data"][server]["health"],
-                showlegend=False,
-                line=dict(color=color, width=width),
-                opacity=opacity,
-                mode='lines+markers',
-                marker=dict(size=4)
-            ),
-            row=2, col=1
-        )
+@st.cache_resource
+def get_chart_cache():
+    """Incremental, downsampled chart state shared by every browser session."""
+    return ChartCache()
 
-        fig.add_trace(
-            go.Scatter(
-                x=t,
-                y=data["plot_data"][server]["errors"],
-                showlegend=False,
-                line=dict(color=color, width=width),
-                opacity=opacity,
-                mode='lines+markers',
-                marker=dict(size=4)
-            ),
-            row=2, col=2
-        )
-
-        fig.add_trace(
-            go.Scatter(
-                x=t,
-                y=data["plot_data"][server]["bandwidth"],
-                showlegend=False,
-                line=dict(color=color, width=width),
-                opacity=opacity,
-                mode='lines+markers',
-                marker=dict(size=4)
-            ),
-            row=3, col=1
-        )
-
-        fig.add_trace(
-            go.Scatter(
-                x=t,
-                y=np.cumsum(data["plot_data"][server]["chosen"]),
-                showlegend=False,
-                fill="tozeroy",
-                line=dict(color=color, width=width),
-                opacity=opacity,
-                mode='lines'
-            ),
-            row=3, col=2
-        )
-
-    fig.update_layout(
-        height=900,
-        template="plotly_dark",
-        hovermode="x unified",
-        margin=dict(t=100, l=60, r=60, b=60),
-        font=dict(size=11, family='Space Grotesk, sans-serif'),
-        paper_bgcolor='rgba(10,15,30,0.8)',
-        plot_bgcolor='rgba(20,27,45,0.4)',
-        legend=dict(
-            font=dict(size=10),
-            bgcolor='rgba(20,27,45,0.8)',
-            bordercolor='rgba(59,130,246,0.3)',
-            borderwidth=1
-        )
-    )
-
-    for annotation in fig['layout']['annotations']:
-        annotation['font'] = dict(size=13, weight='bold', family='Space Grotesk')
-        annotation['yshift'] = 5
-
-    fig.update_xaxes(
-        gridcolor='rgba(59,130,246,0.1)',
-        zerolinecolor='rgba(59,130,246,0.2)'
-    )
-    fig.update_yaxes(
-        gridcolor='rgba(59,130,246,0.1)',
-        zerolinecolor='rgba(59,130,246,0.2)'
-    )
-
-    st.plotly_chart(fig, use_container_width=True)
+def render_charts(best_server=None):
+    st.plotly_chart(get_chart_cache().figure(collector, best_server), use_container_width=True)
 
 # ======================= CHART RENDER =======================
 with chart_container:
-    if st.session_state.monitoring_data["plot_time"]:
-        counts = st.session_state.monitoring_data["selection_count"]
+    if snap["round"] > 0:
+        counts = snap["selection_count"]
         best = max(counts, key=lambda k: counts[k]) if counts else None
         render_charts(best)
@@ -0,0 +1,295 @@
+# benchmarks/bench_fleet.py
+# End-to-end selector benchmark against a simulated fleet of edge servers
+#
+# Usage: python -m benchmarks.bench_fleet [--fleet-sizes 3 10 30] [--rates 2 10]
+#                                         [--rounds 30] [--output bench_fleet.json]
+#
+# For every (fleet size, round rate) pair, starts that many edge_server.py
+# subprocesses (async mode), each with a fixed extra latency drawn from
+# --seed, and runs a Collector session against them. The collector probes
+# with the framed edge-server ping (as client.py does) rather than a bare
+# TCP connect, so its RTT includes the simulated latency and its load is
+# the server's own. Reported per run:
+#   decision latency  the collector's predict / score / select stages
+#   probe throughput  probes and failures per second, achieved round rate
+#   backends          CPU seconds and RSS of every edge server (from /proc)
+#   regret            expected latency of each round's pick minus the best
+#                     backend's, under edge_server's latency model and the
+#                     load each backend last reported (what the selector saw)
+# Everything, plus the commit and machine, goes to one JSON file so runs
+# can be compared across commits.
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from collector import Collector
+from edge_server import BASE_LATENCY_MIN, BASE_LATENCY_MAX, LOAD_TO_LATENCY_FACTOR
+from policies import POLICIES, DEFAULT_POLICY
+from probe import timeout_metrics
+from probe_engine import ProbeEngine, DEFAULT_DEADLINE
+from profiling import breakdown
+from protocol import PING_BINARY, ConnectionPool, ProtocolError, request, parse_metrics
+
+HOST = "127.0.0.1"
+EDGE_SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "edge_server.py")
+STARTUP_TIMEOUT = 10.0
+DECISION_STAGES = ("predict", "score", "select")
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def wait_listening(port, timeout=STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"edge server on port {port} did not start")
+
+
+def process_usage(pid):
+    """(CPU seconds, RSS in MB) of a process, from /proc; None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised command name; utime and stime are 14 and 15
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / CLK_TCK
+        with open(f"/proc/{pid}/status") as f:
+            rss = next((int(line.split()[1]) / 1024 for line in f if line.startswith("VmRSS:")), None)
+    except (OSError, IndexError, ValueError):
+        return None, None
+    return cpu, rss
+
+
+class EdgePing:
+    """
+    Probe function for the fleet: a framed ping over a pooled keep-alive
+    connection, timed like client.ping_once. Returns the edge server's
+    own metrics plus 'rtt', or timeout_metrics() on failure.
+    """
+
+    def __init__(self, timeout):
+        self.pool = ConnectionPool(timeout=timeout)
+
+    def __call__(self, target):
+        host, port = target.rsplit(":", 1)
+        addr = (host, int(port))
+        s = None
+        try:
+            s, _ = self.pool.acquire(addr)
+            start = time.perf_counter()
+            data = request(s, PING_BINARY)
+            rtt = time.perf_counter() - start
+            self.pool.release(addr, s)
+            metrics = parse_metrics(data)
+        except (OSError, ProtocolError, ValueError):
+            if s is not None:
+                self.pool.discard(s)
+            return timeout_metrics(target)
+        metrics["rtt"] = rtt
+        metrics["simulated"] = []
+        return metrics
+
+
+class Fleet:
+    """n edge_server.py subprocesses with the given latency offsets (seconds)."""
+
+    def __init__(self, offsets, seed):
+        self.offsets = list(offsets)
+        self.ports = [free_port() for _ in offsets]
+        self.procs = [subprocess.Popen(
+            [sys.executable, EDGE_SERVER, str(port), "--mode", "async",
+             "--latency-offset", str(offset), "--seed", str(seed + i)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for i, (port, offset) in enumerate(zip(self.ports, offsets))]
+        try:
+            for port in self.ports:
+                wait_listening(port)
+        except RuntimeError:
+            self.stop()
+            raise
+        self.servers = [f"{HOST}:{port}" for port in self.ports]
+
+    def usage(self):
+        return [process_usage(p.pid) for p in self.procs]
+
+    def stop(self):
+        for p in self.procs:
+            p.terminate()
+        for p in self.procs:
+            p.wait()
+
+
+def regret(offsets, load, chosen):
+    """
+    Per-round expected-latency regret of the picks (servers x rounds
+    matrices from the collector's history); rounds without a pick or
+    without a load reading for the pick are skipped.
+    """
+    base = (BASE_LATENCY_MIN + BASE_LATENCY_MAX) / 2
+    expected = base + np.asarray(offsets)[:, None] + LOAD_TO_LATENCY_FACTOR * load
+    picked = np.nan_to_num(chosen, nan=0.0) > 0.5
+    valid = picked.any(axis=0) & ~np.isnan(np.where(picked, expected, 0.0)).any(axis=0)
+    pick = picked.argmax(axis=0)[valid]
+    expected = expected[:, valid]
+    cols = np.arange(expected.shape[1])
+    best = np.nanmin(expected, axis=0)
+    per_round = expected[pick, cols] - best
+    return {
+        "rounds": int(valid.sum()),
+        "mean_ms": round(float(per_round.mean() * 1e3), 3) if len(per_round) else None,
+        "cumulative_ms": round(float(per_round.sum() * 1e3), 3),
+        "optimal_pick_rate": round(float((pick == np.nanargmin(expected, axis=0)).mean()), 4)
+                             if len(per_round) else None,
+    }
+
+
+def run(n, rate, args, rng):
+    offsets = np.round(rng.uniform(0.0, args.max_offset, n), 4).tolist()
+    fleet = Fleet(offsets, args.seed)
+    ping = EdgePing(timeout=args.deadline)
+    try:
+        engine = ProbeEngine(ping, on_timeout=timeout_metrics)
+        collector = Collector(fleet.servers, engine=engine, rounds=args.rounds, interval=1.0 / rate,
+                              deadline=args.deadline, policy=args.policy, predict=args.predict,
+                              probe_budget=args.probe_budget, expand_dns=False)
+        before = fleet.usage()
+        cpu_before = time.process_time()
+        start = time.perf_counter()
+        collector.start()
+        while collector.running:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        selector_cpu = time.process_time() - cpu_before
+        after = fleet.usage()
+    finally:
+        ping.pool.close_all()
+        fleet.stop()
+
+    snap = collector.snapshot()
+    if snap["error"]:
+        raise RuntimeError(f"collector failed: {snap['error']}")
+    stats = snap["stats"]
+    _, history, total = collector.rounds_since(0)
+    stages = {row["stage"]: {**{k: round(row[k] * 1e3, 4) for k in ("mean", "p50", "p95")},
+                             "share": round(row["share"], 4)}
+              for row in breakdown(stats["stages"])}
+    probes = sum(stats["probes"].values())
+    failures = sum(stats["probe_failures"].values())
+
+    backends = []
+    for server, offset, (cpu0, _), (cpu1, rss) in zip(fleet.servers, offsets, before, after):
+        backends.append({
+            "server": server,
+            "latency_offset_ms": round(offset * 1e3, 1),
+            "cpu_seconds": None if cpu0 is None or cpu1 is None else round(cpu1 - cpu0, 3),
+            "cpu_percent": None if cpu0 is None or cpu1 is None else round(100 * (cpu1 - cpu0) / elapsed, 2),
+            "rss_mb": None if rss is None else round(rss, 1),
+            "selected": snap["selection_count"][server],
+        })
+
+    return {
+        "fleet_size": n,
+        "target_rate": rate,
+        "rounds": total,
+        "elapsed_s": round(elapsed, 3),
+        # Intervals between round starts; the session ends with the last round
+        "achieved_rate": round(max(total - 1, 1) / elapsed, 3),
+        "decision_ms": {
+            "mean": round(sum(stages[s]["mean"] for s in DECISION_STAGES if s in stages), 4),
+            **{s: stages[s] for s in DECISION_STAGES if s in stages},
+        },
+        "stages_ms": stages,
+        "probes": {
+            "total": probes,
+            "failures": failures,
+            "per_second": round(probes / elapsed, 2),
+            "per_round": round(probes / max(total, 1), 2),
+        },
+        "selector": {
+            "cpu_seconds": round(selector_cpu, 3),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "backends": backends,
+        "regret": regret(offsets, history["load"], history["chosen"]),
+    }
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(EDGE_SERVER), check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Selector benchmark against a simulated edge fleet")
+    parser.add_argument("--fleet-sizes", type=int, nargs="+", default=[3, 10, 30])
+    parser.add_argument("--rates", type=float, nargs="+", default=[2.0, 10.0], help="target rounds per second")
+    parser.add_argument("--rounds", type=int, default=30, help="rounds per run")
+    parser.add_argument("--policy", choices=list(POLICIES), default=DEFAULT_POLICY)
+    parser.add_argument("--predict", choices=["mean", "hybrid"], default="mean")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE, help="probe round deadline (seconds)")
+    parser.add_argument("--probe-budget", type=float, default=None, help="probes per second, all servers")
+    parser.add_argument("--max-offset", type=float, default=0.05,
+                        help="backends get a fixed extra latency in [0, max-offset) seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_fleet.json")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'Servers':>8} {'Rate':>6} {'Achieved':>9} {'Decide (ms)':>12} {'Probes/s':>9} "
+          f"{'Fail':>5} {'CPU/srv %':>10} {'RSS/srv MB':>11} {'Regret (ms)':>12} {'Optimal':>8}")
+    print("-" * 99)
+    results = []
+    for n in args.fleet_sizes:
+        for rate in args.rates:
+            r = run(n, rate, args, rng)
+            results.append(r)
+            cpu = [b["cpu_percent"] for b in r["backends"] if b["cpu_percent"] is not None]
+            rss = [b["rss_mb"] for b in r["backends"] if b["rss_mb"] is not None]
+            reg = r["regret"]
+            print(f"{n:>8} {rate:>6.1f} {r['achieved_rate']:>9.2f} {r['decision_ms']['mean']:>12.3f} "
+                  f"{r['probes']['per_second']:>9.1f} {r['probes']['failures']:>5} "
+                  f"{np.mean(cpu) if cpu else float('nan'):>10.2f} {np.mean(rss) if rss else float('nan'):>11.1f} "
+                  f"{reg['mean_ms'] if reg['mean_ms'] is not None else float('nan'):>12.2f} "
+                  f"{reg['optimal_pick_rate'] if reg['optimal_pick_rate'] is not None else float('nan'):>8.0%}")
+
+    report = {
+        "benchmark": "fleet",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/bench_proxy.py
+# Overhead added by proxy.py: per-request latency and connection rate
+#
+# Usage: python -m benchmarks.bench_proxy [--requests 5000] [--connections 2000]
+#
+# Runs a loopback echo backend and the proxy (fixed route, no probing) on
+# background event loops, then compares direct and proxied round trips.
+
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+
+from proxy import Proxy
+
+PAYLOAD = b"x" * 64
+
+
+async def echo(reader, writer):
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+def run_in_thread(coro_factory):
+    ready = threading.Event()
+    box = {}
+
+    def runner():
+        async def main():
+            box["value"] = await coro_factory(ready)
+            await asyncio.Event().wait()
+        asyncio.run(main())
+
+    threading.Thread(target=runner, daemon=True).start()
+    ready.wait()
+    return box
+
+
+def start_backend():
+    async def factory(ready):
+        server = await asyncio.start_server(echo, "127.0.0.1", 0)
+        ready.set()
+        return server.sockets[0].getsockname()[1]
+    box = run_in_thread(factory)
+    while "value" not in box:
+        time.sleep(0.01)
+    return box["value"]
+
+
+def start_proxy(backend_port):
+    proxy = Proxy(lambda: f"127.0.0.1:{backend_port}", port=0)
+
+    async def factory(ready):
+        asyncio.get_running_loop().create_task(proxy.serve(ready))
+        return proxy
+    run_in_thread(factory)
+    while proxy.port == 0:
+        time.sleep(0.01)
+    return proxy
+
+
+def request_latencies(port, n):
+    s = socket.create_connection(("127.0.0.1", port))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter_ns()
+        s.sendall(PAYLOAD)
+        got = 0
+        while got < len(PAYLOAD):
+            got += len(s.recv(65536))
+        samples.append(time.perf_counter_ns() - t0)
+    s.close()
+    return samples
+
+
+def connection_rate(port, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        s = socket.create_connection(("127.0.0.1", port))
+        s.sendall(PAYLOAD)
+        s.recv(65536)
+        s.close()
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy overhead benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=2000)
+    args = parser.parse_args()
+
+    backend = start_backend()
+    proxy = start_proxy(backend)
+
+    direct = request_latencies(backend, args.requests)
+    proxied = request_latencies(proxy.port, args.requests)
+    d_med, p_med = statistics.median(direct) / 1e3, statistics.median(proxied) / 1e3
+    d_p99 = sorted(direct)[int(len(direct) * 0.99)] / 1e3
+    p_p99 = sorted(proxied)[int(len(proxied) * 0.99)] / 1e3
+    print(f"Request RTT   direct  p50 {d_med:8.1f} us  p99 {d_p99:8.1f} us")
+    print(f"Request RTT   proxied p50 {p_med:8.1f} us  p99 {p_p99:8.1f} us")
+    print(f"Added latency         p50 {p_med - d_med:8.1f} us  p99 {p_p99 - d_p99:8.1f} us")
+
+    direct_cps = connection_rate(backend, args.connections)
+    proxied_cps = connection_rate(proxy.port, args.connections)
+    print(f"Connections/s direct  {direct_cps:10.0f}")
+    print(f"Connections/s proxied {proxied_cps:10.0f}")
+    s = proxy.stats.snapshot()
+    print(f"Proxy route {s['avg_route_us']:.2f} us, backend connect {s['avg_connect_us']:.1f} us per connection")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_routing.py
+# Per-request routing cost: dict-scan bandit vs the indexed policies
+#
+# Usage: python -m benchmarks.bench_routing [--backends 1000] [--budget 1.0]
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from policies import POLICIES, make_policy
+
+
+def dict_bandit_select(score_map, prev_best, epsilon, anti_stick):
+    """The pre-index bandit_select: O(n) dict scan and array build per call."""
+    adjusted = {}
+    for s, v in score_map.items():
+        penalty = anti_stick if prev_best and s == prev_best else 0.0
+        adjusted[s] = v + penalty
+
+    if random.random() < epsilon:
+        scores = np.array(list(adjusted.values()), dtype=float)
+        inv = 1.0 / np.clip(scores, 1e-6, None)
+        prob = inv / inv.sum()
+        return str(np.random.choice(list(adjusted.keys()), p=prob))
+
+    return min(adjusted, key=lambda k: adjusted[k])
+
+
+def rate(fn, budget):
+    """Decisions per second, calling fn in batches of 1000."""
+    runs, start = 0, time.perf_counter()
+    while True:
+        for _ in range(1000):
+            fn()
+        runs += 1000
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return runs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request routing decision benchmark")
+    parser.add_argument("--backends", type=int, default=1000)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per measurement")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    servers = [f"10.0.{i // 256}.{i % 256}:8000" for i in range(args.backends)]
+    scores = rng.uniform(0.2, 1.5, args.backends)
+    score_map = dict(zip(servers, scores.tolist()))
+
+    print(f"{args.backends} backends, one core\n")
+    print(f"{'Policy':<28} {'Decisions/s':>14} {'ns/decision':>12}")
+    print("-" * 56)
+
+    state = {"prev": None}
+
+    def baseline():
+        state["prev"] = dict_bandit_select(score_map, state["prev"], 0.2, 0.03)
+
+    r = rate(baseline, args.budget)
+    print(f"{'bandit_select (dict scan)':<28} {r:>14,.0f} {1e9 / r:>12.0f}")
+
+    for name in POLICIES:
+        policy = make_policy(name, servers)
+        policy.observe(scores)
+        if name == "least-outstanding":
+            def decide(policy=policy):
+                server = policy.select()
+                policy.acquire(server)
+                policy.release(server)
+        else:
+            decide = policy.select
+        r = rate(decide, args.budget)
+        print(f"{name:<28} {r:>14,.0f} {1e9 / r:>12.0f}")
+
+    # Index maintenance: one round in which 10% of the scores moved
+    policy = make_policy("epsilon-greedy", servers)
+    policy.observe(scores)
+    moved = scores.copy()
+    changed = rng.choice(args.backends, args.backends // 10, replace=False)
+    rounds, start = 0, time.perf_counter()
+    while time.perf_counter() - start < args.budget:
+        moved[changed] += rng.normal(0, 0.01, len(changed))
+        policy.observe(moved)
+        rounds += 1
+    per_round = (time.perf_counter() - start) / rounds
+    print(f"\nobserve() with {len(changed)} changed scores: {per_round * 1e6:.0f} us per round "
+          f"({per_round / len(changed) * 1e6:.2f} us per re-keyed backend)")
+
+    greedy = make_policy("greedy", servers)
+    greedy.observe(moved)
+    assert greedy.select() == servers[int(np.argmin(moved))]
+
+
+if __name__ == "__main__":
+    main()
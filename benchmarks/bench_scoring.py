@@ -0,0 +1,88 @@
+# benchmarks/bench_scoring.py
+# Per-round selection cost: scalar per-server loop vs scoring.evaluate
+#
+# Usage: python -m benchmarks.bench_scoring [--sizes 3 10 100 1000 10000]
+
+import argparse
+import time
+
+import numpy as np
+
+from predictor import hybrid_prediction
+from scoring import evaluate, DEFAULT_WEIGHTS, ANOMALY_PENALTY
+
+WINDOW = 10
+
+
+def scalar_score(pred_rtt, pred_load, pred_health, error_rate, pred_bandwidth,
+                 alpha=1.0, beta=0.5, gamma=0.3, delta=0.2, epsilon=0.4):
+    if pred_rtt is None: return float("inf")
+    health_penalty = (100 - pred_health) / 100.0
+    bandwidth_penalty = (1000 - pred_bandwidth) / 1000.0 if pred_bandwidth else 1.0
+    return (alpha * pred_rtt + beta * (pred_load / 100.0) + gamma * health_penalty +
+            delta * error_rate + epsilon * bandwidth_penalty)
+
+
+def scalar_anomaly(values, threshold=2.0):
+    if len(values) < 3: return False
+    arr = np.array(values); mean = np.mean(arr[:-1]); std = np.std(arr[:-1])
+    if std == 0: return False
+    return abs((arr[-1] - mean) / std) > threshold
+
+
+def scalar_round(rows):
+    """The pre-vectorization loop: one pass of Python per server."""
+    rtt, load, health, errors, bandwidth = rows
+    best, best_score = None, float("inf")
+    for i in range(len(rtt)):
+        score = scalar_score(hybrid_prediction(rtt[i]), hybrid_prediction(load[i]),
+                             np.mean(health[i]), np.mean(errors[i]),
+                             hybrid_prediction(bandwidth[i]), **DEFAULT_WEIGHTS)
+        if scalar_anomaly(rtt[i]): score *= ANOMALY_PENALTY
+        if score < best_score:
+            best, best_score = i, score
+    return best
+
+
+def batch_round(matrices):
+    return int(np.argmin(evaluate(*matrices)["score"]))
+
+
+def make_fleet(n, rng):
+    return (rng.uniform(0.02, 0.2, (n, WINDOW)),
+            rng.uniform(5, 95, (n, WINDOW)),
+            rng.uniform(30, 100, (n, WINDOW)),
+            rng.uniform(0, 0.1, (n, WINDOW)),
+            rng.uniform(100, 1000, (n, WINDOW)))
+
+
+def timeit(fn, arg, budget=1.0):
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn(arg)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget or runs >= 1000:
+            return elapsed / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scalar vs vectorized scoring benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 10, 100, 1000, 10000])
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per measurement")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'Servers':>8} {'Scalar (ms)':>12} {'Batch (ms)':>12} {'Speedup':>9} {'Batch us/srv':>13}")
+    print("-" * 58)
+    for n in args.sizes:
+        matrices = make_fleet(n, rng)
+        rows = tuple(m.tolist() for m in matrices)
+        assert scalar_round(rows) == batch_round(matrices)
+        scalar = timeit(scalar_round, rows, args.budget)
+        batch = timeit(batch_round, matrices, args.budget)
+        print(f"{n:>8} {scalar * 1e3:>12.3f} {batch * 1e3:>12.3f} {scalar / batch:>8.1f}x {batch / n * 1e6:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
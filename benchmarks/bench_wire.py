@@ -0,0 +1,55 @@
+# benchmarks/bench_wire.py
+# Metrics response formats compared: JSON vs the binary METRICS_RECORD
+#
+# Usage: python -m benchmarks.bench_wire [--budget 1.0]
+
+import argparse
+import json
+import time
+
+from protocol import encode_metrics, decode_metrics, parse_metrics
+
+EDGE_METRICS = {
+    'load': 57, 'active_connections': 3, 'total_handled': 184203, 'total_errors': 912,
+    'queue_depth': 3, 'health_score': 43, 'jitter': 0.0049605417904224625,
+    'latency': 0.1958512909966656,
+}
+IPERF_METRICS = {**EDGE_METRICS, 'bandwidth_mbps': 734.52, 'iperf_port': 5201}
+
+
+def rate(fn, arg, budget):
+    runs, start = 0, time.perf_counter()
+    while True:
+        for _ in range(1000):
+            fn(arg)
+        runs += 1000
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs binary metrics encoding benchmark")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per measurement")
+    args = parser.parse_args()
+
+    print(f"{'Payload':<8} {'Format':<8} {'Bytes':>6} {'Encode (us)':>12} {'Decode (us)':>12}")
+    print("-" * 50)
+    for label, metrics in (("edge", EDGE_METRICS), ("iperf", IPERF_METRICS)):
+        as_json = json.dumps(metrics).encode()
+        as_binary = encode_metrics(metrics)
+        decoded = decode_metrics(as_binary)
+        assert decoded.keys() == metrics.keys() and parse_metrics(as_json) == metrics
+
+        enc = rate(lambda m: json.dumps(m).encode(), metrics, args.budget)
+        dec = rate(json.loads, as_json, args.budget)
+        print(f"{label:<8} {'json':<8} {len(as_json):>6} {enc * 1e6:>12.2f} {dec * 1e6:>12.2f}")
+        enc_b = rate(encode_metrics, metrics, args.budget)
+        dec_b = rate(parse_metrics, as_binary, args.budget)
+        print(f"{label:<8} {'binary':<8} {len(as_binary):>6} {enc_b * 1e6:>12.2f} {dec_b * 1e6:>12.2f}")
+        print(f"{'':<8} {'ratio':<8} {len(as_json) / len(as_binary):>5.1f}x "
+              f"{enc / enc_b:>11.1f}x {dec / dec_b:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
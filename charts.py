@@ -0,0 +1,228 @@
+# charts.py
+# Incremental, downsampled Plotly dashboard for app.py
+#
+# The figure skeleton (subplots + one trace per server and panel) is built
+# once per monitoring session. Each render pulls only the rounds added since
+# the previous render from the collector, folds them into streaming min/max
+# decimators, and swaps the decimated arrays into the existing traces.
+
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+MAX_BUCKETS = 500   # per series; each bucket contributes its min and max point
+COLORS = ["#3b82f6", "#8b5cf6", "#10b981", "#f59e0b", "#06b6d4"]
+
+# (metric, display scale, subplot row, subplot col)
+PANELS = [
+    ("rtt", 1000.0, 1, 1),
+    ("load", 1.0, 1, 2),
+    ("health", 1.0, 2, 1),
+    ("errors", 100.0, 2, 2),
+    ("bandwidth", 1.0, 3, 1),
+    ("chosen", 1.0, 3, 2),   # drawn as the cumulative selection count
+]
+
+
+class MinMaxDecimator:
+    """
+    Streaming min/max decimation of one metric for every server at once.
+
+    Samples fall into buckets of `width` rounds; each bucket keeps its
+    minimum and maximum (and when they occurred). When all buckets are in
+    use, neighbouring pairs are merged and the width doubles, so memory
+    and output size stay bounded however long the session runs, and each
+    append is O(servers).
+    """
+
+    def __init__(self, n_series, max_buckets=MAX_BUCKETS):
+        self.max_buckets = max_buckets + max_buckets % 2
+        self.width = 1
+        self.count = 0
+        self.buckets = 0
+        shape = (n_series, self.max_buckets)
+        self.vmin = np.full(shape, np.nan)
+        self.vmax = np.full(shape, np.nan)
+        self.tmin = np.zeros(shape)
+        self.tmax = np.zeros(shape)
+
+    def append(self, t, values):
+        if self.buckets == 0 or self.count == self.width:
+            if self.buckets == self.max_buckets:
+                self._compact()
+            b = self.buckets
+            self.vmin[:, b] = self.vmax[:, b] = values
+            self.tmin[:, b] = self.tmax[:, b] = t
+            self.buckets += 1
+            self.count = 1
+            return
+
+        b = self.buckets - 1
+        with np.errstate(invalid="ignore"):
+            lower = (values < self.vmin[:, b]) | np.isnan(self.vmin[:, b])
+            higher = (values > self.vmax[:, b]) | np.isnan(self.vmax[:, b])
+        lower &= ~np.isnan(values)
+        higher &= ~np.isnan(values)
+        self.vmin[lower, b] = values[lower]
+        self.tmin[lower, b] = t
+        self.vmax[higher, b] = values[higher]
+        self.tmax[higher, b] = t
+        self.count += 1
+
+    def extend(self, times, matrix):
+        for j, t in enumerate(times):
+            self.append(t, matrix[:, j])
+
+    def _compact(self):
+        def merge(v, tv, pick_second):
+            a, b = v[:, 0::2], v[:, 1::2]
+            second = pick_second(a, b)
+            return np.where(second, b, a), np.where(second, tv[:, 1::2], tv[:, 0::2])
+
+        half = self.max_buckets // 2
+        with np.errstate(invalid="ignore"):
+            vmin, tmin = merge(self.vmin, self.tmin, lambda a, b: (b < a) | np.isnan(a))
+            vmax, tmax = merge(self.vmax, self.tmax, lambda a, b: (b > a) | np.isnan(a))
+        self.vmin[:, :half], self.tmin[:, :half] = vmin, tmin
+        self.vmax[:, :half], self.tmax[:, :half] = vmax, tmax
+        self.vmin[:, half:] = self.vmax[:, half:] = np.nan
+        self.buckets = half
+        self.width *= 2
+        self.count = self.width   # the merged last bucket is full
+
+    def series(self):
+        """(x, y) arrays of shape (servers, 2 * buckets), in time order per bucket."""
+        nb = self.buckets
+        t0, t1 = self.tmin[:, :nb], self.tmax[:, :nb]
+        v0, v1 = self.vmin[:, :nb], self.vmax[:, :nb]
+        if self.width == 1:
+            return t0.copy(), v0.copy()
+        min_first = t0 <= t1
+        x = np.stack([np.where(min_first, t0, t1), np.where(min_first, t1, t0)], axis=2)
+        y = np.stack([np.where(min_first, v0, v1), np.where(min_first, v1, v0)], axis=2)
+        return x.reshape(len(x), -1), y.reshape(len(y), -1)
+
+
+def build_figure(servers):
+    fig = make_subplots(
+        rows=3, cols=2,
+        subplot_titles=[
+            "⚡ RTT (ms)",
+            "💻 Load (%)",
+            "💚 Health Score",
+            "⚠️ Error Rate (%)",
+            "📡 Bandwidth (Mbps)",
+            "🎯 Selection History"
+        ],
+        vertical_spacing=0.12,
+        horizontal_spacing=0.10
+    )
+
+    for metric, _, row, col in PANELS:
+        for idx, server in enumerate(servers):
+            color = COLORS[idx % len(COLORS)]
+            if metric == "chosen":
+                trace = go.Scatter(showlegend=False, fill="tozeroy",
+                                   line=dict(color=color, width=2), mode='lines')
+            else:
+                trace = go.Scatter(name=server, showlegend=(metric == "rtt"),
+                                   line=dict(color=color, width=2),
+                                   mode='lines+markers', marker=dict(size=4))
+            fig.add_trace(trace, row=row, col=col)
+
+    fig.update_layout(
+        height=900,
+        template="plotly_dark",
+        hovermode="x unified",
+        margin=dict(t=100, l=60, r=60, b=60),
+        font=dict(size=11, family='Space Grotesk, sans-serif'),
+        paper_bgcolor='rgba(10,15,30,0.8)',
+        plot_bgcolor='rgba(20,27,45,0.4)',
+        legend=dict(
+            font=dict(size=10),
+            bgcolor='rgba(20,27,45,0.8)',
+            bordercolor='rgba(59,130,246,0.3)',
+            borderwidth=1
+        )
+    )
+
+    for annotation in fig['layout']['annotations']:
+        annotation['font'] = dict(size=13, weight='bold', family='Space Grotesk')
+        annotation['yshift'] = 5
+
+    fig.update_xaxes(
+        gridcolor='rgba(59,130,246,0.1)',
+        zerolinecolor='rgba(59,130,246,0.2)'
+    )
+    fig.update_yaxes(
+        gridcolor='rgba(59,130,246,0.1)',
+        zerolinecolor='rgba(59,130,246,0.2)'
+    )
+    return fig
+
+
+class ChartCache:
+    """
+    Per-session chart state shared by every viewer of one collector.
+
+    figure() folds in only the rounds since the last call and returns the
+    serialized figure; repeated calls within one round cost nothing.
+    """
+
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._key = None
+
+    def _reset(self, key, servers):
+        self._key = key
+        self.servers = servers
+        self.round = 0
+        self.selected = np.zeros(len(servers))
+        self.decimators = {m: MinMaxDecimator(len(servers), self.max_buckets) for m, *_ in PANELS}
+        self.fig = build_figure(servers)
+        self.best = None
+        self._json = None
+
+    def figure(self, collector, best_server=None):
+        snap = collector.snapshot()
+        key = (tuple(snap["servers"]), snap["session_start"])
+        with self._lock:
+            if key != self._key:
+                self._reset(key, list(snap["servers"]))
+
+            dirty = False
+            if snap["round"] > self.round:
+                times, new, total = collector.rounds_since(self.round)
+                self._fold(times, new)
+                self.round = total
+                dirty = True
+
+            if dirty or best_server != self.best or self._json is None:
+                self._refresh_traces(best_server)
+                self._json = self.fig.to_dict()
+            return self._json
+
+    def _fold(self, times, new):
+        for metric, scale, *_ in PANELS:
+            values = new[metric]
+            if metric == "chosen":
+                values = self.selected[:, None] + np.cumsum(np.nan_to_num(values), axis=1)
+                if values.shape[1]:
+                    self.selected = values[:, -1]
+            elif scale != 1.0:
+                values = values * scale
+            self.decimators[metric].extend(times, values)
+
+    def _refresh_traces(self, best_server):
+        n = len(self.servers)
+        for p, (metric, *_) in enumerate(PANELS):
+            x, y = self.decimators[metric].series()
+            for idx, server in enumerate(self.servers):
+                trace = self.fig.data[p * n + idx]
+                trace.x, trace.y = x[idx], y[idx]
+                trace.line.width = 3 if server == best_server else 2
+                trace.opacity = 1.0 if server == best_server else 0.6
+        self.best = best_server
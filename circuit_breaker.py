@@ -0,0 +1,175 @@
+# circuit_breaker.py
+# Per-backend circuit breakers and latency outlier ejection
+#
+# A breaker is closed while its backend behaves. Consecutive failures or a
+# high error rate open it (the backend is ejected): it gets no full probes
+# and no traffic until its ejection time has passed, then goes half-open
+# and gets one cheap trial per round. Enough trial successes in a row
+# close it again; a failed trial re-opens it for twice as long. A round of
+# proxied requests only counts as consecutive failures if none succeeded.
+# A backend whose latency is a z-score outlier against the rest of the
+# fleet is ejected the same way, up to a cap so the fleet is never emptied;
+# fleets with fewer than OUTLIER_MIN_PEERS + 1 closed servers are never judged.
+
+import collections
+
+import numpy as np
+
+from scoring import outlier_batch
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+FAILURE_THRESHOLD = 3        # consecutive failures that open the breaker
+ERROR_RATE_THRESHOLD = 0.5   # ... or this error rate over the recent outcomes
+ERROR_WINDOW = 20            # outcomes kept for the error rate
+MIN_REQUESTS = 10            # outcomes needed before the error rate counts
+BASE_EJECTION = 5.0          # seconds; doubles with each ejection in a row
+MAX_EJECTION = 300.0
+HALF_OPEN_SUCCESSES = 2      # trial successes in a row needed to close
+MAX_EJECTED_FRACTION = 0.5   # outlier ejection never takes out more than this
+
+
+class Breaker:
+    """State of one backend's breaker; see the module comment."""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.reason = None
+        self.failures = 0
+        self.outcomes = collections.deque(maxlen=ERROR_WINDOW)
+        self.ejections = 0
+        self.healthy_run = 0
+        self.reopen_at = 0.0
+        self.closed_at = float("-inf")
+        self.trial_successes = 0
+
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def record(self, ok, now, n=1):
+        """Record n outcomes of one kind. Outcomes while open are ignored."""
+        if n <= 0 or self.state == OPEN:
+            return
+        if self.state == HALF_OPEN:
+            if not ok:
+                self.trip(now, "failed trial")
+                return
+            self.trial_successes += n
+            if self.trial_successes >= HALF_OPEN_SUCCESSES:
+                self.state, self.reason = CLOSED, None
+                self.closed_at = now
+                self.failures = 0
+                self.outcomes.clear()
+            return
+
+        self.outcomes.extend([ok] * min(n, ERROR_WINDOW))
+        if ok:
+            self.failures = 0
+            # A long healthy run forgives one past ejection
+            self.healthy_run += n
+            if self.healthy_run >= ERROR_WINDOW:
+                self.ejections = max(0, self.ejections - 1)
+                self.healthy_run = 0
+            return
+        self.failures += n
+        self.healthy_run = 0
+        if self.failures >= FAILURE_THRESHOLD:
+            self.trip(now, f"{self.failures} consecutive failures")
+        elif len(self.outcomes) >= MIN_REQUESTS and self.error_rate() >= ERROR_RATE_THRESHOLD:
+            self.trip(now, f"error rate {self.error_rate():.0%}")
+
+    def record_batch(self, successes, errors, now):
+        """
+        Record one round of passive results, whose order is unknown. Only a
+        round without successes extends the consecutive-failure run; the
+        error-rate window gets the round's outcomes interleaved and scaled
+        down to at most ERROR_WINDOW, so it sees the round's error rate.
+        """
+        if self.state != CLOSED or not successes or not errors:
+            self.record(True, now, successes)
+            self.record(False, now, errors)
+            return
+        total = successes + errors
+        k = min(total, ERROR_WINDOW)
+        bad = max(1, round(errors * k / total))
+        self.outcomes.extend(i * bad // k == (i + 1) * bad // k for i in range(k))
+        self.failures = 0
+        self.healthy_run = 0
+        if len(self.outcomes) >= MIN_REQUESTS and self.error_rate() >= ERROR_RATE_THRESHOLD:
+            self.trip(now, f"error rate {self.error_rate():.0%}")
+
+    def trip(self, now, reason):
+        self.state, self.reason = OPEN, reason
+        self.ejections += 1
+        self.reopen_at = now + min(MAX_EJECTION, BASE_EJECTION * 2 ** (self.ejections - 1))
+        self.trial_successes = 0
+        self.healthy_run = 0
+
+    def half_open(self, now):
+        """Move an open breaker whose ejection has expired to half-open."""
+        if self.state == OPEN and now >= self.reopen_at:
+            self.state = HALF_OPEN
+            self.trial_successes = 0
+        return self.state == HALF_OPEN
+
+
+class CircuitBreakers:
+    """
+    Breakers for a fixed server list. closed() are the servers to probe
+    and route to; trials(now) are the half-open ones due a cheap trial.
+    """
+
+    def __init__(self, servers):
+        self.servers = list(servers)
+        self.breakers = {s: Breaker() for s in self.servers}
+
+    def closed(self, server):
+        return self.breakers[server].state == CLOSED
+
+    def state(self, server):
+        """{"state", "reason"} of one server's breaker, without advancing it."""
+        b = self.breakers[server]
+        return {"state": b.state, "reason": b.reason}
+
+    def ejected(self):
+        """Servers not currently closed, in server order."""
+        return [s for s in self.servers if self.breakers[s].state != CLOSED]
+
+    def trials(self, now):
+        return [s for s in self.servers if self.breakers[s].half_open(now)]
+
+    def record(self, server, ok, now, n=1):
+        """Record outcomes; returns True if this closed the server's breaker."""
+        breaker = self.breakers[server]
+        was_closed = breaker.state == CLOSED
+        breaker.record(ok, now, n)
+        return not was_closed and breaker.state == CLOSED
+
+    def record_batch(self, server, successes, errors, now):
+        """Breaker.record_batch; returns True if this closed the server's breaker."""
+        breaker = self.breakers[server]
+        was_closed = breaker.state == CLOSED
+        breaker.record_batch(successes, errors, now)
+        return not was_closed and breaker.state == CLOSED
+
+    def eject_outliers(self, latencies, now, settle=0.0):
+        """
+        Eject closed servers whose latency (aligned with servers, NaN =
+        unknown) is an outlier against the other closed servers, slowest
+        first, without exceeding MAX_EJECTED_FRACTION. Servers closed less
+        than `settle` seconds ago are not judged, so latency from before
+        an ejection cannot eject them again. Returns the ejected.
+        """
+        latencies = np.asarray(latencies, dtype=float)
+        closed = np.array([self.closed(s) for s in self.servers])
+        settled = np.array([now - self.breakers[s].closed_at >= settle for s in self.servers])
+        flagged = np.flatnonzero(outlier_batch(np.where(closed, latencies, np.nan)) & settled)
+        room = int(MAX_EJECTED_FRACTION * len(self.servers)) - int((~closed).sum())
+        ejected = []
+        for i in sorted(flagged, key=lambda i: -latencies[i])[:max(room, 0)]:
+            self.breakers[self.servers[i]].trip(now, f"latency outlier ({latencies[i] * 1000:.0f} ms)")
+            ejected.append(self.servers[i])
+        return ejected
+
+    def states(self):
+        return {s: self.state(s) for s in self.servers}
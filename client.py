@@ -1,12 +1,18 @@
 # client.py - Enhanced with iPerf bandwidth monitoring
-import socket
+import argparse
 import time
 import threading
 import numpy as np
-import json
 from collections import deque
-from sklearn.linear_model import LinearRegression
 import matplotlib.pyplot as plt
+from probe_engine import ProbeEngine
+from circuit_breaker import CircuitBreakers, OPEN
+from protocol import PING_BINARY, ConnectionPool, request, parse_metrics
+from throughput import measure_throughput
+from predictor import HybridPredictor
+from policies import POLICIES, make_policy
+from profiling import StageTimer, RoundProfiler, format_breakdown
+from scoring import to_matrix, mean_batch, anomaly_batch, score_batch, ANOMALY_PENALTY
 
 # ---------- CONFIG ----------
 SERVERS = [8001, 8002, 8003]
@@ -24,7 +30,11 @@ DELTA = 0.2      # weight for error rate
 EPSILON = 0.4    # weight for bandwidth (NEW!)
 
 SOCKET_TIMEOUT = 0.6
+ROUND_DEADLINE = 0.8   # max seconds a round waits for its slowest probe
 SHOW_ANALYSIS = True
+POLICY = "greedy"      # see policies.POLICIES; override with --policy
+BANDWIDTH_INTERVAL = 30.0             # min seconds between tests of one server
+BANDWIDTH_TEST_BYTES = 4 * 1024 * 1024
 # ----------------------------
 
 # State
@@ -34,6 +44,16 @@ health_history = {p: deque(maxlen=HISTORY_SIZE) for p in SERVERS}
 error_history = {p: deque(maxlen=HISTORY_SIZE) for p in SERVERS}
 jitter_history = {p: deque(maxlen=HISTORY_SIZE) for p in SERVERS}
 bandwidth_history = {p: deque(maxlen=HISTORY_SIZE) for p in SERVERS}  # NEW!
+handshake_history = {p: deque(maxlen=HISTORY_SIZE) for p in SERVERS}
+
+# Measured throughput (Mbps) per server, and its test port from the metrics
+measured_bandwidth = {}
+iperf_ports = {}
+
+# Incremental hybrid predictors (EWMA + sliding least squares), one per series
+rtt_predictor = {p: HybridPredictor(HISTORY_SIZE, PREDICT_WINDOW) for p in SERVERS}
+load_predictor = {p: HybridPredictor(HISTORY_SIZE, PREDICT_WINDOW) for p in SERVERS}
+bandwidth_predictor = {p: HybridPredictor(HISTORY_SIZE, PREDICT_WINDOW) for p in SERVERS}
 
 # For plotting + summary
 plot_time = []
@@ -50,117 +70,113 @@ plot_data = {p: {
 
 state_lock = threading.Lock()
 
+connection_pool = ConnectionPool(timeout=SOCKET_TIMEOUT)
+breakers = CircuitBreakers(SERVERS)
+
+# Per-stage round timings; --profile N also runs cProfile every N rounds
+stages = StageTimer()
+
 def ping_once(port):
-    """Sends a ping; returns metrics dict or None on failure."""
+    """
+    Sends a framed ping over a pooled keep-alive connection; returns metrics
+    dict or None on failure. 'rtt' is the request RTT only; 'handshake_rtt'
+    is the TCP connect time when a new connection was opened, else None.
+    """
+    addr = (HOST, port)
+    s = None
     try:
-        s = socket.socket()
-        s.settimeout(SOCKET_TIMEOUT)
-        start = time.time()
-        s.connect((HOST, port))
-        s.send(b"ping")
-        data = s.recv(2048).decode()
-        end = time.time()
-        s.close()
+        s, handshake_rtt = connection_pool.acquire(addr)
+        start = time.perf_counter()
+        data = request(s, PING_BINARY)
+        end = time.perf_counter()
+        connection_pool.release(addr, s)
         
-        metrics = json.loads(data)
+        metrics = parse_metrics(data)
         metrics['rtt'] = end - start
+        metrics['handshake_rtt'] = handshake_rtt
         return metrics
     except Exception as e:
+        if s is not None:
+            connection_pool.discard(s)
         print(f"⚠️  Failed to ping server on port {port}: {e}")
         return None
 
-def exponential_smoothing(values, alpha=0.3):
-    if len(values) == 0: return None
-    if len(values) == 1: return float(values[0])
-    smoothed = [values[0]]
-    for i in range(1, len(values)):
-        smoothed.append(alpha * values[i] + (1 - alpha) * smoothed[i-1])
-    return float(smoothed[-1])
-
-def predict_with_regression(values):
-    if len(values) == 0: return None
-    arr = np.array(values); n = len(arr)
-    if n >= 2:
-        m = min(n, PREDICT_WINDOW)
-        y = arr[-m:]; X = np.arange(n-m, n).reshape(-1, 1)
-        model = LinearRegression(); model.fit(X, y)
-        return float(model.predict(np.array([[n]]))[0])
-    else:
-        return float(arr[-1])
-
-def hybrid_prediction(values):
-    smooth = exponential_smoothing(values)
-    regress = predict_with_regression(values)
-    if smooth is None or regress is None: return smooth or regress
-    return 0.6 * regress + 0.4 * smooth
-
-def compute_score(pred_rtt, pred_load, pred_health, error_rate, pred_bandwidth,
-                  alpha=ALPHA, beta=BETA, gamma=GAMMA, delta=DELTA, epsilon=EPSILON):
-    """
-    Compute score with bandwidth consideration.
-    Lower score is better, but higher bandwidth is better, so we invert it.
-    """
-    if pred_rtt is None: return float('inf')
-    
-    health_penalty = (100 - pred_health) / 100.0 if pred_health is not None else 1.0
-    
-    # Bandwidth bonus (higher bandwidth = lower score)
-    # Normalize bandwidth (assume max 1000 Mbps)
-    bandwidth_factor = 0
-    if pred_bandwidth is not None and pred_bandwidth > 0:
-        bandwidth_factor = (1000 - pred_bandwidth) / 1000.0  # Invert: lower = better
-    
-    score = (alpha * pred_rtt + 
-             beta * (pred_load / 100.0) + 
-             gamma * health_penalty + 
-             delta * error_rate +
-             epsilon * bandwidth_factor)
-    
-    return score
-
-def detect_anomaly(values, threshold=2.0):
-    if len(values) < 3: return False
-    arr = np.array(values); mean = np.mean(arr[:-1]); std = np.std(arr[:-1])
-    if std == 0: return False
-    return abs((arr[-1] - mean) / std) > threshold
+probe_engine = ProbeEngine(ping_once)
 
-def monitor_round(round_idx):
-    results = {}
-    for p in SERVERS:
-        metrics = ping_once(p)
-        results[p] = metrics
+def monitor_round(round_idx, selector):
+    # Ejected servers are skipped; half-open ones get a ping as their trial
+    mark = stages.start()
+    now = time.monotonic()
+    trials = breakers.trials(now)
+    targets = [p for p in SERVERS if breakers.closed(p) or p in trials]
+    results = probe_engine.probe_all(targets, deadline=ROUND_DEADLINE)
+    for p in probe_engine.last_timeouts:
+        print(f"⏱️  Server on port {p} missed the {ROUND_DEADLINE}s round deadline")
+    for p in targets:
+        if breakers.record(p, results[p] is not None, now):
+            print(f"✅ Server on port {p} passed its trials, back in rotation")
+        elif breakers.state(p)["state"] == OPEN:
+            print(f"⛔ Server on port {p} ejected: {breakers.state(p)['reason']}")
+    results = {p: results.get(p) if breakers.closed(p) else None for p in SERVERS}
+    mark = stages.lap("probe", mark)
     
     with state_lock:
-        predictions = {}
         for p, metrics in results.items():
             if metrics is None:
-                predictions[p] = (None, None, None, 0, None, float('inf'), False)
                 continue
             
+            if metrics.get('iperf_port'):
+                iperf_ports[p] = metrics['iperf_port']
+            bandwidth = measured_bandwidth.get(p, metrics.get('bandwidth_mbps', 500))
+            
             # Update histories
             rtt_history[p].append(metrics['rtt'])
             load_history[p].append(metrics['load'])
+            rtt_predictor[p].update(metrics['rtt'])
+            load_predictor[p].update(metrics['load'])
+            bandwidth_predictor[p].update(bandwidth)
             health_history[p].append(metrics.get('health_score', 50))
             error_rate = metrics.get('total_errors', 0) / max(1, metrics.get('total_handled', 1))
             error_history[p].append(error_rate)
             jitter_history[p].append(metrics.get('jitter', 0))
-            bandwidth_history[p].append(metrics.get('bandwidth_mbps', 500))  # NEW!
-            
-            # Predictions
-            pred_rtt = hybrid_prediction(list(rtt_history[p]))
-            pred_load = hybrid_prediction(list(load_history[p]))
-            pred_health = np.mean(list(health_history[p])) if len(health_history[p]) > 0 else 50
-            error_rate = np.mean(list(error_history[p])) if len(error_history[p]) > 0 else 0
-            pred_bandwidth = hybrid_prediction(list(bandwidth_history[p]))  # NEW!
-            
-            is_anomaly = detect_anomaly(list(rtt_history[p]))
-            score = compute_score(pred_rtt, pred_load, pred_health, error_rate, pred_bandwidth)
-            if is_anomaly: score *= 1.5
-            
-            predictions[p] = (pred_rtt, pred_load, pred_health, error_rate, pred_bandwidth, score, is_anomaly)
+            bandwidth_history[p].append(bandwidth)  # NEW!
+            if metrics.get('handshake_rtt') is not None:
+                handshake_history[p].append(metrics['handshake_rtt'])
+        
+        # Latency outliers against the rest of the fleet are ejected
+        rtt_means = mean_batch(to_matrix(rtt_history, SERVERS, HISTORY_SIZE))
+        for p in breakers.eject_outliers(rtt_means, now, settle=HISTORY_SIZE * ROUND_INTERVAL):
+            results[p] = None
+            print(f"⛔ Server on port {p} ejected: {breakers.state(p)['reason']}")
+        mark = stages.lap("record", mark)
+        
+        # Predictions, anomaly flags and scores for all servers in one pass
+        alive = np.array([results[p] is not None for p in SERVERS])
+        pred_rtts = np.array([rtt_predictor[p].predict() if results[p] else np.nan for p in SERVERS], dtype=float)
+        pred_loads = np.array([load_predictor[p].predict() if results[p] else np.nan for p in SERVERS], dtype=float)
+        pred_bws = np.array([bandwidth_predictor[p].predict() if results[p] else np.nan for p in SERVERS], dtype=float)
+        pred_healths = mean_batch(to_matrix(health_history, SERVERS, HISTORY_SIZE), fallback=50.0)
+        error_rates = mean_batch(to_matrix(error_history, SERVERS, HISTORY_SIZE), fallback=0.0)
+        anomalies = anomaly_batch(to_matrix(rtt_history, SERVERS, HISTORY_SIZE)) & alive
+        mark = stages.lap("predict", mark)
+        
+        scores = score_batch(pred_rtts, pred_loads, pred_healths, error_rates, pred_bws,
+                             ALPHA, BETA, GAMMA, DELTA, EPSILON)
+        scores = np.where(anomalies, scores * ANOMALY_PENALTY, scores)
+        
+        predictions = {}
+        for i, p in enumerate(SERVERS):
+            if not alive[i]:
+                predictions[p] = (None, None, None, 0, None, float('inf'), False)
+            else:
+                predictions[p] = (pred_rtts[i], pred_loads[i], pred_healths[i], error_rates[i],
+                                  pred_bws[i], float(scores[i]), bool(anomalies[i]))
+        mark = stages.lap("score", mark)
         
         # Pick best server this round
-        best_server = min(predictions.keys(), key=lambda x: predictions[x][5])
+        selector.observe(scores)
+        best_server = selector.select()
+        mark = stages.lap("select", mark)
         
         # Store for plotting & summary
         timestamp = round_idx * ROUND_INTERVAL
@@ -178,17 +194,19 @@ def monitor_round(round_idx):
         
         # Print round summary with bandwidth
         print(f"\n📊 Round {round_idx + 1}/{ROUNDS}")
-        print(f"{'Port':<8} {'RTT (ms)':<12} {'Load %':<10} {'Health':<10} {'Bandwidth':<15} {'Score':<10}")
-        print("-" * 75)
+        print(f"{'Port':<8} {'RTT (ms)':<12} {'Conn (ms)':<12} {'Load %':<10} {'Health':<10} {'Bandwidth':<15} {'Score':<10}")
+        print("-" * 87)
         for p in SERVERS:
             pred_rtt, pred_load, pred_health, _, pred_bw, score, _ = predictions[p]
             marker = "⭐" if p == best_server else "  "
             rtt_str = f"{pred_rtt*1000:.1f}" if pred_rtt else "N/A"
+            conn_str = f"{handshake_history[p][-1]*1000:.1f}" if handshake_history[p] else "N/A"
             load_str = f"{pred_load:.1f}" if pred_load else "N/A"
             health_str = f"{pred_health:.1f}" if pred_health else "N/A"
             bw_str = f"{pred_bw:.1f} Mbps" if pred_bw else "N/A"
             score_str = f"{score:.3f}" if score != float('inf') else "INF"
-            print(f"{marker} {p:<6} {rtt_str:<12} {load_str:<10} {health_str:<10} {bw_str:<15} {score_str:<10}")
+            print(f"{marker} {p:<6} {rtt_str:<12} {conn_str:<12} {load_str:<10} {health_str:<10} {bw_str:<15} {score_str:<10}")
+        stages.lap("report", mark)
 
 def final_summary():
     """Calculate overall best server at the end"""
@@ -204,8 +222,12 @@ def final_summary():
     print("="*60)
     for p in SERVERS:
         avg_bw = np.mean([b for b in plot_data[p]['bandwidth'] if not np.isnan(b)])
-        print(f"Server {p}: Avg Score = {avg_scores[p]:.3f} | Avg Bandwidth = {avg_bw:.1f} Mbps")
+        avg_conn = np.mean(handshake_history[p]) * 1000 if handshake_history[p] else float('nan')
+        print(f"Server {p}: Avg Score = {avg_scores[p]:.3f} | Avg Bandwidth = {avg_bw:.1f} Mbps | "
+              f"Avg Handshake = {avg_conn:.1f} ms ({len(handshake_history[p])} connects)")
     print(f"\n✅ Best Server Overall: {best_server} (Lowest Avg Score {avg_scores[best_server]:.3f})")
+    print("\n⏱️  Round stages (ms)")
+    print(format_breakdown(stages.state(), stages.last))
     
     return best_server
 
@@ -231,17 +253,62 @@ def show_analysis():
     plt.tight_layout()
     plt.show()
 
-def main():
+def bandwidth_worker(stop):
+    """
+    Runs throughput tests one at a time, never overlapping, so each test
+    has the link to itself; every server is tested at most once per
+    BANDWIDTH_INTERVAL.
+    """
+    last_test = {}
+    while not stop.is_set():
+        now = time.time()
+        due = [p for p in SERVERS if p in iperf_ports and now - last_test.get(p, 0) >= BANDWIDTH_INTERVAL]
+        if not due:
+            stop.wait(1.0)
+            continue
+        p = min(due, key=lambda q: last_test.get(q, 0))
+        last_test[p] = now
+        try:
+            mbps = measure_throughput(HOST, iperf_ports[p], BANDWIDTH_TEST_BYTES)
+        except (OSError, ConnectionError):
+            continue
+        with state_lock:
+            measured_bandwidth[p] = mbps
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Predictive load balancer client")
+    parser.add_argument("--policy", choices=list(POLICIES), default=POLICY)
+    parser.add_argument("--profile", type=int, default=0, metavar="N",
+                        help="cProfile every N rounds into --profile-dir")
+    parser.add_argument("--profile-dir", default="profiles")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    selector = make_policy(args.policy, SERVERS)
+    profiler = RoundProfiler(args.profile, args.profile_dir, label="client")
+
     print("Starting Enhanced Predictive Load Balancer with iPerf Bandwidth Monitoring...")
     print(f"Monitoring {len(SERVERS)} servers: {SERVERS}")
     print(f"Bandwidth weight (ε): {EPSILON}")
+    print(f"Selection policy: {selector.name}")
+    
+    stop_bandwidth = threading.Event()
+    threading.Thread(target=bandwidth_worker, args=(stop_bandwidth,), daemon=True).start()
     
     for round_idx in range(ROUNDS):
-        monitor_round(round_idx)
-        time.sleep(ROUND_INTERVAL)
+        round_start = time.perf_counter()
+        profiler.round_started(round_idx)
+        monitor_round(round_idx, selector)
+        profiler.round_finished(round_idx)
+        time.sleep(max(0.0, ROUND_INTERVAL - (time.perf_counter() - round_start)))
+    
+    stop_bandwidth.set()
+    profiler.close(ROUNDS - 1)
     
     # Show summary after all rounds
     best = final_summary()
+    connection_pool.close_all()
     
     if SHOW_ANALYSIS:
         print("\n📊 Showing Analysis Charts...")
@@ -0,0 +1,384 @@
+# collector.py
+# Background probe -> score -> select loop, decoupled from Streamlit reruns
+#
+# One Collector runs per process (app.py shares it across browser sessions
+# with st.cache_resource). It runs a round every interval on its own thread
+# and publishes an immutable snapshot after every round; the UI only reads.
+# Which servers a round actually probes is up to the ProbeScheduler;
+# servers whose circuit breaker is open get only cheap half-open trials.
+# Each round is timed stage by stage (probe, record, predict, score,
+# select, publish) into the snapshot's stats; profile_every > 0 also runs
+# cProfile over every that-many rounds (profiling.RoundProfiler).
+
+import itertools
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from circuit_breaker import CircuitBreakers
+from exposition import Histogram, RTT_BUCKETS
+from metric_store import MetricStore
+from policies import make_policy, DEFAULT_POLICY
+from probe import probe_server, timeout_metrics, trial_probe, expand_targets, TRIAL_TIMEOUT, _parse_target
+from probe_engine import ProbeEngine, DEFAULT_DEADLINE
+from probe_scheduler import ProbeScheduler, DEFAULT_MAX_INTERVAL
+from profiling import StageTimer, RoundProfiler
+from scoring import predict_batch, score_predictions, mean_batch, DEFAULT_WEIGHTS
+
+HISTORY_SIZE = 10
+DEFAULT_RETENTION_MIN = 60
+DEFAULT_CONFIG = {
+    "rounds": 20,
+    "interval": 1.0,
+    "deadline": DEFAULT_DEADLINE,
+    "retention": DEFAULT_RETENTION_MIN,
+    "weights": dict(DEFAULT_WEIGHTS),
+    "policy": DEFAULT_POLICY,
+    "eps": 0.2,
+    "anti_stick": 0.03,
+    "passive_refresh": 30.0,   # seconds between probes of servers with organic traffic
+    "max_probe_interval": DEFAULT_MAX_INTERVAL,   # = interval probes every server every round
+    "probe_budget": None,      # probes per second across all servers; None = unlimited
+    "expand_dns": True,        # one backend per address of a multi-address name
+    "predict": "mean",         # "mean" (window means) or "hybrid" (client.py's EWMA + regression)
+    "profile_every": 0,        # cProfile every N rounds into profile_dir; 0 = off
+    "profile_dir": "profiles",
+}
+
+
+def _empty_passive():
+    return {"requests": 0, "errors": 0, "bytes": 0, "connect": 0.0, "ttfb": 0.0, "total": 0.0}
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Collector:
+    """
+    Runs monitoring rounds on a daemon thread and publishes snapshots.
+
+    snapshot() is a plain dict replaced wholesale after each round, so
+    readers never see a half-updated round. rounds_since() hands out
+    copies of just the rounds a reader has not seen yet.
+    """
+
+    def __init__(self, servers, engine=None, **config):
+        self.engine = engine or ProbeEngine(probe_server, on_timeout=timeout_metrics)
+        self.config = {**DEFAULT_CONFIG, **config}
+        self._lock = threading.Lock()
+        self._passive_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset(list(servers))
+
+    # ---------- control ----------
+    def _reset(self, targets):
+        # Names are expanded once per session; new addresses appear on the next start
+        self.targets = targets
+        if self.config["expand_dns"]:
+            servers, self.resolved = expand_targets(targets)
+        else:
+            servers, self.resolved = list(targets), {}
+        self.servers = servers
+        self.store = MetricStore.for_retention(servers, self.config["retention"] * 60,
+                                               self.config["interval"])
+        self.selection_count = {s: 0 for s in servers}
+        self.stats = {
+            "probes": {s: 0 for s in servers},
+            "probe_failures": {s: 0 for s in servers},
+            "rtt": {s: Histogram(RTT_BUCKETS) for s in servers},
+        }
+        self.stages = StageTimer()
+        self.prev_best = None
+        self.policy = self.make_policy(servers)
+        self.scheduler = ProbeScheduler(servers, self.config["interval"],
+                                        self.config["max_probe_interval"], self.config["probe_budget"])
+        self.breakers = CircuitBreakers(servers)
+        self._last_probe = {}
+        self._probed_at = {}
+        self.probed = []
+        self._http = {s: _parse_target(s)[2] in ("http", "https") for s in servers}
+        with self._passive_lock:
+            self._passive = {s: _empty_passive() for s in servers}
+        self.passive = {s: _empty_passive() for s in servers}
+        self._snapshot = self._build_snapshot(running=False, best=None, scores={},
+                                              session_start=None, session_end=None)
+
+    def make_policy(self, servers):
+        """A fresh instance of the configured selection policy."""
+        cfg = self.config
+        return make_policy(cfg["policy"], servers, epsilon=cfg["eps"], anti_stick=cfg["anti_stick"])
+
+    def configure(self, servers=None, **config):
+        """Update settings; changing the server list stops and clears the collector."""
+        with self._lock:
+            self.config.update(config)
+        if servers is not None and list(servers) != self.targets:
+            self.stop()
+            with self._lock:
+                self._reset(list(servers))
+
+    def start(self):
+        """
+        (Re)start a session of config['rounds'] rounds from a clean history;
+        rounds=None runs until stop().
+        """
+        self.stop()
+        with self._lock:
+            self._reset(self.targets)
+            self._snapshot = {**self._snapshot, "running": True, "session_start": _now()}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                        name="collector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=self.config["deadline"] + 1.0)
+        self._thread = None
+        with self._lock:
+            if self._snapshot["running"]:
+                self._snapshot = {**self._snapshot, "running": False}
+
+    def reset(self):
+        self.stop()
+        with self._lock:
+            self._reset(self.targets)
+
+    @property
+    def running(self):
+        return self._snapshot["running"]
+
+    # ---------- passive telemetry ----------
+    def record_passive(self, server, connect, ttfb, total, nbytes, error=False):
+        """
+        Record one forwarded request (seconds, bytes). Called from the
+        proxy's event loop; samples are folded in at the next round.
+        """
+        with self._passive_lock:
+            acc = self._passive.get(server)
+            if acc is None:
+                return
+            acc["requests"] += 1
+            acc["bytes"] += nbytes
+            if error:
+                acc["errors"] += 1
+            else:
+                acc["connect"] += connect
+                acc["ttfb"] += ttfb
+                acc["total"] += total
+
+    def _drain_passive(self, servers):
+        with self._passive_lock:
+            drained, self._passive = self._passive, {s: _empty_passive() for s in servers}
+        return {s: drained.get(s) or _empty_passive() for s in servers}
+
+    # ---------- readers ----------
+    def snapshot(self):
+        return self._snapshot
+
+    def rounds_since(self, round_no):
+        """
+        Copies of the rounds recorded after `round_no` (as far as retention
+        allows): returns (times, {metric: servers x k}, total_rounds).
+        """
+        with self._lock:
+            store = self.store
+            k = min(store.total_rounds - round_no, len(store))
+            k = max(k, 0)
+            times = store.times()[len(store) - k:].copy()
+            new = {m: store.window(m, k).copy() for m in store.metrics}
+            return times, new, store.total_rounds
+
+    # ---------- loop ----------
+    def _run(self, stop):
+        session_start = self._snapshot["session_start"]
+        rounds = self.config["rounds"]
+        profiler = RoundProfiler(self.config["profile_every"], self.config["profile_dir"])
+        round_idx = -1
+        try:
+            for round_idx in (range(rounds) if rounds else itertools.count()):
+                if stop.is_set():
+                    return
+                round_start = time.perf_counter()
+                profiler.round_started(round_idx)
+                try:
+                    self._round(round_idx, session_start, stop)
+                except Exception as e:
+                    with self._lock:
+                        self._snapshot = {**self._snapshot, "running": False, "error": str(e)}
+                    return
+                profiler.round_finished(round_idx)
+                if not rounds or round_idx < rounds - 1:
+                    stop.wait(max(0.0, self.config["interval"] - (time.perf_counter() - round_start)))
+        finally:
+            profiler.close(round_idx)
+
+        with self._lock:
+            self._snapshot = {**self._snapshot, "running": False, "session_end": _now()}
+
+    def _round(self, round_idx, session_start, stop):
+        cfg = dict(self.config)
+        servers = self.servers
+        stages = self.stages
+        mark = stages.start()
+        passive = self._drain_passive(servers)
+
+        # Servers carrying organic traffic are measured by it; only the idle
+        # ones, plus an occasional refresh of server-side load/health, are
+        # offered to the scheduler, which probes those that are due.
+        # Ejected servers are left out; half-open ones get a trial connect.
+        now = time.monotonic()
+        breakers = self.breakers
+        trials = breakers.trials(now)
+        candidates = [s for s in servers if breakers.closed(s) and (
+                      not passive[s]["requests"]
+                      or now - self._probed_at.get(s, float("-inf")) >= cfg["passive_refresh"])]
+        self.scheduler.configure(cfg["interval"], cfg["max_probe_interval"], cfg["probe_budget"])
+        to_probe = self.scheduler.due(now, candidates)
+        stats = self.stats
+        results = self.engine.probe_all(to_probe, deadline=cfg["deadline"]) if to_probe else {}
+        for server in to_probe:
+            ok = results[server].get("rtt") is not None
+            self._probed_at[server] = now
+            self._last_probe[server] = results[server]
+            breakers.record(server, ok, now)
+            stats["probes"][server] += 1
+            stats["probe_failures"][server] += not ok
+        for server in servers:
+            p = passive[server]
+            breakers.record_batch(server, p["requests"] - p["errors"], p["errors"], now)
+        if trials:
+            passed = self.engine.probe_all(trials, deadline=min(TRIAL_TIMEOUT, cfg["deadline"]),
+                                           probe_fn=trial_probe, on_timeout=lambda target: False)
+            for server in trials:
+                if breakers.record(server, passed[server], now):
+                    self.scheduler.wake(server)
+        mark = stages.lap("probe", mark)
+
+        rtts, err_rates = [], []
+        for server in servers:
+            if not breakers.closed(server):
+                # Ejected: not measured this round
+                rtts.append(None)
+                err_rates.append(None)
+                continue
+            p = passive[server]
+            if p["requests"]:
+                # Same quantity the probe would measure: connect time for
+                # raw TCP targets, time-to-first-byte for HTTP(S)
+                ok = p["requests"] - p["errors"]
+                rtt = p["ttfb"] if self._http[server] else p["connect"]
+                rtts.append(rtt / ok if ok else None)
+                err_rates.append(p["errors"] / p["requests"])
+                continue
+
+            # Servers not due this round keep their last probe's readings
+            m = self._last_probe.get(server, {})
+            handled = m.get("total_handled")
+            errors = m.get("total_errors")
+
+            handled = handled if isinstance(handled, (int, float)) and handled > 0 else 1
+            errors = errors if isinstance(errors, (int, float)) else 0
+            rtts.append(m.get("rtt"))
+            err_rates.append(errors / handled)
+
+        last = [self._last_probe.get(s, {}) for s in servers]
+        # Only this round's measurements; carried-forward readings are not new samples
+        fresh = set(to_probe)
+        for server, rtt in zip(servers, rtts):
+            if rtt is not None and (server in fresh or passive[server]["requests"]):
+                stats["rtt"][server].observe(rtt)
+
+        with self._lock:
+            if stop.is_set():
+                return
+            store = self.store
+            store.append(round_idx, {
+                "rtt": rtts,
+                "load": [m.get("load") for m in last],
+                "health": [m.get("health_score") for m in last],
+                "errors": err_rates,
+                "bandwidth": [m.get("bandwidth_mbps") for m in last]
+            })
+            mark = stages.lap("record", mark)
+
+            rtt_window = store.window("rtt", HISTORY_SIZE)
+            pred = predict_batch(
+                rtt_window,
+                store.window("load", HISTORY_SIZE),
+                store.window("health", HISTORY_SIZE),
+                store.window("errors", HISTORY_SIZE),
+                store.window("bandwidth", HISTORY_SIZE),
+                predict=cfg["predict"],
+                rtt_fallback=10.0
+            )
+            mark = stages.lap("predict", mark)
+            result = score_predictions(pred, rtt_window, weights=cfg["weights"], anomaly_penalty=1.0)
+            # Latency outliers against the rest of the fleet are ejected too;
+            # ejected servers score inf, so no policy routes to them
+            breakers.eject_outliers(mean_batch(rtt_window), now,
+                                    settle=HISTORY_SIZE * cfg["interval"])
+            ejected = np.array([not breakers.closed(s) for s in servers])
+            result["score"] = np.where(ejected, np.inf, result["score"])
+            scores = dict(zip(servers, result["score"].tolist()))
+            mark = stages.lap("score", mark)
+
+            self.policy.observe(result["score"])
+            best = self.policy.select()
+            self.selection_count[best] += 1
+            self.scheduler.reschedule(now, to_probe, scores,
+                                      failed=[s for s in to_probe if results[s].get("rtt") is None])
+            store.set_latest("chosen", [1.0 if s == best else 0.0 for s in servers])
+            self.probed = to_probe
+            self.passive = passive
+            mark = stages.lap("select", mark)
+
+            self._snapshot = self._build_snapshot(running=True, best=best, scores=scores,
+                                                  session_start=session_start, session_end=None)
+            self.prev_best = best
+            stages.lap("publish", mark)
+
+    def _stats_snapshot(self):
+        stats = self.stats
+        return {
+            "probes": dict(stats["probes"]),
+            "probe_failures": dict(stats["probe_failures"]),
+            "rtt": {s: h.state() for s, h in stats["rtt"].items()},
+            "stages": self.stages.state(),
+            "stage_last": dict(self.stages.last),
+        }
+
+    def _build_snapshot(self, running, best, scores, session_start, session_end):
+        store = self.store
+        return {
+            "running": running,
+            "round": store.total_rounds,
+            "rounds": self.config["rounds"],
+            "targets": list(self.targets),
+            "servers": list(self.servers),
+            "resolved": {t: list(ips) for t, ips in self.resolved.items()},
+            "best": best,
+            "prev_best": self.prev_best,
+            "policy": self.policy.name,
+            "scores": dict(scores),
+            "selection_count": dict(self.selection_count),
+            "stats": self._stats_snapshot(),
+            "probed": list(self.probed),
+            "probe_period": dict(self.scheduler.period),
+            "breakers": self.breakers.states(),
+            "simulated": {s: list(self._last_probe.get(s, {}).get("simulated", ())) for s in self.servers},
+            "agent": {s: "agent" in self._last_probe.get(s, {}) for s in self.servers},
+            "timing": {s: dict(self._last_probe.get(s, {}).get("timing") or {}) for s in self.servers},
+            "passive": {s: dict(p) for s, p in self.passive.items()},
+            "latest": {m: store.latest(m).tolist() for m in store.metrics},
+            "session_start": session_start,
+            "session_end": session_end,
+            "updated_at": time.time(),
+            "error": None,
+        }
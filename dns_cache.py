@@ -0,0 +1,123 @@
+# dns_cache.py
+# Resolver cache for probe and proxy targets
+#
+# getaddrinfo() does not expose record TTLs, so entries live for a fixed
+# ttl. Once refresh_ahead of it has passed, the next lookup still returns
+# the cached addresses and refreshes them on a background thread, so a
+# probe never waits on the resolver for a name it has seen. Failures are
+# cached for negative_ttl. Every A/AAAA record is kept, in resolver order.
+# resolve_async() is the same cache for asyncio code: a miss is looked up
+# on the loop's executor, so the event loop never blocks on DNS.
+
+import asyncio
+import ipaddress
+import math
+import socket
+import threading
+import time
+
+DEFAULT_TTL = 60.0
+NEGATIVE_TTL = 10.0
+REFRESH_AHEAD = 0.75     # fraction of the TTL after which hits trigger a background refresh
+
+
+class Resolver:
+    """
+    resolve(host, port) -> [(family, sockaddr), ...], or raises the cached
+    socket.gaierror. IP literals are returned without a lookup.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, negative_ttl=NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache = {}          # (host, port) -> (addresses | error, refresh_at, expires_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def resolve(self, host, port):
+        entry = self._cached((host, port))
+        if entry is None:
+            entry = self._lookup((host, port))
+        return _result(entry)
+
+    async def resolve_async(self, host, port):
+        """resolve() for event-loop code: a miss is looked up on the executor."""
+        entry = self._cached((host, port))
+        if entry is None:
+            entry = await asyncio.get_running_loop().run_in_executor(None, self._lookup, (host, port))
+        return _result(entry)
+
+    def _cached(self, key):
+        """The live cache entry for key (refreshing it ahead if due), or None."""
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is None:
+            literal = _literal(*key)
+            if literal is not None:
+                entry = self._cache[key] = (literal, math.inf, math.inf)
+        if entry is None or now >= entry[2]:
+            return None
+        self.hits += 1
+        if now >= entry[1] and not isinstance(entry[0], Exception):
+            self._refresh_later(key)
+        return entry
+
+    def addresses(self, host, port=0):
+        """Distinct IP strings for host, in resolver order."""
+        return list(dict.fromkeys(sockaddr[0] for _, sockaddr in self.resolve(host, port)))
+
+    def _lookup(self, key):
+        self.lookups += 1
+        now = time.monotonic()
+        try:
+            infos = socket.getaddrinfo(key[0], key[1], type=socket.SOCK_STREAM)
+            result = list(dict.fromkeys((family, sockaddr) for family, _, _, _, sockaddr in infos))
+            entry = (result, now + self.ttl * REFRESH_AHEAD, now + self.ttl)
+        except socket.gaierror as e:
+            entry = (e, now + self.negative_ttl, now + self.negative_ttl)
+        self._cache[key] = entry
+        return entry
+
+    def _refresh_later(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key,), daemon=True).start()
+
+    def _refresh(self, key):
+        try:
+            old = self._cache.get(key)
+            entry = self._lookup(key)
+            if isinstance(entry[0], Exception) and old is not None:
+                # Keep serving the last good answer until it expires; retry later
+                retry_at = min(time.monotonic() + self.negative_ttl, old[2])
+                self._cache[key] = (old[0], retry_at, old[2])
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        self._cache.clear()
+
+
+def _result(entry):
+    result = entry[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def _literal(host, port):
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return None
+    if ip.version == 6:
+        return [(socket.AF_INET6, (host, port, 0, 0))]
+    return [(socket.AF_INET, (host, port))]
+
+
+resolver = Resolver()
@@ -1,25 +1,27 @@
 # edge_server.py - ENHANCED VERSION
+import signal
 import socket
 import threading
 import random
 import time
 import sys
 import json
+import asyncio
+import argparse
+import multiprocessing
+from protocol import (HEADER, LEGACY_PING, PING_BINARY, IDLE_TIMEOUT, ProtocolError,
+                      encode_frame, encode_metrics, frame_length, recv_exact, read_exact)
+from server_stats import ServerStats
 
-if len(sys.argv) != 2:
-    print("Usage: python edge_server.py <PORT>")
-    sys.exit(1)
-
-PORT = int(sys.argv[1])
 HOST = '127.0.0.1'
+LISTEN_BACKLOG = 50
 
-# Persistent server state (shared across threads)
-state_lock = threading.Lock()
-current_load = random.randint(20, 40)
-connections_handled = 0
-active_connections = 0
-total_errors = 0
-request_queue = 0
+# Persistent server state (sharded, see server_stats.py)
+stats = ServerStats()
+stats.add(load=random.randint(20, 40))
+REQUEST_BEGIN = stats.delta(handled=1, active=1, queue=1)
+REQUEST_END = stats.delta(active=-1, queue=-1)
+REQUEST_ERROR = stats.delta(errors=1)
 
 # Enhanced parameters
 LOAD_INCREASE_MIN = 2
@@ -29,6 +31,8 @@ LOAD_DECREASE_MAX = 4
 BASE_LATENCY_MIN = 0.03
 BASE_LATENCY_MAX = 0.06
 LOAD_TO_LATENCY_FACTOR = 0.003
+LATENCY_OFFSET = 0.0  # added to every response (--latency-offset); lets a test fleet differ
+SEED = None           # --seed; None seeds from the OS
 
 # New: Jitter and packet loss simulation
 JITTER_MAX = 0.015  # max jitter in seconds
@@ -41,110 +45,190 @@ OVERLOAD_THRESHOLD = 85
 
 def simulate_packet_loss():
     """Simulate packet loss based on current load"""
-    loss_probability = PACKET_LOSS_BASE + (current_load * PACKET_LOSS_LOAD_FACTOR)
+    loss_probability = PACKET_LOSS_BASE + (stats.load() * PACKET_LOSS_LOAD_FACTOR)
     return random.random() < loss_probability
 
 def calculate_metrics():
     """Calculate comprehensive server metrics"""
-    with state_lock:
-        # Health score (0-100, higher is better)
-        health = 100 - current_load
-        if current_load > OVERLOAD_THRESHOLD:
-            health = max(0, health - 20)
-        if request_queue > MAX_QUEUE_SIZE * 0.7:
-            health -= 15
+    snap = stats.snapshot()
+    load, queue = snap['load'], snap['queue']
+    
+    # Health score (0-100, higher is better)
+    health = 100 - load
+    if load > OVERLOAD_THRESHOLD:
+        health = max(0, health - 20)
+    if queue > MAX_QUEUE_SIZE * 0.7:
+        health -= 15
+    
+    # Jitter calculation
+    jitter = random.uniform(0, JITTER_MAX) * (load / 100.0)
+    
+    return {
+        'load': load,
+        'active_connections': snap['active'],
+        'total_handled': snap['handled'],
+        'total_errors': snap['errors'],
+        'queue_depth': queue,
+        'health_score': max(0, min(100, health)),
+        'jitter': jitter
+    }
+
+def begin_request():
+    """Account for a newly accepted request"""
+    increase = random.randint(LOAD_INCREASE_MIN, LOAD_INCREASE_MAX)
+    stats.add(REQUEST_BEGIN, load=min(increase, max(0, 100 - stats.load())))
+
+def end_request():
+    """Release a finished request and let the load decay"""
+    decrease = random.randint(LOAD_DECREASE_MIN, LOAD_DECREASE_MAX)
+    stats.add(REQUEST_END, load=-min(decrease, max(0, stats.load() - 2)))
+
+def record_error():
+    stats.add(REQUEST_ERROR)
+
+def simulated_latency():
+    """Processing latency with load-dependent jitter"""
+    base_latency = random.uniform(BASE_LATENCY_MIN, BASE_LATENCY_MAX)
+    load = stats.load()
+    load_latency = load * LOAD_TO_LATENCY_FACTOR
+    jitter = random.uniform(-JITTER_MAX, JITTER_MAX) * (load / 100.0)
+    return max(0.01, base_latency + load_latency + jitter) + LATENCY_OFFSET
+
+def build_response(latency, binary=False):
+    metrics = calculate_metrics()
+    metrics['latency'] = latency
+    return encode_metrics(metrics) if binary else json.dumps(metrics).encode()
+
+def handle_request(conn, framed, binary=False):
+    """Serve one ping; returns False if the connection should be dropped"""
+    begin_request()
+    
+    try:
+        # Simulate packet loss
+        if simulate_packet_loss():
+            record_error()
+            return False
+        
+        # Simulate processing
+        latency = simulated_latency()
+        time.sleep(latency)
         
-        # Jitter calculation
-        jitter = random.uniform(0, JITTER_MAX) * (current_load / 100.0)
+        # Send JSON (or binary, if the client asked for it) response
+        response = build_response(latency, binary)
+        conn.sendall(encode_frame(response) if framed else response)
+        return True
         
-        return {
-            'load': current_load,
-            'active_connections': active_connections,
-            'total_handled': connections_handled,
-            'total_errors': total_errors,
-            'queue_depth': request_queue,
-            'health_score': max(0, min(100, health)),
-            'jitter': jitter
-        }
+    except Exception as e:
+        record_error()
+        return False
+    finally:
+        end_request()
 
 def handle_client(conn, addr):
-    global current_load, connections_handled, active_connections, total_errors, request_queue
-    
-    # Add to queue
-    with state_lock:
-        request_queue += 1
-        active_connections += 1
-        connections_handled += 1
-        current_load += random.randint(LOAD_INCREASE_MIN, LOAD_INCREASE_MAX)
-        if current_load > 100:
-            current_load = 100
-    
+    conn.settimeout(IDLE_TIMEOUT)
     try:
-        data = conn.recv(1024)
-        if not data:
+        header = recv_exact(conn, HEADER.size)
+        if header == LEGACY_PING:
+            # Legacy one-shot client: reply and close
+            handle_request(conn, framed=False)
             return
         
+        # Framed keep-alive client: serve requests until it disconnects
+        while header is not None:
+            payload = recv_exact(conn, frame_length(header))
+            if not handle_request(conn, framed=True, binary=payload == PING_BINARY):
+                return
+            header = recv_exact(conn, HEADER.size)
+    except (OSError, ProtocolError):
+        pass
+    finally:
+        conn.close()
+
+async def handle_request_async(writer, framed, binary=False):
+    """Same behaviour as handle_request, without holding a thread while sleeping"""
+    begin_request()
+    
+    try:
         # Simulate packet loss
         if simulate_packet_loss():
-            with state_lock:
-                total_errors += 1
-            conn.close()
-            return
-        
-        # Calculate latency with jitter
-        base_latency = random.uniform(BASE_LATENCY_MIN, BASE_LATENCY_MAX)
-        load_latency = current_load * LOAD_TO_LATENCY_FACTOR
-        jitter = random.uniform(-JITTER_MAX, JITTER_MAX) * (current_load / 100.0)
-        latency = max(0.01, base_latency + load_latency + jitter)
+            record_error()
+            return False
         
         # Simulate processing
-        time.sleep(latency)
-        
-        # Get comprehensive metrics
-        metrics = calculate_metrics()
-        metrics['latency'] = latency
+        latency = simulated_latency()
+        await asyncio.sleep(latency)
         
-        # Send JSON response
-        response = json.dumps(metrics)
-        conn.send(response.encode())
+        # Send JSON (or binary, if the client asked for it) response
+        response = build_response(latency, binary)
+        writer.write(encode_frame(response) if framed else response)
+        await writer.drain()
+        return True
         
     except Exception as e:
-        with state_lock:
-            total_errors += 1
+        record_error()
+        return False
     finally:
-        conn.close()
-        with state_lock:
-            request_queue = max(0, request_queue - 1)
-            decrease = random.randint(LOAD_DECREASE_MIN, LOAD_DECREASE_MAX)
-            current_load = max(2, current_load - decrease)
-            active_connections -= 1
+        end_request()
+
+async def handle_client_async(reader, writer):
+    try:
+        header = await read_exact(reader, HEADER.size)
+        if header == LEGACY_PING:
+            await handle_request_async(writer, framed=False)
+            return
+        
+        while header is not None:
+            payload = await read_exact(reader, frame_length(header))
+            if not await handle_request_async(writer, framed=True, binary=payload == PING_BINARY):
+                return
+            header = await read_exact(reader, HEADER.size)
+    except (OSError, ProtocolError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+
+def fluctuate_load():
+    load = stats.load()
+    stats.add(load=max(5, min(95, load + random.randint(-5, 5))) - load)
 
 def background_load_fluctuation():
     """Simulate realistic background load changes"""
-    global current_load
     while True:
         time.sleep(random.uniform(2, 5))
-        with state_lock:
-            # Random load fluctuation
-            change = random.randint(-5, 5)
-            current_load = max(5, min(95, current_load + change))
+        # Random load fluctuation
+        fluctuate_load()
 
-def start_server():
+async def background_load_fluctuation_async():
+    """Event-loop version of background_load_fluctuation"""
+    while True:
+        await asyncio.sleep(random.uniform(2, 5))
+        fluctuate_load()
+
+def bind_socket(port, reuse_port=False):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        # Every worker binds its own socket; the kernel spreads connections
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     
     try:
-        s.bind((HOST, PORT))
+        s.bind((HOST, port))
     except OSError as e:
-        print(f"Error binding to {HOST}:{PORT} -> {e}")
+        print(f"Error binding to {HOST}:{port} -> {e}")
         sys.exit(1)
     
-    s.listen(50)
-    print(f"[SERVER {PORT}] Running on {HOST}:{PORT} (initial load {current_load}%)")
+    s.listen(LISTEN_BACKLOG)
+    return s
+
+def start_server(port, worker=None):
+    """Thread-per-connection server"""
+    s = bind_socket(port, reuse_port=worker is not None)
+    print(f"[SERVER {port}] Running on {HOST}:{port} (threaded{_worker_label(worker)}, initial load {stats.load()}%)")
     
-    # Start background load fluctuation thread
-    bg_thread = threading.Thread(target=background_load_fluctuation, daemon=True)
-    bg_thread.start()
+    # Start background load fluctuation thread (the parent does this for workers)
+    if worker is None:
+        bg_thread = threading.Thread(target=background_load_fluctuation, daemon=True)
+        bg_thread.start()
     
     try:
         while True:
@@ -156,5 +240,95 @@ def start_server():
     finally:
         s.close()
 
+async def serve_async(port, worker=None):
+    s = bind_socket(port, reuse_port=worker is not None)
+    s.setblocking(False)
+    server = await asyncio.start_server(handle_client_async, sock=s)
+    print(f"[SERVER {port}] Running on {HOST}:{port} (async{_worker_label(worker)}, initial load {stats.load()}%)")
+    
+    bg_task = asyncio.create_task(background_load_fluctuation_async()) if worker is None else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if bg_task is not None:
+            bg_task.cancel()
+
+def start_server_async(port, worker=None):
+    """Single-threaded asyncio server"""
+    try:
+        asyncio.run(serve_async(port, worker))
+    except KeyboardInterrupt:
+        print("\n[SERVER] Shutting down")
+
+def _worker_label(worker):
+    return "" if worker is None else f", worker {worker[0] + 1}/{worker[1]}"
+
+def run_worker(shared, port, mode, worker):
+    """Entry point of one --workers process"""
+    global stats
+    stats = shared
+    stats.attach(worker[0] + 1)
+    # Forked workers would otherwise share one random sequence
+    random.seed(None if SEED is None else SEED + worker[0] + 1)
+    serve = start_server_async if mode == "async" else start_server
+    try:
+        serve(port, worker)
+    except KeyboardInterrupt:
+        pass
+
+def start_workers(port, mode, workers):
+    """
+    Fork `workers` processes that each accept on the same port through
+    SO_REUSEPORT; counters live in shared memory, one shard range per process.
+    """
+    global stats
+    ctx = multiprocessing.get_context("fork")
+    shared = ServerStats.shared(workers + 1)
+    shared.add(load=stats.load())
+    stats = shared
+    
+    procs = [ctx.Process(target=run_worker, args=(shared, port, mode, (i, workers)), daemon=True)
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    # Let `kill`/service managers shut down the pool cleanly too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        background_load_fluctuation()
+    except KeyboardInterrupt:
+        print("\n[SERVER] Shutting down workers")
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+        shared.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulated edge server")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--mode", choices=["async", "threaded"], default="threaded",
+                        help="connection handling model (default: threaded)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes sharing the port via SO_REUSEPORT (default: 1)")
+    parser.add_argument("--latency-offset", type=float, default=0.0,
+                        help="seconds added to every simulated response (default: 0)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the load/latency/loss simulation")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global LATENCY_OFFSET, SEED
+    args = parse_args(argv)
+    LATENCY_OFFSET, SEED = args.latency_offset, args.seed
+    random.seed(SEED)
+    if args.workers > 1:
+        start_workers(args.port, args.mode, args.workers)
+    elif args.mode == "async":
+        start_server_async(args.port)
+    else:
+        start_server(args.port)
+
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    main()
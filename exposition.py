@@ -0,0 +1,158 @@
+# exposition.py
+# Prometheus / OpenMetrics text exposition of collector snapshots
+#
+# Everything is rendered from one snapshot: gauges from its latest round,
+# counters from selection_count and the collector's probe totals, and
+# histograms (per-backend RTT, per-stage round time) from the bucket counts
+# the collector accumulates as rounds run (Histogram below; observe() is
+# a bisect and two adds). Rendering never touches the collector's history,
+# so a scrape costs one pass over the servers and can be cached per
+# snapshot.
+
+import bisect
+import math
+
+RTT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STAGE_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PREFIX = "nexus_"
+
+BACKEND_GAUGES = (
+    # (name, snapshot "latest" metric, help)
+    ("backend_rtt_seconds", "rtt", "Latest round trip time (connect, or TTFB for HTTP backends)"),
+    ("backend_load_percent", "load", "Latest reported server load"),
+    ("backend_health", "health", "Latest reported health score"),
+    ("backend_error_rate", "errors", "Latest error rate (errors / requests)"),
+    ("backend_bandwidth_mbps", "bandwidth", "Latest measured bandwidth"),
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram; state() is (per-bucket counts incl. +Inf, sum, count)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def state(self):
+        return tuple(self.counts), self.sum, self.count
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value):
+    if value is None:
+        return None
+    value = float(value)
+    if math.isnan(value):
+        return None
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if not value.is_integer() else str(int(value))
+
+
+def _float(value):
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class _Writer:
+    def __init__(self, openmetrics):
+        self.openmetrics = openmetrics
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        # Text format 0.0.4 names a counter family by its sample name;
+        # OpenMetrics drops the _total suffix
+        name = PREFIX + name
+        if kind == "counter" and not self.openmetrics:
+            name += "_total"
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, labels=None):
+        value = _number(value)
+        if value is not None:
+            self.lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+
+    def histogram(self, name, buckets, state, labels=None):
+        counts, total, count = state
+        labels = labels or {}
+        # OpenMetrics wants le as a canonical float ("1.0", not "1")
+        le = _float if self.openmetrics else _number
+        cumulative = 0
+        for bound, n in zip(buckets + (math.inf,), counts):
+            cumulative += n
+            self.sample(name + "_bucket", cumulative, {**labels, "le": le(bound)})
+        self.sample(name + "_sum", total, labels)
+        self.sample(name + "_count", count, labels)
+
+    def text(self):
+        if self.openmetrics:
+            self.lines.append("# EOF")
+        return "\n".join(self.lines) + "\n"
+
+
+def render(snap, openmetrics=False):
+    """The exposition text for one collector snapshot."""
+    w = _Writer(openmetrics)
+    servers = snap["servers"]
+    stats = snap["stats"]
+
+    w.family("running", "gauge", "1 while the collector is running rounds")
+    w.sample("running", int(snap["running"]))
+    w.family("rounds", "counter", "Monitoring rounds completed this session")
+    w.sample("rounds_total", snap["round"])
+
+    for name, metric, help_text in BACKEND_GAUGES:
+        w.family(name, "gauge", help_text)
+        for server, value in zip(servers, snap["latest"][metric]):
+            w.sample(name, value, {"backend": server})
+
+    w.family("backend_score", "gauge", "Latest score (lower is better; +Inf when ejected)")
+    for server in servers:
+        w.sample("backend_score", snap["scores"].get(server), {"backend": server})
+    w.family("backend_selected", "gauge", "1 for the backend selected in the latest round")
+    for server in servers:
+        w.sample("backend_selected", int(server == snap["best"]), {"backend": server})
+    w.family("backend_ejected", "gauge", "1 while the backend's circuit breaker is not closed")
+    for server in servers:
+        w.sample("backend_ejected", int(snap["breakers"][server]["state"] != "closed"), {"backend": server})
+
+    w.family("selections", "counter", "Rounds in which the backend was selected")
+    for server in servers:
+        w.sample("selections_total", snap["selection_count"].get(server, 0), {"backend": server})
+    w.family("probes", "counter", "Active probes sent to the backend")
+    for server in servers:
+        w.sample("probes_total", stats["probes"][server], {"backend": server})
+    w.family("probe_failures", "counter", "Active probes that got no RTT (timeout or error)")
+    for server in servers:
+        w.sample("probe_failures_total", stats["probe_failures"][server], {"backend": server})
+
+    w.family("round_rtt_seconds", "histogram", "RTT recorded for the backend each round (probe or passive)")
+    for server in servers:
+        w.histogram("round_rtt_seconds", RTT_BUCKETS, stats["rtt"][server], {"backend": server})
+    w.family("round_stage_seconds", "histogram", "Time per round spent in each collector stage")
+    for stage, state in stats["stages"].items():
+        w.histogram("round_stage_seconds", STAGE_BUCKETS, state, {"stage": stage})
+    return w.text()
@@ -0,0 +1,145 @@
+# http_probe.py
+# Lightweight HTTP(S) probes over pooled keep-alive connections
+#
+# A probe is a HEAD request (or a one-byte ranged GET, or a plain GET) on a
+# connection kept open per (scheme, host, port), so after the first probe
+# no DNS lookup, TCP handshake or TLS handshake is repeated and the TTFB
+# measures the server itself. Each stage is timed with perf_counter_ns;
+# stages a reused (or, for DNS, pinned) connection skipped are None.
+
+import http.client
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+
+MODES = {"head": "HEAD", "range": "GET", "get": "GET"}
+DEFAULT_MODE = "head"
+DEFAULT_TIMEOUT = 2.0
+MAX_BODY = 64 * 1024     # a body larger than this is not drained; the connection is dropped
+NS = 1e9
+
+
+def _getaddrinfo(host, port):
+    return [(family, sockaddr) for family, _, _, _, sockaddr in
+            socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+
+
+class HttpProber:
+    """
+    Probes URLs with keep-alive connections pooled per origin.
+
+    probe(url) returns {"status", "bytes", "reused", "dns", "connect",
+    "tls", "ttfb", "total"} with times in seconds, or raises OSError /
+    http.client.HTTPException. A 4xx/5xx status raises, except that a
+    server rejecting HEAD (405/501) is retried, and from then on probed,
+    with a ranged GET. `resolve(host, port)` -> [(family, sockaddr)]
+    looks names up (e.g. a dns_cache.Resolver); probe(url, ip) skips the
+    lookup and connects to that address, still sending the URL's host as
+    Host and TLS server name.
+    """
+
+    def __init__(self, mode=DEFAULT_MODE, timeout=DEFAULT_TIMEOUT, max_idle=2, resolve=_getaddrinfo):
+        if mode not in MODES:
+            raise ValueError(f"unknown probe mode {mode!r}; choose from {', '.join(MODES)}")
+        self.mode = mode
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.resolve = resolve
+        self.ssl_context = ssl.create_default_context()
+        self._idle = {}
+        self._no_head = set()
+        self._lock = threading.Lock()
+
+    def probe(self, url, ip=None):
+        parsed = urlparse(url)
+        https = parsed.scheme == "https"
+        origin = (parsed.scheme, parsed.hostname, parsed.port or (443 if https else 80), ip)
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+
+        mode = "range" if self.mode == "head" and origin in self._no_head else self.mode
+        result = self._probe(origin, path, mode)
+        if mode == "head" and result["status"] in (405, 501):
+            self._no_head.add(origin)
+            result = self._probe(origin, path, "range")
+        if result["status"] >= 400:
+            raise http.client.HTTPException(f"{url} answered {result['status']}")
+        return result
+
+    def _probe(self, origin, path, mode):
+        timing = {"dns": None, "connect": None, "tls": None}
+        start = time.perf_counter_ns()
+        conn = self._acquire(origin)
+        reused = conn is not None
+        if conn is None:
+            conn = self._connect(origin, timing)
+
+        headers = {"Range": "bytes=0-0"} if mode == "range" else {}
+        try:
+            sent = time.perf_counter_ns()
+            conn.request(MODES[mode], path, headers=headers)
+            resp = conn.getresponse()
+            first_byte = time.perf_counter_ns()
+            body = resp.read(MAX_BODY + 1)
+            end = time.perf_counter_ns()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            if reused:
+                # The server may have closed the idle connection; try the next one
+                return self._probe(origin, path, mode)
+            raise
+
+        if resp.will_close or not resp.isclosed():
+            conn.close()
+        else:
+            self._release(origin, conn)
+
+        timing.update(status=resp.status, bytes=len(body), reused=reused,
+                      ttfb=(first_byte - sent) / NS, total=(end - start) / NS)
+        return timing
+
+    def _connect(self, origin, timing):
+        scheme, host, port, ip = origin
+        t0 = time.perf_counter_ns()
+        family, sockaddr = self.resolve(ip or host, port)[0]
+        t1 = time.perf_counter_ns()
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(sockaddr)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            t2 = time.perf_counter_ns()
+            timing["dns"] = None if ip else (t1 - t0) / NS
+            timing["connect"] = (t2 - t1) / NS
+            if scheme == "https":
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=host)
+                timing["tls"] = (time.perf_counter_ns() - t2) / NS
+        except OSError:
+            sock.close()
+            raise
+
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        conn = cls(host, port, timeout=self.timeout)
+        conn.sock = sock
+        return conn
+
+    def _acquire(self, origin):
+        with self._lock:
+            idle = self._idle.get(origin)
+            return idle.pop() if idle else None
+
+    def _release(self, origin, conn):
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
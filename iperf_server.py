@@ -1,12 +1,13 @@
-# iperf_server.py - Enhanced edge server with iPerf bandwidth testing
+# iperf_server.py - Enhanced edge server with built-in bandwidth testing
 import socket
 import threading
 import random
 import time
 import sys
 import json
-import subprocess
-import os
+from protocol import (HEADER, LEGACY_PING, PING_BINARY, IDLE_TIMEOUT, ProtocolError,
+                      encode_frame, encode_metrics, frame_length, recv_exact)
+from throughput import ThroughputServer, measure_throughput
 
 if len(sys.argv) != 2:
     print("Usage: python iperf_server.py <PORT>")
@@ -15,8 +16,9 @@ if len(sys.argv) != 2:
 PORT = int(sys.argv[1])
 HOST = '127.0.0.1'
 
-# iPerf port will be PORT + 1000 (e.g., 8001 -> 9001)
+# Throughput test port is PORT + 1000 (e.g., 8001 -> 9001)
 IPERF_PORT = PORT + 1000
+SELF_TEST_INTERVAL = 60.0   # self-test only if no client tested for this long
 
 # Persistent server state
 state_lock = threading.Lock()
@@ -26,9 +28,8 @@ active_connections = 0
 total_errors = 0
 request_queue = 0
 
-# Bandwidth stats (from iPerf)
-bandwidth_mbps = 0.0
-last_bandwidth_test = time.time()
+# Bandwidth stats (measured by the throughput endpoint)
+throughput_server = ThroughputServer(HOST, IPERF_PORT)
 
 # Enhanced parameters
 LOAD_INCREASE_MIN = 2
@@ -44,44 +45,6 @@ PACKET_LOSS_LOAD_FACTOR = 0.0005
 MAX_QUEUE_SIZE = 20
 OVERLOAD_THRESHOLD = 85
 
-def start_iperf_server():
-    """Start iPerf3 server in the background"""
-    try:
-        # Start iperf3 server on IPERF_PORT
-        cmd = ['iperf3', '-s', '-p', str(IPERF_PORT), '-1']  # -1 means accept one connection then exit
-        
-        # Run in background, suppress output
-        if os.name == 'nt':  # Windows
-            subprocess.Popen(cmd, creationflags=subprocess.CREATE_NO_WINDOW, 
-                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        else:  # Linux/Mac
-            subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        print(f"[SERVER {PORT}] iPerf3 server started on port {IPERF_PORT}")
-        return True
-    except Exception as e:
-        print(f"[SERVER {PORT}] Warning: Could not start iPerf3: {e}")
-        return False
-
-def run_bandwidth_test():
-    """Simulate or measure actual bandwidth"""
-    global bandwidth_mbps
-    
-    try:
-        # Simulate bandwidth based on load (inverse relationship)
-        # Lower load = higher available bandwidth
-        base_bandwidth = 1000  # 1 Gbps base
-        load_factor = (100 - current_load) / 100.0
-        bandwidth_mbps = base_bandwidth * load_factor * random.uniform(0.8, 1.0)
-        
-        # Add some noise
-        bandwidth_mbps = max(50, bandwidth_mbps)  # Minimum 50 Mbps
-        
-    except Exception as e:
-        bandwidth_mbps = 500.0  # Default fallback
-    
-    return bandwidth_mbps
-
 def simulate_packet_loss():
     """Simulate packet loss based on current load"""
     loss_probability = PACKET_LOSS_BASE + (current_load * PACKET_LOSS_LOAD_FACTOR)
@@ -89,14 +52,7 @@ def simulate_packet_loss():
 
 def calculate_metrics():
     """Calculate comprehensive server metrics including bandwidth"""
-    global last_bandwidth_test, bandwidth_mbps
-    
     with state_lock:
-        # Update bandwidth every 5 seconds
-        if time.time() - last_bandwidth_test > 5:
-            bandwidth_mbps = run_bandwidth_test()
-            last_bandwidth_test = time.time()
-        
         # Health score (0-100, higher is better)
         health = 100 - current_load
         if current_load > OVERLOAD_THRESHOLD:
@@ -107,7 +63,7 @@ def calculate_metrics():
         # Jitter calculation
         jitter = random.uniform(0, JITTER_MAX) * (current_load / 100.0)
         
-        return {
+        metrics = {
             'load': current_load,
             'active_connections': active_connections,
             'total_handled': connections_handled,
@@ -115,14 +71,17 @@ def calculate_metrics():
             'queue_depth': request_queue,
             'health_score': max(0, min(100, health)),
             'jitter': jitter,
-            'bandwidth_mbps': round(bandwidth_mbps, 2),
             'iperf_port': IPERF_PORT
         }
-
-def handle_client(conn, addr):
-    global current_load, connections_handled, active_connections, total_errors, request_queue
     
-    # Add to queue
+    # Real throughput of the latest test, once one has completed
+    if throughput_server.last_mbps is not None:
+        metrics['bandwidth_mbps'] = round(throughput_server.last_mbps, 2)
+    return metrics
+
+def begin_request():
+    """Account for a newly received request"""
+    global current_load, connections_handled, active_connections, request_queue
     with state_lock:
         request_queue += 1
         active_connections += 1
@@ -130,18 +89,30 @@ def handle_client(conn, addr):
         current_load += random.randint(LOAD_INCREASE_MIN, LOAD_INCREASE_MAX)
         if current_load > 100:
             current_load = 100
+
+def end_request():
+    """Release a finished request and let the load decay"""
+    global current_load, active_connections, request_queue
+    with state_lock:
+        request_queue = max(0, request_queue - 1)
+        decrease = random.randint(LOAD_DECREASE_MIN, LOAD_DECREASE_MAX)
+        current_load = max(2, current_load - decrease)
+        active_connections -= 1
+
+def record_error():
+    global total_errors
+    with state_lock:
+        total_errors += 1
+
+def handle_request(conn, framed, binary=False):
+    """Serve one ping; returns False if the connection should be dropped"""
+    begin_request()
     
     try:
-        data = conn.recv(1024)
-        if not data:
-            return
-        
         # Simulate packet loss
         if simulate_packet_loss():
-            with state_lock:
-                total_errors += 1
-            conn.close()
-            return
+            record_error()
+            return False
         
         # Calculate latency with jitter
         base_latency = random.uniform(BASE_LATENCY_MIN, BASE_LATENCY_MAX)
@@ -156,20 +127,36 @@ def handle_client(conn, addr):
         metrics = calculate_metrics()
         metrics['latency'] = latency
         
-        # Send JSON response
-        response = json.dumps(metrics)
-        conn.send(response.encode())
+        # Send JSON (or binary, if the client asked for it) response
+        response = encode_metrics(metrics) if binary else json.dumps(metrics).encode()
+        conn.sendall(encode_frame(response) if framed else response)
+        return True
         
     except Exception as e:
-        with state_lock:
-            total_errors += 1
+        record_error()
+        return False
+    finally:
+        end_request()
+
+def handle_client(conn, addr):
+    conn.settimeout(IDLE_TIMEOUT)
+    try:
+        header = recv_exact(conn, HEADER.size)
+        if header == LEGACY_PING:
+            # Legacy one-shot client: reply and close
+            handle_request(conn, framed=False)
+            return
+        
+        # Framed keep-alive client: serve requests until it disconnects
+        while header is not None:
+            payload = recv_exact(conn, frame_length(header))
+            if not handle_request(conn, framed=True, binary=payload == PING_BINARY):
+                return
+            header = recv_exact(conn, HEADER.size)
+    except (OSError, ProtocolError):
+        pass
     finally:
         conn.close()
-        with state_lock:
-            request_queue = max(0, request_queue - 1)
-            decrease = random.randint(LOAD_DECREASE_MIN, LOAD_DECREASE_MAX)
-            current_load = max(2, current_load - decrease)
-            active_connections -= 1
 
 def background_load_fluctuation():
     """Simulate realistic background load changes"""
@@ -181,16 +168,25 @@ def background_load_fluctuation():
             change = random.randint(-5, 5)
             current_load = max(5, min(95, current_load + change))
 
-def periodic_bandwidth_update():
-    """Periodically update bandwidth measurements"""
-    global bandwidth_mbps
+def periodic_self_test():
+    """Measure loopback throughput at startup and whenever no client has tested recently"""
     while True:
-        time.sleep(5)
-        bandwidth_mbps = run_bandwidth_test()
+        last = throughput_server.last_test_at
+        if last is None or time.time() - last >= SELF_TEST_INTERVAL:
+            try:
+                measure_throughput(HOST, IPERF_PORT)
+            except (OSError, ConnectionError) as e:
+                print(f"[SERVER {PORT}] Bandwidth self-test failed: {e}")
+        time.sleep(SELF_TEST_INTERVAL / 4)
 
 def start_server():
-    # Start iPerf server
-    iperf_started = start_iperf_server()
+    # Start the throughput test endpoint
+    try:
+        throughput_server.start()
+        bandwidth_started = True
+    except OSError as e:
+        print(f"[SERVER {PORT}] Warning: Could not start bandwidth endpoint on {IPERF_PORT}: {e}")
+        bandwidth_started = False
     
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -204,26 +200,17 @@ def start_server():
     s.listen(50)
     print(f"[SERVER {PORT}] Running on {HOST}:{PORT}")
     print(f"[SERVER {PORT}] Metrics endpoint: {PORT}")
-    if iperf_started:
-        print(f"[SERVER {PORT}] iPerf endpoint: {IPERF_PORT}")
+    if bandwidth_started:
+        print(f"[SERVER {PORT}] Bandwidth endpoint: {IPERF_PORT}")
     print(f"[SERVER {PORT}] Initial load: {current_load}%")
     
     # Start background threads
     bg_thread = threading.Thread(target=background_load_fluctuation, daemon=True)
     bg_thread.start()
     
-    bw_thread = threading.Thread(target=periodic_bandwidth_update, daemon=True)
-    bw_thread.start()
-    
-    # Restart iPerf server thread (since -1 flag exits after one connection)
-    def restart_iperf():
-        while True:
-            time.sleep(10)
-            start_iperf_server()
-    
-    if iperf_started:
-        iperf_restart_thread = threading.Thread(target=restart_iperf, daemon=True)
-        iperf_restart_thread.start()
+    if bandwidth_started:
+        bw_thread = threading.Thread(target=periodic_self_test, daemon=True)
+        bw_thread.start()
     
     try:
         while True:
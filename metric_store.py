@@ -0,0 +1,86 @@
+# metric_store.py
+# Fixed-memory metric history backed by preallocated NumPy ring buffers
+
+import math
+import numpy as np
+
+METRICS = ("rtt", "load", "health", "errors", "bandwidth", "chosen")
+
+
+class MetricStore:
+    """
+    Per-round samples for every server and metric in one
+    (servers x metrics x capacity) float array.
+
+    Each sample is written twice, at `pos` and `pos + capacity`, so the most
+    recent n samples are always a contiguous slice: window() and history()
+    return views, never copies. Memory is fixed at construction; samples
+    older than `capacity` rounds are overwritten. Missing values are NaN.
+    """
+
+    def __init__(self, servers, capacity=3600, metrics=METRICS):
+        self.servers = list(servers)
+        self.metrics = tuple(metrics)
+        self.capacity = max(1, int(capacity))
+        self._server_index = {s: i for i, s in enumerate(self.servers)}
+        self._metric_index = {m: i for i, m in enumerate(self.metrics)}
+        self._data = np.full((len(self.servers), len(self.metrics), 2 * self.capacity), np.nan)
+        self._time = np.full(2 * self.capacity, np.nan)
+        self.total_rounds = 0
+
+    @classmethod
+    def for_retention(cls, servers, retention_seconds, interval, metrics=METRICS):
+        """Size the buffer to hold `retention_seconds` of rounds at `interval`."""
+        return cls(servers, math.ceil(retention_seconds / max(interval, 1e-3)), metrics)
+
+    def __len__(self):
+        return min(self.total_rounds, self.capacity)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes + self._time.nbytes
+
+    def append(self, timestamp, values):
+        """
+        Record one round. `values` maps metric name to a sequence aligned
+        with `servers`; metrics left out are stored as NaN.
+        """
+        pos = self.total_rounds % self.capacity
+        column = np.full((len(self.servers), len(self.metrics)), np.nan)
+        for metric, vals in values.items():
+            column[:, self._metric_index[metric]] = [np.nan if v is None else v for v in vals]
+        self._data[:, :, pos] = column
+        self._data[:, :, pos + self.capacity] = column
+        self._time[pos] = self._time[pos + self.capacity] = timestamp
+        self.total_rounds += 1
+
+    def set_latest(self, metric, vals):
+        """Overwrite `metric` for the most recent round (e.g. the selection)."""
+        pos = (self.total_rounds - 1) % self.capacity
+        m = self._metric_index[metric]
+        self._data[:, m, pos] = self._data[:, m, pos + self.capacity] = vals
+
+    def _span(self, n):
+        n = min(n, len(self))
+        end = (self.total_rounds - 1) % self.capacity + self.capacity + 1
+        return slice(end - n, end)
+
+    def window(self, metric, n):
+        """View of the last n samples of `metric`, shape (servers, <=n)."""
+        return self._data[:, self._metric_index[metric], self._span(n)]
+
+    def history(self, metric):
+        """View of every retained sample of `metric`, oldest first."""
+        return self.window(metric, self.capacity)
+
+    def server_history(self, server, metric):
+        return self.history(metric)[self._server_index[server]]
+
+    def latest(self, metric):
+        """Newest value of `metric` per server (NaN before the first round)."""
+        if not self.total_rounds:
+            return np.full(len(self.servers), np.nan)
+        return self.window(metric, 1)[:, 0]
+
+    def times(self):
+        return self._time[self._span(self.capacity)]
@@ -0,0 +1,200 @@
+# metrics_agent.py - Real host metrics for probe.py, read from /proc
+#
+# Run one per backend host:  python metrics_agent.py [--port 9100]
+#
+# A sampler thread reads /proc/loadavg, /proc/stat and /proc/net/dev once a
+# second; CPU use and interface throughput are deltas between samples.
+# One port speaks both protocols, told apart by the first four bytes:
+#   GET /metrics HTTP/1.x   -> JSON over HTTP
+#   framed ping / b"ping"   -> JSON over the edge-server protocol
+# The framed reply is always JSON: the binary METRICS_RECORD carries edge
+# server fields, not host ones (parse_metrics reads either).
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+from protocol import (HEADER, LEGACY_PING, IDLE_TIMEOUT, ProtocolError,
+                      encode_frame, frame_length, recv_exact)
+
+HOST = '0.0.0.0'
+AGENT_PORT = 9100
+SAMPLE_INTERVAL = 1.0
+PROC = "/proc"
+SYS_NET = "/sys/class/net"
+HTTP_GET = b"GET "
+
+
+def read_loadavg():
+    with open(f"{PROC}/loadavg") as f:
+        return [float(x) for x in f.read().split()[:3]]
+
+
+def read_cpu_times():
+    """(busy, total) jiffies summed over all CPUs, from the first line of /proc/stat."""
+    with open(f"{PROC}/stat") as f:
+        fields = [int(x) for x in f.readline().split()[1:]]
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)    # idle + iowait
+    total = sum(fields[:8])                                      # guest time is already in user
+    return total - idle, total
+
+
+def read_net_bytes(interfaces=None):
+    """{interface: (rx_bytes, tx_bytes)} from /proc/net/dev, loopback excluded."""
+    out = {}
+    with open(f"{PROC}/net/dev") as f:
+        for line in f.readlines()[2:]:
+            name, data = line.split(":", 1)
+            name = name.strip()
+            if name == "lo" or (interfaces and name not in interfaces):
+                continue
+            fields = data.split()
+            out[name] = (int(fields[0]), int(fields[8]))
+    return out
+
+
+def read_link_speed(interface):
+    """Link speed in Mbps from /sys, or None (virtual interfaces report none)."""
+    try:
+        with open(f"{SYS_NET}/{interface}/speed") as f:
+            speed = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return speed if speed > 0 else None
+
+
+class HostSampler:
+    """Samples the host every SAMPLE_INTERVAL; metrics() is the latest reading."""
+
+    def __init__(self, interfaces=None, interval=SAMPLE_INTERVAL):
+        self.interfaces = interfaces
+        self.interval = interval
+        self.cpu_count = os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._prev = None
+
+    def start(self):
+        self.sample()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except (OSError, ValueError) as e:
+                print(f"[AGENT] Sample failed: {e}")
+
+    def sample(self):
+        now = time.monotonic()
+        busy, total = read_cpu_times()
+        net = read_net_bytes(self.interfaces)
+        load1, load5, load15 = read_loadavg()
+        metrics = {
+            'loadavg': [load1, load5, load15],
+            'cpu_count': self.cpu_count,
+            'sampled_at': time.time(),
+        }
+
+        prev = self._prev
+        self._prev = (now, busy, total, net)
+        if prev is not None:
+            dt = now - prev[0]
+            spent = total - prev[2]
+            if spent > 0:
+                metrics['load'] = round(100.0 * (busy - prev[1]) / spent, 1)
+            rx = sum(net[i][0] - prev[3][i][0] for i in net if i in prev[3])
+            tx = sum(net[i][1] - prev[3][i][1] for i in net if i in prev[3])
+            metrics['rx_mbps'] = round(rx * 8 / dt / 1e6, 3)
+            metrics['tx_mbps'] = round(tx * 8 / dt / 1e6, 3)
+
+            # Headroom on links with a known speed (full duplex: the busier direction)
+            speeds = [read_link_speed(i) for i in net]
+            if speeds and all(speeds):
+                used = max(metrics['rx_mbps'], metrics['tx_mbps'])
+                metrics['link_mbps'] = sum(speeds)
+                metrics['bandwidth_mbps'] = round(max(0.0, sum(speeds) - used), 2)
+
+        with self._lock:
+            self._metrics = metrics
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metrics)
+
+
+def http_response(status, body, content_type="application/json"):
+    head = (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+    return head.encode() + body
+
+
+def handle_http(conn, sampler):
+    request = b""
+    while b"\r\n" not in request:
+        chunk = conn.recv(4096)
+        if not chunk:
+            return
+        request += chunk
+    path = request.split(b"\r\n", 1)[0].split(b" ")[0]
+    if path in (b"/", b"/metrics"):
+        conn.sendall(http_response("200 OK", json.dumps(sampler.metrics()).encode()))
+    else:
+        conn.sendall(http_response("404 Not Found", b"not found\n", "text/plain"))
+
+
+def handle_client(conn, sampler):
+    conn.settimeout(IDLE_TIMEOUT)
+    try:
+        header = recv_exact(conn, HEADER.size)
+        if header == HTTP_GET:
+            handle_http(conn, sampler)
+            return
+        if header == LEGACY_PING:
+            conn.sendall(json.dumps(sampler.metrics()).encode())
+            return
+
+        # Framed keep-alive client: any request payload gets the metrics
+        while header is not None:
+            recv_exact(conn, frame_length(header))
+            conn.sendall(encode_frame(json.dumps(sampler.metrics()).encode()))
+            header = recv_exact(conn, HEADER.size)
+    except (OSError, ProtocolError):
+        pass
+    finally:
+        conn.close()
+
+
+def serve(host, port, sampler):
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind((host, port))
+    s.listen(64)
+    print(f"[AGENT] Serving host metrics on {host}:{port} (HTTP GET /metrics or framed ping)")
+    while True:
+        conn, _ = s.accept()
+        threading.Thread(target=handle_client, args=(conn, sampler), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host metrics agent for probe.py")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=AGENT_PORT)
+    parser.add_argument("--interface", action="append", dest="interfaces",
+                        help="interface(s) to count (default: all but loopback)")
+    args = parser.parse_args()
+
+    sampler = HostSampler(args.interfaces)
+    sampler.start()
+    try:
+        serve(args.host, args.port, sampler)
+    except KeyboardInterrupt:
+        print("\n[AGENT] Shutting down...")
+
+
+if __name__ == "__main__":
+    main()
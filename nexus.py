@@ -0,0 +1,291 @@
+# nexus.py - Headless Nexus load-balancer daemon
+#
+# Usage: python nexus.py [SERVER ...] [--listen 127.0.0.1:8500] [--interval 1.0] ...
+#
+# Runs the collector's probe -> score -> select loop continuously (the same
+# Collector, scoring and policies the dashboard uses) and serves its state
+# as JSON on a local HTTP API:
+#
+#   GET  /health             {"ok": true, "running": ...}
+#   GET  /state              latest snapshot
+#   GET  /rounds?since=N     rounds recorded after round N (chart data)
+#   GET  /metrics            Prometheus / OpenMetrics exposition (see exposition.py)
+#   POST /config             {"servers": [...], "interval": 2.0, ...}
+#   POST /start | /stop | /reset
+#
+# Non-finite numbers (inf scores, NaN metrics) are sent as null. app.py
+# becomes a thin reader of this API when NEXUS_URL points at a daemon.
+
+import argparse
+import json
+import math
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from collector import Collector, DEFAULT_CONFIG
+from exposition import render, PROMETHEUS_TYPE, OPENMETRICS_TYPE
+from policies import POLICIES, DEFAULT_POLICY
+from scoring import DEFAULT_WEIGHTS
+
+DEFAULT_LISTEN = "127.0.0.1:8500"
+DEFAULT_SERVERS = ["127.0.0.1:8001", "127.0.0.1:8002", "127.0.0.1:8003"]
+MAX_BODY = 64 * 1024
+
+
+def jsonable(obj):
+    """Plain JSON types; arrays become lists and inf/NaN become None."""
+    if isinstance(obj, np.ndarray):
+        obj = obj.tolist()
+    if isinstance(obj, dict):
+        return {k: jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [jsonable(v) for v in obj]
+    if isinstance(obj, (float, np.floating)):
+        return float(obj) if math.isfinite(obj) else None
+    if isinstance(obj, np.integer):
+        return int(obj)
+    return obj
+
+
+def encode(obj):
+    return json.dumps(jsonable(obj), allow_nan=False).encode()
+
+
+def _number(key, value, kind=float, low=None, high=None, positive=False):
+    # bool is an int subclass; "true" is not a number either
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{key} must be a number")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a number") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{key} must be finite")
+    if kind is int:
+        if not number.is_integer():
+            raise ValueError(f"{key} must be a whole number")
+        number = int(number)
+    if positive and number <= 0:
+        raise ValueError(f"{key} must be positive")
+    if low is not None and number < low:
+        raise ValueError(f"{key} must be at least {low}")
+    if high is not None and number > high:
+        raise ValueError(f"{key} must be at most {high}")
+    return number
+
+
+def _optional(check):
+    return lambda key, value: None if value is None else check(key, value)
+
+
+def _choice(options):
+    def check(key, value):
+        if value not in options:
+            raise ValueError(f"{key} must be one of {', '.join(options)}")
+        return value
+    return check
+
+
+def _flag(key, value):
+    if not isinstance(value, bool):
+        raise ValueError(f"{key} must be true or false")
+    return value
+
+
+def _text(key, value):
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"{key} must be a non-empty string")
+    return value
+
+
+def _weights(key, value):
+    if not isinstance(value, dict):
+        raise ValueError(f"{key} must be an object")
+    unknown = set(value) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"unknown weights: {', '.join(sorted(unknown))}")
+    return {k: _number(f"weights.{k}", v, low=0.0) for k, v in value.items()}
+
+
+def _servers(key, value):
+    if not isinstance(value, list) or not value:
+        raise ValueError(f"{key} must be a non-empty list")
+    return [_text(key, v) for v in value]
+
+
+CONFIG_CHECKS = {
+    "rounds": _optional(lambda k, v: _number(k, v, int, positive=True)),
+    "interval": lambda k, v: _number(k, v, positive=True),
+    "deadline": lambda k, v: _number(k, v, positive=True),
+    "retention": lambda k, v: _number(k, v, int, positive=True),
+    "weights": _weights,
+    "policy": _choice(list(POLICIES)),
+    "eps": lambda k, v: _number(k, v, low=0.0, high=1.0),
+    "anti_stick": lambda k, v: _number(k, v, low=0.0),
+    "passive_refresh": lambda k, v: _number(k, v, positive=True),
+    "max_probe_interval": lambda k, v: _number(k, v, positive=True),
+    "probe_budget": _optional(lambda k, v: _number(k, v, positive=True)),
+    "expand_dns": _flag,
+    "predict": _choice(["mean", "hybrid"]),
+    "profile_every": lambda k, v: _number(k, v, int, low=0),
+    "profile_dir": _text,
+    "servers": _servers,
+}
+
+
+def validate_config(body):
+    """Settings from a POST /config body, coerced to their types; ValueError if invalid."""
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    unknown = set(body) - set(CONFIG_CHECKS)
+    if unknown:
+        raise ValueError(f"unknown settings: {', '.join(sorted(unknown))}")
+    return {key: CONFIG_CHECKS[key](key, value) for key, value in body.items()}
+
+
+class NexusAPI:
+    """The HTTP API's view of one collector; the snapshot is encoded once per round."""
+
+    def __init__(self, collector):
+        self.collector = collector
+        self._lock = threading.Lock()
+        self._encoded = (None, b"")
+        self._exposition = {}     # openmetrics -> (snapshot, text)
+
+    def state(self):
+        snap = self.collector.snapshot()
+        with self._lock:
+            if self._encoded[0] is not snap:
+                self._encoded = (snap, encode(snap))
+            return self._encoded[1]
+
+    def metrics(self, openmetrics=False):
+        snap = self.collector.snapshot()
+        with self._lock:
+            cached = self._exposition.get(openmetrics)
+            if cached is None or cached[0] is not snap:
+                cached = self._exposition[openmetrics] = (snap, render(snap, openmetrics).encode())
+            return cached[1]
+
+    def rounds(self, since):
+        times, new, total = self.collector.rounds_since(since)
+        return encode({"times": times, "metrics": new, "total": total})
+
+    def configure(self, body):
+        self.collector.configure(**validate_config(body))
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                self._send(200, encode({"ok": True, "running": api.collector.running}))
+            elif url.path == "/state":
+                self._send(200, api.state())
+            elif url.path == "/metrics":
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                self._send(200, api.metrics(openmetrics),
+                           OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+            elif url.path == "/rounds":
+                try:
+                    since = int(parse_qs(url.query).get("since", ["0"])[0])
+                except ValueError:
+                    return self._error(400, "since must be an integer")
+                self._send(200, api.rounds(since))
+            else:
+                self._error(404, f"no such endpoint {url.path}")
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY:
+                return self._error(413, "request body too large")
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw) if raw else {}
+            except ValueError:
+                return self._error(400, "body is not JSON")
+
+            collector = api.collector
+            try:
+                if path == "/config":
+                    api.configure(body)
+                elif path == "/start":
+                    collector.start()
+                elif path == "/stop":
+                    collector.stop()
+                elif path == "/reset":
+                    collector.reset()
+                else:
+                    return self._error(404, f"no such endpoint {path}")
+            except (TypeError, ValueError) as e:
+                return self._error(400, str(e))
+            self._send(200, encode({"ok": True, "running": collector.running}))
+
+        def _error(self, status, message):
+            self._send(status, encode({"ok": False, "error": message}))
+
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Nexus load-balancer daemon")
+    parser.add_argument("servers", nargs="*", default=DEFAULT_SERVERS, help="backends (URL or IP:PORT)")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN, help="API address (HOST:PORT)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_CONFIG["interval"], help="round interval (seconds)")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_CONFIG["deadline"], help="probe round deadline (seconds)")
+    parser.add_argument("--retention", type=int, default=DEFAULT_CONFIG["retention"], help="history kept (minutes)")
+    parser.add_argument("--policy", choices=list(POLICIES), default=DEFAULT_POLICY)
+    parser.add_argument("--predict", choices=["mean", "hybrid"], default=DEFAULT_CONFIG["predict"])
+    parser.add_argument("--probe-budget", type=float, default=None, help="probes per second, all servers")
+    parser.add_argument("--profile", type=int, default=0, metavar="N",
+                        help="cProfile every N rounds into --profile-dir")
+    parser.add_argument("--profile-dir", default=DEFAULT_CONFIG["profile_dir"])
+    parser.add_argument("--no-start", action="store_true", help="wait for POST /start")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    collector = Collector(args.servers, rounds=None, interval=args.interval, deadline=args.deadline,
+                          retention=args.retention, policy=args.policy, predict=args.predict,
+                          probe_budget=args.probe_budget, profile_every=args.profile,
+                          profile_dir=args.profile_dir)
+    host, _, port = args.listen.rpartition(":")
+    server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), make_handler(NexusAPI(collector)))
+    server.daemon_threads = True
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if not args.no_start:
+        collector.start()
+    print(f"[NEXUS] Monitoring {', '.join(collector.servers)} ({args.policy}); "
+          f"API on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        print("\n[NEXUS] Shutting down...")
+    finally:
+        collector.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# nexus_client.py
+# Read-mostly client for the nexus daemon's HTTP API
+#
+# RemoteCollector mirrors the parts of Collector the dashboard uses
+# (snapshot, rounds_since, configure, start, stop, reset), so app.py and
+# charts.py work the same against a daemon or an in-process collector.
+
+import json
+import math
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+DEFAULT_URL = "http://127.0.0.1:8500"
+TIMEOUT = 2.0
+
+
+class NexusError(Exception):
+    pass
+
+
+def _nan(values):
+    return [math.nan if v is None else v for v in values]
+
+
+class RemoteCollector:
+    """A nexus daemon seen through its API; nulls are turned back into NaN/inf."""
+
+    def __init__(self, url=DEFAULT_URL, timeout=TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    @classmethod
+    def connect(cls, url=DEFAULT_URL, timeout=TIMEOUT):
+        """A RemoteCollector if a daemon answers at url, else None."""
+        remote = cls(url, timeout)
+        try:
+            remote._call("GET", "/health")
+        except (OSError, NexusError):
+            return None
+        return remote
+
+    def _call(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error")
+            except ValueError:
+                message = None
+            raise NexusError(message or f"{method} {path} failed with {e.code}") from None
+
+    # ---------- readers ----------
+    def snapshot(self):
+        snap = self._call("GET", "/state")
+        snap["latest"] = {m: _nan(vals) for m, vals in snap["latest"].items()}
+        snap["scores"] = {s: math.inf if v is None else v for s, v in snap["scores"].items()}
+        return snap
+
+    def rounds_since(self, round_no):
+        data = self._call("GET", f"/rounds?since={int(round_no)}")
+        times = np.array(_nan(data["times"]), dtype=float)
+        new = {m: np.array([_nan(row) for row in rows], dtype=float).reshape(len(rows), len(times))
+               for m, rows in data["metrics"].items()}
+        return times, new, data["total"]
+
+    @property
+    def running(self):
+        return self._call("GET", "/health")["running"]
+
+    @property
+    def targets(self):
+        return self.snapshot()["targets"]
+
+    # ---------- control ----------
+    def configure(self, servers=None, **config):
+        body = dict(config)
+        if servers is not None:
+            body["servers"] = list(servers)
+        self._call("POST", "/config", body)
+
+    def start(self):
+        self._call("POST", "/start")
+
+    def stop(self):
+        self._call("POST", "/stop")
+
+    def reset(self):
+        self._call("POST", "/reset")
@@ -0,0 +1,268 @@
+# policies.py
+# Server selection policies shared by the collector, the proxy and client.py
+#
+# Every policy sees the scorer's output (lower is better, inf = unusable)
+# aligned with its server list. observe() feeds each new round of scores and
+# updates the policy's routing index incrementally; select() then decides
+# from that index, so per-request routing costs O(1) or O(log n) for every
+# policy (UCB1 and Thompson re-key only the server they picked; see their
+# docstrings). acquire()/release() bracket a request so policies can count
+# outstanding work.
+
+import math
+import random
+
+import numpy as np
+
+from routing_index import RoutingIndex, SumTree, INF
+
+UCB_STALENESS = 1.01   # UCB1 re-keys every server once sqrt(ln t) has grown this much
+
+
+def _inverse(score):
+    # Exploration weight, as the original bandit: 1 / clip(score, 1e-6)
+    return 1.0 / max(score, 1e-6) if score < INF else 0.0
+
+
+class Policy:
+    """Base policy: pure argmin of the current scores, O(1) per decision."""
+
+    name = "greedy"
+
+    def __init__(self, servers, **params):
+        self.servers = list(servers)
+        self.position = {s: i for i, s in enumerate(self.servers)}
+        n = len(self.servers)
+        self.scores = [INF] * n
+        self.picks = np.zeros(n)
+        self.outstanding = [0] * n
+        self.total = 0
+        self.prev = None
+        self.tree = RoutingIndex(self.scores)
+
+    def observe(self, scores):
+        """New scores from the scorer; only entries that changed touch the index."""
+        scores = np.nan_to_num(np.asarray(scores, dtype=float), nan=INF, posinf=INF)
+        for i, score in enumerate(scores.tolist()):
+            if score != self.scores[i]:
+                self.scores[i] = score
+                self._rescore(i, score)
+
+    def _rescore(self, i, score):
+        self.tree.update(i, score)
+
+    def select(self):
+        i = self._choose()
+        self.picks[i] += 1
+        self.total += 1
+        self._picked(i)
+        self.prev = self.servers[i]
+        return self.prev
+
+    def _choose(self):
+        return self.tree.best()
+
+    def _picked(self, i):
+        pass
+
+    def acquire(self, server):
+        self.outstanding[self.position[server]] += 1
+
+    def release(self, server):
+        i = self.position.get(server)
+        if i is not None and self.outstanding[i] > 0:
+            self.outstanding[i] -= 1
+
+
+class EpsilonGreedy(Policy):
+    """
+    The dashboard's original bandit: with probability ε explore, drawing a
+    server with probability proportional to 1/score, otherwise exploit;
+    the previous pick carries an anti-stickiness penalty either way.
+    Both paths are O(log n) reads of the index (a runner-up lookup and a
+    rejection step apply the penalty).
+    """
+
+    name = "epsilon-greedy"
+
+    def __init__(self, servers, epsilon=0.2, anti_stick=0.03, **params):
+        super().__init__(servers)
+        self.epsilon = epsilon
+        self.anti_stick = anti_stick
+        self.weights = SumTree([0.0] * len(self.servers))
+
+    def _rescore(self, i, score):
+        self.tree.update(i, score)
+        self.weights.update(i, _inverse(score))
+
+    def _choose(self):
+        p = self.position.get(self.prev)
+        penalty = self.anti_stick if p is not None else 0.0
+
+        if random.random() < self.epsilon:
+            # Rejection sampling: the previous pick is kept with probability
+            # w(score + penalty) / w(score), so nothing is re-keyed.
+            while True:
+                i = self.weights.sample()
+                if i is None:
+                    break
+                if i != p or not penalty:
+                    return i
+                w = self.weights.weight(p)
+                if w > 0 and random.random() * w < _inverse(self.scores[p] + penalty):
+                    return i
+
+        best = self.tree.best()
+        if best == p and penalty:
+            other = self.tree.runner_up(p)
+            if other is not None:
+                penalized = self.scores[p] + penalty
+                if self.scores[other] < penalized or (self.scores[other] == penalized and other < p):
+                    return other
+        return best
+
+
+class UCB1(Policy):
+    """
+    Optimism under uncertainty: score minus an exploration bonus
+    c * sqrt(2 ln t / picks) that shrinks as a server is chosen more.
+    Servers never picked go first. The index is keyed on each server's
+    bound; a pick only changes the picked server's, so that one is
+    re-keyed in O(log n). The shared ln t term is refreshed for all
+    servers at once, in O(n), whenever sqrt(ln t) has grown by
+    UCB_STALENESS since the last refresh: O(log log t) refreshes in all.
+    """
+
+    name = "ucb1"
+
+    def __init__(self, servers, ucb_c=0.1, **params):
+        super().__init__(servers)
+        self.c = ucb_c
+        self.log_t = 0.0
+
+    def _key(self, i):
+        score = self.scores[i]
+        picks = self.picks[i]
+        if not picks:
+            return -INF if score < INF else INF
+        return score - self.c * math.sqrt(2.0 * self.log_t / picks)
+
+    def _rescore(self, i, score):
+        self.tree.update(i, self._key(i))
+
+    def _refresh(self, log_t):
+        self.log_t = log_t
+        scores = np.array(self.scores)
+        bonus = self.c * np.sqrt(2.0 * log_t / np.maximum(self.picks, 1))
+        keys = np.where(self.picks == 0, np.where(np.isfinite(scores), -INF, INF), scores - bonus)
+        self.tree = RoutingIndex(keys.tolist())
+
+    def _choose(self):
+        log_t = math.log(max(self.total, 1))
+        if log_t > self.log_t * UCB_STALENESS ** 2:
+            self._refresh(log_t)
+        return self.tree.best()
+
+    def _picked(self, i):
+        self.tree.update(i, self._key(i))
+
+
+class Thompson(Policy):
+    """
+    Gaussian Thompson sampling: each server's score is treated as a noisy
+    estimate whose spread is its observed score variance, shrinking with
+    the number of picks; the lowest draw wins. observe() draws every
+    server once per round (O(n)) and keys the index on the draws; a pick
+    redraws only the picked server, so a decision is O(log n).
+    """
+
+    name = "thompson"
+
+    def __init__(self, servers, prior_sigma=0.1, **params):
+        super().__init__(servers)
+        n = len(self.servers)
+        self.prior_sigma = prior_sigma
+        self.count = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+
+    def observe(self, scores):
+        super().observe(scores)
+        # Welford update, finite scores only
+        x = np.asarray(scores, dtype=float)
+        ok = np.isfinite(x)
+        x = np.where(ok, x, self.mean)   # non-finite scores leave the stats as they are
+        self.count[ok] += 1
+        delta = x - self.mean
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += delta * (x - self.mean)
+
+        var = np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), self.prior_sigma ** 2)
+        sigma = np.sqrt(var + self.prior_sigma ** 2) / np.sqrt(self.picks + 1)
+        draws = np.array(self.scores) + sigma * np.random.standard_normal(len(self.scores))
+        self.tree = RoutingIndex(draws.tolist())
+
+    def _rescore(self, i, score):
+        pass   # observe() redraws every server
+
+    def _picked(self, i):
+        count = self.count[i]
+        var = self.m2[i] / (count - 1) if count > 1 else self.prior_sigma ** 2
+        sigma = math.sqrt((var + self.prior_sigma ** 2) / (self.picks[i] + 1))
+        self.tree.update(i, self.scores[i] + sigma * random.gauss(0.0, 1.0))
+
+
+class PowerOfTwo(Policy):
+    """Power of two random choices: sample two servers, keep the better one. O(1)."""
+
+    name = "p2c"
+
+    def _choose(self):
+        n = len(self.scores)
+        if n < 2:
+            return 0
+        a = random.randrange(n)
+        b = random.randrange(n - 1)
+        b += b >= a
+        return a if self.scores[a] <= self.scores[b] else b
+
+
+class LeastOutstanding(Policy):
+    """
+    Fewest in-flight requests, ties broken by score. The index is keyed
+    on (outstanding, score), so acquire/release are O(log n) and a
+    decision is O(1).
+    """
+
+    name = "least-outstanding"
+
+    def __init__(self, servers, **params):
+        super().__init__(servers)
+        self.tree = RoutingIndex([(0, INF)] * len(self.servers), pad=(INF, INF))
+
+    def _rescore(self, i, score):
+        self.tree.update(i, (self.outstanding[i], score))
+
+    def acquire(self, server):
+        super().acquire(server)
+        i = self.position[server]
+        self._rescore(i, self.scores[i])
+
+    def release(self, server):
+        super().release(server)
+        i = self.position.get(server)
+        if i is not None:
+            self._rescore(i, self.scores[i])
+
+
+POLICIES = {p.name: p for p in (EpsilonGreedy, Policy, UCB1, Thompson, PowerOfTwo, LeastOutstanding)}
+DEFAULT_POLICY = EpsilonGreedy.name
+
+
+def make_policy(name, servers, **params):
+    """Instantiate a policy by name; unknown parameters are ignored."""
+    try:
+        cls = POLICIES[name]
+    except KeyError:
+        raise ValueError(f"unknown policy {name!r}; choose from {', '.join(POLICIES)}") from None
+    return cls(servers, **params)
@@ -0,0 +1,133 @@
+# predictor.py
+# O(1) incremental replacement for the sklearn-based hybrid predictor in client.py
+
+from collections import deque
+
+HISTORY_SIZE = 10      # EWMA runs over the last HISTORY_SIZE samples
+PREDICT_WINDOW = 5     # least-squares fit over the last PREDICT_WINDOW samples
+SMOOTHING_ALPHA = 0.3
+REGRESSION_WEIGHT = 0.6
+REFRESH_EVERY = 1024   # recompute running sums to cancel float drift
+
+
+def exponential_smoothing(values, alpha=SMOOTHING_ALPHA):
+    if len(values) == 0: return None
+    if len(values) == 1: return float(values[0])
+    smoothed = values[0]
+    for v in values[1:]:
+        smoothed = alpha * v + (1 - alpha) * smoothed
+    return float(smoothed)
+
+
+def predict_with_regression(values, window=PREDICT_WINDOW):
+    """Ordinary least squares over the last `window` points, one step ahead."""
+    if len(values) == 0: return None
+    if len(values) == 1: return float(values[-1])
+    y = list(values)[-window:]
+    m = len(y)
+    sx = m * (m - 1) / 2.0
+    sxx = (m - 1) * m * (2 * m - 1) / 6.0
+    sy = sum(y)
+    sxy = sum(j * v for j, v in enumerate(y))
+    return float(_extrapolate(m, sx, sxx, sy, sxy))
+
+
+def hybrid_prediction(values):
+    smooth = exponential_smoothing(values)
+    regress = predict_with_regression(values)
+    if smooth is None or regress is None: return smooth or regress
+    return REGRESSION_WEIGHT * regress + (1 - REGRESSION_WEIGHT) * smooth
+
+
+def _extrapolate(m, sx, sxx, sy, sxy):
+    """Value of the least-squares line through x = 0..m-1 at x = m."""
+    slope = (m * sxy - sx * sy) / (m * sxx - sx * sx)
+    intercept = (sy - slope * sx) / m
+    return intercept + slope * m
+
+
+class HybridPredictor:
+    """
+    Streaming equivalent of hybrid_prediction() over a deque(maxlen=history_size).
+
+    Keeps running sums for the sliding-window least-squares fit and a
+    geometrically weighted sum for the windowed EWMA, so update() and
+    predict() are O(1) regardless of window size.
+    """
+
+    def __init__(self, history_size=HISTORY_SIZE, window=PREDICT_WINDOW,
+                 alpha=SMOOTHING_ALPHA):
+        self.history_size = history_size
+        self.window = window
+        self.alpha = alpha
+        self.decay = 1.0 - alpha
+        self.values = deque(maxlen=max(history_size, window))
+        self._reset_sums()
+        self._updates = 0
+
+    def _reset_sums(self):
+        # Regression: y_0..y_{m-1} over x = 0..m-1
+        self.m = 0
+        self.sy = 0.0
+        self.sxy = 0.0
+        # EWMA: sum of decay^(age) * v over the last history_size values
+        self.n = 0
+        self.weighted = 0.0
+
+    def __len__(self):
+        return min(len(self.values), self.history_size)
+
+    def update(self, value):
+        value = float(value)
+        values = self.values
+
+        # Sliding least-squares sums
+        if self.m == self.window:
+            oldest = values[-self.window]
+            self.sxy = self.sxy - (self.sy - oldest) + (self.m - 1) * value
+            self.sy += value - oldest
+        else:
+            self.sxy += self.m * value
+            self.sy += value
+            self.m += 1
+
+        # Windowed EWMA: drop the sample that falls out of the window
+        if self.n == self.history_size:
+            self.weighted -= self.decay ** (self.n - 1) * values[-self.history_size]
+        else:
+            self.n += 1
+        self.weighted = self.decay * self.weighted + value
+
+        values.append(value)
+        self._updates += 1
+        if self._updates % REFRESH_EVERY == 0:
+            self._refresh()
+
+    def _refresh(self):
+        recent = list(self.values)
+        y = recent[-self.window:]
+        self.m = len(y)
+        self.sy = sum(y)
+        self.sxy = sum(j * v for j, v in enumerate(y))
+        w = recent[-self.history_size:]
+        self.n = len(w)
+        self.weighted = sum(self.decay ** (self.n - 1 - i) * v for i, v in enumerate(w))
+
+    def smoothed(self):
+        if self.n == 0: return None
+        oldest = self.values[-self.n]
+        return self.alpha * self.weighted + self.decay ** self.n * oldest
+
+    def regression(self):
+        if self.m == 0: return None
+        if self.m == 1: return self.values[-1]
+        m = self.m
+        sx = m * (m - 1) / 2.0
+        sxx = (m - 1) * m * (2 * m - 1) / 6.0
+        return _extrapolate(m, sx, sxx, self.sy, self.sxy)
+
+    def predict(self):
+        smooth = self.smoothed()
+        regress = self.regression()
+        if smooth is None or regress is None: return smooth or regress
+        return REGRESSION_WEIGHT * regress + (1 - REGRESSION_WEIGHT) * smooth
@@ -3,10 +3,33 @@
 
 import time
 import socket
-import random
-import requests
 from urllib.parse import urlparse
 
+from dns_cache import resolver
+from http_probe import HttpProber, DEFAULT_MODE
+from protocol import PING, ConnectionPool, ProtocolError, parse_metrics, request
+
+TRIAL_TIMEOUT = 0.5
+HTTP_PROBE_MODE = DEFAULT_MODE   # "head", "range" (1-byte GET) or "get"; see http_probe
+AGENT_PORT = 9100        # metrics_agent.py on the target's host
+AGENT_TIMEOUT = 0.3
+AGENT_RETRY = 60.0       # seconds before asking an unreachable agent again
+PIN = "#"                # "<target>#<ip>": one resolved address of a named target
+
+# Stand-ins for fields nothing measured. Constant, so they never sway a
+# ranking; every result lists the fields it filled from here in "simulated".
+SIMULATED = {
+    "load": 35.0,
+    "health_score": 100,
+    "total_handled": 100,
+    "total_errors": 0,
+    "bandwidth_mbps": 600.0,
+}
+
+_agent_pool = ConnectionPool(timeout=AGENT_TIMEOUT)
+_http_prober = HttpProber(HTTP_PROBE_MODE, resolve=resolver.resolve)
+_agent_retry_at = {}
+
 
 def _parse_target(target: str):
     """
@@ -15,12 +38,14 @@ def _parse_target(target: str):
     - http://example.com
     - example.com
     - 127.0.0.1:8001
+    each optionally pinned to one of its addresses: example.com#93.184.215.14
     """
+    target = split_pin(target)[0]
     if "://" in target:
         parsed = urlparse(target)
         host = parsed.hostname
-        port = parsed.port or 443
         scheme = parsed.scheme
+        port = parsed.port or (80 if scheme == "http" else 443)
     else:
         if ":" in target:
             host, port = target.split(":")
@@ -34,66 +59,160 @@ def _parse_target(target: str):
     return host, port, scheme
 
 
-def _tcp_rtt(host, port, timeout=1.5):
-    start = time.time()
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+def split_pin(target: str):
+    """(target, pinned IP or None)."""
+    base, _, ip = target.partition(PIN)
+    return base, ip or None
+
+
+def target_address(target: str):
+    """(family, sockaddr) to connect to: the pinned IP, else the first cached resolution."""
+    base, ip = split_pin(target)
+    host, port, _ = _parse_target(base)
+    return resolver.resolve(ip or host, port)[0]
+
+
+async def target_address_async(target: str):
+    """target_address() for the proxy's event loop; never blocks on DNS."""
+    base, ip = split_pin(target)
+    host, port, _ = _parse_target(base)
+    return (await resolver.resolve_async(ip or host, port))[0]
+
+
+def expand_targets(targets):
+    """
+    Split every named target that resolves to several addresses into one
+    backend per address (target#ip), so each is probed and scored on its
+    own. IP literals, single-address names and names that do not resolve
+    are kept as they are. Returns (backends, {target: [ips]}).
+    """
+    backends, resolved = [], {}
+    for target in targets:
+        host, port, _ = _parse_target(target)
+        try:
+            ips = resolver.addresses(host, port)
+        except OSError:
+            ips = []
+        resolved[target] = ips
+        if len(ips) > 1 and split_pin(target)[1] is None:
+            backends.extend(f"{target}{PIN}{ip}" for ip in ips)
+        else:
+            backends.append(target)
+    return backends, resolved
+
+
+def _tcp_rtt(address, timeout=1.5):
+    family, sockaddr = address
+    start = time.perf_counter_ns()
+    s = socket.socket(family, socket.SOCK_STREAM)
     s.settimeout(timeout)
     try:
-        s.connect((host, port))
+        s.connect(sockaddr)
     finally:
         s.close()
-    return time.time() - start
+    return (time.perf_counter_ns() - start) / 1e9
+
+
+def _http_timing(target):
+    """Stage timings of one pooled HEAD/ranged-GET probe (see http_probe)."""
+    base, ip = split_pin(target)
+    url = base if "://" in base else f"https://{base}"
+    return _http_prober.probe(url, ip=ip)
 
 
-def _http_rtt(url, timeout=2.0):
-    start = time.time()
-    r = requests.get(url, timeout=timeout)
-    r.raise_for_status()
-    return time.time() - start
+def fetch_agent_metrics(host, port=AGENT_PORT):
+    """
+    Host metrics from a metrics_agent (framed protocol, pooled connection),
+    or None. An agent that did not answer is skipped for AGENT_RETRY s.
+    """
+    addr = (host, port)
+    if time.monotonic() < _agent_retry_at.get(addr, 0.0):
+        return None
+    s = None
+    try:
+        s, _ = _agent_pool.acquire(addr)
+        metrics = parse_metrics(request(s, PING))
+        _agent_pool.release(addr, s)
+        return metrics
+    except (OSError, ProtocolError, ValueError):
+        if s is not None:
+            _agent_pool.discard(s)
+        _agent_retry_at[addr] = time.monotonic() + AGENT_RETRY
+        return None
+
+
+def trial_probe(target: str, timeout=TRIAL_TIMEOUT) -> bool:
+    """
+    Cheap reachability check for a half-open circuit breaker: a bare TCP
+    connect, even for HTTP(S) targets. True if the server accepted.
+    """
+    try:
+        _tcp_rtt(target_address(target), timeout=timeout)
+        return True
+    except OSError:
+        return False
+
+
+def timeout_metrics(target: str) -> dict:
+    """
+    Metrics recorded for a server that failed or missed the round deadline.
+    """
+    return {
+        "rtt": None,
+        "load": SIMULATED["load"],
+        "health_score": 30,
+        "total_handled": 20,
+        "total_errors": 10,
+        "bandwidth_mbps": None,
+        "simulated": ["load", "health_score", "total_handled", "total_errors"],
+    }
 
 
 def probe_server(target: str) -> dict:
     """
     Returns a normalized metrics dictionary so app.py NEVER breaks.
+
+    RTT is always measured: the TCP connect time for host:port targets,
+    the time to first byte on a pooled connection for HTTP(S) ones, whose
+    DNS/connect/TLS/TTFB/total breakdown is under "timing". Load and
+    bandwidth come from the host's metrics agent when one answers; fields
+    filled from SIMULATED instead are listed under "simulated".
     """
 
     host, port, scheme = _parse_target(target)
 
-    # Defaults (safe)
-    rtt = None
-    load = random.uniform(10, 60)        # simulated CPU load
-    health_score = 100
-    total_handled = 100
-    total_errors = 0
-    bandwidth_mbps = random.uniform(300, 900)
-
     try:
+        address = target_address(target)
         if scheme in ("http", "https"):
-            rtt = _http_rtt(target)
+            timing = _http_timing(target)
+            rtt = timing["ttfb"]
         else:
-            rtt = _tcp_rtt(host, port)
+            rtt = _tcp_rtt(address)
+            timing = {"connect": rtt, "total": rtt}
 
     except Exception:
         # Server unreachable
-        rtt = None
-        health_score = 30
-        total_errors = random.randint(5, 15)
-        total_handled = max(total_errors + 1, 20)
-        bandwidth_mbps = random.uniform(50, 150)
+        return timeout_metrics(target)
+
+    agent = fetch_agent_metrics(address[1][0]) or {}
+    metrics = {"rtt": rtt, "timing": timing}
+    simulated = []
+    for field, default in SIMULATED.items():
+        value = agent.get(field)
+        if value is None:
+            value = default
+            simulated.append(field)
+        metrics[field] = value
 
     # Clamp values (important for ML stability)
-    load = max(0, min(load, 100))
-    health_score = max(0, min(health_score, 100))
-    bandwidth_mbps = max(10, bandwidth_mbps)
-
-    return {
-        "rtt": rtt,
-        "load": load,
-        "health_score": health_score,
-        "total_handled": total_handled,
-        "total_errors": total_errors,
-        "bandwidth_mbps": bandwidth_mbps
-    }
+    metrics["load"] = max(0, min(metrics["load"], 100))
+    metrics["health_score"] = max(0, min(metrics["health_score"], 100))
+    metrics["bandwidth_mbps"] = max(10, metrics["bandwidth_mbps"])
+    if agent:
+        metrics["agent"] = {k: agent[k] for k in ("loadavg", "cpu_count", "rx_mbps", "tx_mbps")
+                            if k in agent}
+    metrics["simulated"] = simulated
+    return metrics
 
 
 # Optional manual test
@@ -0,0 +1,60 @@
+# probe_engine.py
+# Concurrent probing engine shared by app.py and client.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DEFAULT_MAX_WORKERS = 64
+DEFAULT_DEADLINE = 1.0     # seconds; at most the default round interval
+
+
+class ProbeEngine:
+    """
+    Probes every target at the same time on a bounded thread pool.
+
+    A round lasts as long as its slowest probe, capped at the deadline.
+    Probes still running at the deadline are recorded as timeouts via
+    `on_timeout(target)` and finish in the background without blocking
+    the round.
+    """
+
+    def __init__(self, probe_fn, max_workers=DEFAULT_MAX_WORKERS, on_timeout=None):
+        self.probe_fn = probe_fn
+        self.on_timeout = on_timeout or (lambda target: None)
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="probe")
+        self.last_round_duration = 0.0
+        self.last_timeouts = []
+
+    def probe_all(self, targets, deadline=DEFAULT_DEADLINE, probe_fn=None, on_timeout=None):
+        """
+        Probe all targets concurrently; returns {target: result}. probe_fn
+        and on_timeout override the engine's own for this call.
+        """
+        probe_fn = probe_fn or self.probe_fn
+        on_timeout = on_timeout or self.on_timeout
+        start = time.perf_counter()
+        futures = {self.executor.submit(probe_fn, t): t for t in targets}
+        done, _ = wait(futures, timeout=deadline)
+
+        results = {}
+        timeouts = []
+        for fut, target in futures.items():
+            if fut in done:
+                try:
+                    results[target] = fut.result()
+                    continue
+                except Exception:
+                    pass
+            else:
+                fut.cancel()
+                timeouts.append(target)
+            results[target] = on_timeout(target)
+
+        self.last_round_duration = time.perf_counter() - start
+        self.last_timeouts = timeouts
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,114 @@
+# probe_scheduler.py
+# Per-server probe cadence under a global probe budget
+#
+# Instead of probing every server every round, each server gets its own
+# period between the base interval and max_interval. The period grows
+# with how far a server's score sits from the decision boundary, measured
+# in units of that server's own score noise: noisy servers and close
+# contenders are probed every round, stable clear winners and clear
+# losers rarely. Unreachable servers back off exponentially.
+
+import math
+
+DEFAULT_MAX_INTERVAL = 30.0
+MAX_BACKOFF_EXP = 6         # dead servers: interval * 2**k, k capped here
+NOISE_ALPHA = 0.3           # EWMA weight for each server's score mean/variance
+NOISE_FLOOR = 0.01          # score units; keeps a perfectly flat series from looking infinitely certain
+WARMUP_PROBES = 3           # probes every round until this many scores estimate the noise
+
+
+class ProbeScheduler:
+    """
+    Decides which servers to probe this round.
+
+    due() returns the servers whose period has elapsed, limited by the
+    probe budget (probes per second, None or 0 = unlimited); when the
+    budget is short the most overdue servers go first. reschedule() sets
+    each probed server's next probe from the round's scores.
+    """
+
+    def __init__(self, servers, interval, max_interval=DEFAULT_MAX_INTERVAL, budget=None):
+        self.servers = list(servers)
+        self.period = {s: interval for s in self.servers}
+        self.next_due = {s: -math.inf for s in self.servers}
+        self.failures = {s: 0 for s in self.servers}
+        self.samples = {s: 0 for s in self.servers}
+        self.mean = {}
+        self.var = {}
+        self._tokens = None
+        self._last = None
+        self.configure(interval, max_interval, budget)
+
+    def configure(self, interval, max_interval=DEFAULT_MAX_INTERVAL, budget=None):
+        self.interval = interval
+        self.max_interval = max(max_interval, interval)
+        self.budget = budget or None
+
+    def due(self, now, candidates=None):
+        """Servers to probe now, at most what the budget has accumulated."""
+        candidates = self.servers if candidates is None else candidates
+        due = [s for s in candidates if now >= self.next_due[s]]
+        if self.budget is None:
+            return due
+
+        # Token bucket: refills at `budget` per second, holds one round's worth
+        capacity = max(1.0, self.budget * self.interval)
+        if self._tokens is None:
+            self._tokens = capacity
+        else:
+            self._tokens = min(capacity, self._tokens + self.budget * (now - self._last))
+        self._last = now
+
+        take = int(self._tokens)
+        if len(due) > take:
+            # Most overdue relative to its own period first; never-probed servers lead
+            due.sort(key=lambda s: (now - self.next_due[s]) / self.period[s], reverse=True)
+            due = due[:take]
+        self._tokens -= len(due)
+        return due
+
+    def reschedule(self, now, probed, scores, failed=()):
+        """
+        Set the next probe time of each probed server. scores is {server:
+        score}; failed are the probed servers that did not answer.
+        """
+        failed = set(failed)
+        finite = sorted(v for s, v in scores.items() if math.isfinite(v) and s not in failed)
+        for s in probed:
+            score = scores.get(s, math.inf)
+            if s in failed or not math.isfinite(score):
+                self.failures[s] += 1
+                period = self.interval * 2 ** min(self.failures[s], MAX_BACKOFF_EXP)
+            else:
+                self.failures[s] = 0
+                noise = self._observe(s, score)
+                # Distance to the boundary: the leader is compared with the
+                # runner-up, everyone else with the leader
+                if self.samples[s] < WARMUP_PROBES:
+                    gap = 0.0
+                elif len(finite) < 2:
+                    gap = math.inf
+                elif score <= finite[0]:
+                    gap = finite[1] - score
+                else:
+                    gap = score - finite[0]
+                period = self.interval * max(1.0, gap / (noise + NOISE_FLOOR))
+            self.period[s] = min(period, self.max_interval)
+            self.next_due[s] = now + self.period[s]
+
+    def wake(self, server):
+        """Probe a server at the next round, e.g. after its breaker closed."""
+        self.next_due[server] = -math.inf
+        self.failures[server] = 0
+
+    def _observe(self, s, score):
+        """EWMA score mean and variance for one server; returns its standard deviation."""
+        self.samples[s] += 1
+        mean = self.mean.get(s)
+        if mean is None:
+            self.mean[s], self.var[s] = score, 0.0
+            return 0.0
+        diff = score - mean
+        self.mean[s] = mean + NOISE_ALPHA * diff
+        self.var[s] = (1 - NOISE_ALPHA) * (self.var[s] + NOISE_ALPHA * diff * diff)
+        return math.sqrt(self.var[s])
@@ -0,0 +1,144 @@
+# profiling.py
+# Stage timing and optional cProfile capture for monitoring rounds
+#
+# StageTimer splits a round into named stages. lap(stage, since) adds the
+# perf_counter_ns time since `since` to that stage's fixed-bucket
+# histogram and returns the new mark, so timing a stage costs one clock
+# read and one bisect. RoundProfiler runs cProfile over windows of
+# `every` rounds on the calling thread (probe workers are not included;
+# the pauses between rounds are not profiled) and writes one .prof file
+# per window, readable with pstats or snakeviz.
+
+import cProfile
+import io
+import math
+import os
+import pstats
+import time
+
+from exposition import Histogram, STAGE_BUCKETS
+
+NS = 1e9
+PROFILE_TOP = 15     # functions printed per profiled window
+
+
+class StageTimer:
+    """Per-stage Histograms plus the latest duration of each stage (seconds)."""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.last = {}
+
+    @staticmethod
+    def start():
+        return time.perf_counter_ns()
+
+    def lap(self, stage, since):
+        now = time.perf_counter_ns()
+        seconds = (now - since) / NS
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        self.last[stage] = seconds
+        return now
+
+    def state(self):
+        return {stage: h.state() for stage, h in self.histograms.items()}
+
+
+def quantile(q, state, buckets=STAGE_BUCKETS):
+    """
+    Estimated q-quantile of a Histogram state, interpolating linearly
+    inside the bucket (as Prometheus' histogram_quantile does).
+    """
+    counts, _, count = state
+    if not count:
+        return math.nan
+    rank = q * count
+    cumulative, lower = 0, 0.0
+    for bound, n in zip(buckets, counts):
+        if n and cumulative + n >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / n
+        cumulative += n
+        lower = bound
+    return buckets[-1]
+
+
+def breakdown(stages, last=None, buckets=STAGE_BUCKETS):
+    """
+    One row per stage from {stage: Histogram state}: count, last, mean,
+    p50 and p95 in seconds, and the stage's share of the mean round.
+    """
+    means = {stage: total / count if count else 0.0 for stage, (_, total, count) in stages.items()}
+    round_mean = sum(means.values()) or 1.0
+    return [{
+        "stage": stage,
+        "count": state[2],
+        "last": (last or {}).get(stage, math.nan),
+        "mean": means[stage],
+        "p50": quantile(0.5, state, buckets),
+        "p95": quantile(0.95, state, buckets),
+        "share": means[stage] / round_mean,
+    } for stage, state in stages.items()]
+
+
+def format_breakdown(stages, last=None):
+    """breakdown() as a text table (milliseconds)."""
+    lines = [f"{'Stage':<10} {'Rounds':>7} {'Last':>9} {'Mean':>9} {'p50':>9} {'p95':>9} {'Share':>7}"]
+    for row in breakdown(stages, last):
+        lines.append(f"{row['stage']:<10} {row['count']:>7} {row['last'] * 1000:>9.3f} "
+                     f"{row['mean'] * 1000:>9.3f} {row['p50'] * 1000:>9.3f} "
+                     f"{row['p95'] * 1000:>9.3f} {row['share']:>6.1%}")
+    return "\n".join(lines)
+
+
+class RoundProfiler:
+    """
+    cProfile over consecutive windows of `every` rounds. Call
+    round_started() / round_finished() around each round, on the thread
+    that runs it; every==0 disables profiling.
+    """
+
+    def __init__(self, every, directory="profiles", label="round"):
+        self.every = every
+        self.directory = directory
+        self.label = label
+        self._profile = None
+        self._first = None
+
+    def round_started(self, round_idx):
+        if not self.every:
+            return
+        if self._profile is None:
+            self._first = round_idx
+            self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def round_finished(self, round_idx):
+        profile = self._profile
+        if profile is None:
+            return
+        profile.disable()
+        if round_idx - self._first + 1 >= self.every:
+            self._profile = None
+            self._dump(profile, self._first, round_idx)
+
+    def close(self, round_idx):
+        """Write out a partial window (e.g. when the session stops)."""
+        profile = self._profile
+        if profile is not None:
+            profile.disable()
+            self._profile = None
+            if round_idx >= self._first:
+                self._dump(profile, self._first, round_idx)
+
+    def _dump(self, profile, first, last):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.label}-{first + 1:05d}-{last + 1:05d}.prof")
+        profile.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        print(f"[PROFILE] Rounds {first + 1}-{last + 1} -> {path}")
+        print(out.getvalue().strip())
@@ -0,0 +1,176 @@
+# protocol.py
+# Length-prefixed request/response framing between client.py and the edge servers
+#
+# Every message is a 4-byte big-endian length followed by the payload, so a
+# single TCP connection can carry many ping/metrics exchanges. A client that
+# sends the bare legacy b"ping" (no header) still gets one JSON reply and a
+# closed connection.
+#
+# The request payload picks the metrics encoding: PING gets JSON, PING_BINARY
+# gets a fixed 32-byte METRICS_RECORD whose first byte is its version.
+
+import json
+import math
+import socket
+import struct
+import asyncio
+import threading
+import time
+
+HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024
+LEGACY_PING = b"ping"
+PING = b"ping"
+PING_BINARY = b"ping/b1"
+IDLE_TIMEOUT = 60.0   # servers drop keep-alive connections idle this long
+
+# version, load, health_score, pad, active_connections, total_handled,
+# total_errors, queue_depth, iperf_port (0 = none), jitter, latency,
+# bandwidth_mbps (NaN = not reported)
+METRICS_VERSION = 1
+METRICS_RECORD = struct.Struct("!BBBxIIIHHfff")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(payload: bytes) -> bytes:
+    return HEADER.pack(len(payload)) + payload
+
+
+def frame_length(header: bytes) -> int:
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"frame of {length} bytes exceeds {MAX_FRAME_SIZE}")
+    return length
+
+
+def encode_metrics(m: dict) -> bytes:
+    """Pack a metrics dict (as built by the servers) into METRICS_RECORD."""
+    return METRICS_RECORD.pack(
+        METRICS_VERSION, int(m['load']), int(m['health_score']),
+        m['active_connections'], m['total_handled'], m['total_errors'], m['queue_depth'],
+        m.get('iperf_port', 0), m['jitter'], m.get('latency', 0.0),
+        m.get('bandwidth_mbps', math.nan))
+
+
+def decode_metrics(data: bytes) -> dict:
+    if len(data) != METRICS_RECORD.size or data[0] != METRICS_VERSION:
+        raise ProtocolError(f"unsupported metrics record (version {data[:1].hex() or '-'}, "
+                            f"{len(data)} bytes)")
+    (_, load, health, active, handled, errors, queue,
+     iperf_port, jitter, latency, bandwidth) = METRICS_RECORD.unpack(data)
+    m = {
+        'load': load,
+        'active_connections': active,
+        'total_handled': handled,
+        'total_errors': errors,
+        'queue_depth': queue,
+        'health_score': health,
+        'jitter': jitter,
+        'latency': latency,
+    }
+    if not math.isnan(bandwidth):
+        m['bandwidth_mbps'] = bandwidth
+    if iperf_port:
+        m['iperf_port'] = iperf_port
+    return m
+
+
+def parse_metrics(data: bytes) -> dict:
+    """Decode a metrics response in either encoding (JSON starts with '{')."""
+    if data[:1] == b"{":
+        return json.loads(data)
+    return decode_metrics(data)
+
+
+def recv_exact(sock, n):
+    """
+    Read exactly n bytes. Returns None if the peer closed before sending
+    anything, raises ConnectionError if it closed part-way through.
+    """
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            if not buf:
+                return None
+            raise ConnectionError("connection closed mid-frame")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock):
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        raise ConnectionError("connection closed by server")
+    payload = recv_exact(sock, frame_length(header))
+    if payload is None:
+        raise ConnectionError("connection closed mid-frame")
+    return payload
+
+
+def request(sock, payload: bytes) -> bytes:
+    """Send one framed request and wait for its framed response."""
+    sock.sendall(encode_frame(payload))
+    return recv_frame(sock)
+
+
+async def read_exact(reader, n, timeout=IDLE_TIMEOUT):
+    """asyncio counterpart of recv_exact."""
+    try:
+        return await asyncio.wait_for(reader.readexactly(n), timeout)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ConnectionError("connection closed mid-frame")
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive sockets per (host, port), reused across rounds.
+
+    acquire() returns (sock, handshake_rtt); handshake_rtt is None when an
+    existing connection was reused. Callers release() healthy sockets and
+    discard() ones that failed.
+    """
+
+    def __init__(self, timeout, max_idle=4):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, addr):
+        with self._lock:
+            idle = self._idle.get(addr)
+            if idle:
+                return idle.pop(), None
+
+        start = time.perf_counter()
+        sock = socket.create_connection(addr, timeout=self.timeout)
+        handshake_rtt = time.perf_counter() - start
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, handshake_rtt
+
+    def release(self, addr, sock):
+        with self._lock:
+            idle = self._idle.setdefault(addr, [])
+            if len(idle) < self.max_idle:
+                idle.append(sock)
+                return
+        sock.close()
+
+    def discard(self, sock):
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for socks in idle.values():
+            for s in socks:
+                self.discard(s)
@@ -0,0 +1,268 @@
+# proxy.py
+# Nexus proxy: forwards client connections to the backend the selector prefers
+#
+# Usage: python proxy.py 9000 127.0.0.1:8001 127.0.0.1:8002 127.0.0.1:8003
+#
+# A Collector keeps probing and scoring the backends in the background.
+# Every accepted connection is routed with the configured selection policy
+# (policies.py) and then relayed byte-for-byte in both directions on one
+# asyncio event loop. HTTP keep-alive connections stay pinned to the
+# backend chosen when they were accepted.
+#
+# Forwarded traffic doubles as passive telemetry: time-to-first-byte, total
+# time, bytes and failures of every connection are reported back to the
+# Collector, which then only actively probes backends without traffic.
+
+import argparse
+import asyncio
+import socket
+import time
+
+from collector import Collector
+from policies import POLICIES, DEFAULT_POLICY
+from probe import target_address_async
+from probe_engine import DEFAULT_DEADLINE
+from probe_scheduler import DEFAULT_MAX_INTERVAL
+
+HOST = '127.0.0.1'
+LISTEN_BACKLOG = 1024
+BUFFER_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 2.0
+STATS_INTERVAL = 10.0
+
+
+class ProxyStats:
+    """Counters for proxy throughput and the overhead it adds per connection."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.accepted = 0
+        self.active = 0
+        self.failed = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.route_ns = 0      # time spent choosing a backend
+        self.resolve_ns = 0    # time spent resolving it (cache misses only take long)
+        self.connect_ns = 0    # time spent connecting to backends
+        self.per_backend = {}
+
+    def snapshot(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        done = max(self.accepted, 1)
+        return {
+            "accepted": self.accepted,
+            "active": self.active,
+            "failed": self.failed,
+            "connections_per_sec": self.accepted / elapsed,
+            "avg_route_us": self.route_ns / done / 1e3,
+            "avg_resolve_us": self.resolve_ns / done / 1e3,
+            "avg_connect_us": self.connect_ns / done / 1e3,
+            "bytes_up": self.bytes_up,
+            "bytes_down": self.bytes_down,
+            "per_backend": dict(self.per_backend),
+        }
+
+
+class CollectorRouter:
+    """
+    Routes each new connection with the collector's policy over its latest
+    scores. Keeps its own policy instance, since per-connection decisions
+    and outstanding-request counts are separate from the per-round ones.
+    """
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.policy = None
+        self._servers = None
+        self._round = None
+
+    def __call__(self):
+        snap = self.collector.snapshot()
+        servers = snap["servers"]
+        if servers is not self._servers:   # new snapshot; the list compare is O(n)
+            if self.policy is None or self.policy.servers != servers:
+                self.policy = self.collector.make_policy(servers)
+                self._round = None
+            self._servers = servers
+        scores = snap["scores"]
+        if not scores:
+            return snap["servers"][0]
+        if snap["round"] != self._round:
+            # Once per round: only changed scores are re-keyed in the index
+            self.policy.observe([scores[s] for s in self.policy.servers])
+            self._round = snap["round"]
+        server = self.policy.select()
+        self.policy.acquire(server)
+        return server
+
+    def release(self, server):
+        if self.policy is not None:
+            self.policy.release(server)
+
+
+class Proxy:
+    """
+    Asyncio TCP relay. `route()` names the backend for each new connection
+    (and `route.release(target)`, if defined, is called when it closes);
+    `observe(target, connect, ttfb, total, nbytes, error)`, if given, receives one
+    passive sample per connection that carried a request.
+    """
+
+    def __init__(self, route, host=HOST, port=9000, buffer_size=BUFFER_SIZE, observe=None):
+        self.route = route
+        self.release = getattr(route, "release", None)
+        self.observe = observe
+        self.host = host
+        self.port = port
+        self.buffer_size = buffer_size
+        self.stats = ProxyStats()
+
+    async def serve(self, ready=None):
+        loop = asyncio.get_running_loop()
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(LISTEN_BACKLOG)
+        listener.setblocking(False)
+        self.port = listener.getsockname()[1]
+        if ready is not None:
+            ready.set()
+
+        try:
+            while True:
+                client, _ = await loop.sock_accept(listener)
+                loop.create_task(self.handle(client))
+        finally:
+            listener.close()
+
+    async def handle(self, client):
+        loop = asyncio.get_running_loop()
+        stats = self.stats
+        stats.accepted += 1
+        stats.active += 1
+        client.setblocking(False)
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        backend = target = None
+        try:
+            t0 = time.perf_counter_ns()
+            target = self.route()
+            t1 = time.perf_counter_ns()
+            # Pinned or literal address, or the resolver cache's current answer;
+            # a miss is resolved off the event loop
+            family, addr = await target_address_async(target)
+            t_resolved = time.perf_counter_ns()
+
+            backend = socket.socket(family, socket.SOCK_STREAM)
+            backend.setblocking(False)
+            backend.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            await asyncio.wait_for(loop.sock_connect(backend, addr), CONNECT_TIMEOUT)
+            t2 = time.perf_counter_ns()
+
+            stats.route_ns += t1 - t0
+            stats.resolve_ns += t_resolved - t1
+            stats.connect_ns += t2 - t_resolved
+            stats.per_backend[target] = stats.per_backend.get(target, 0) + 1
+
+            (sent, up_first), (received, down_first) = await asyncio.gather(
+                self._pipe(client, backend, "bytes_up"),
+                self._pipe(backend, client, "bytes_down"))
+            if self.observe is not None and sent:
+                # A request the backend never answered counts as an error
+                end = time.perf_counter_ns()
+                self.observe(target, (t2 - t_resolved) / 1e9,
+                             max(down_first - up_first, 0) / 1e9 if received else None,
+                             (end - up_first) / 1e9, sent + received, error=not received)
+        except (OSError, asyncio.TimeoutError):
+            stats.failed += 1
+            if self.observe is not None and target is not None:
+                self.observe(target, None, None, None, 0, error=True)
+        finally:
+            stats.active -= 1
+            if self.release is not None and target is not None:
+                self.release(target)
+            client.close()
+            if backend is not None:
+                backend.close()
+
+    async def _pipe(self, src, dst, counter):
+        """
+        Relay src -> dst through one reusable buffer, without per-chunk copies.
+        Returns (bytes relayed, perf_counter_ns of the first chunk or None).
+        """
+        loop = asyncio.get_running_loop()
+        buf = bytearray(self.buffer_size)
+        view = memoryview(buf)
+        total = 0
+        first = None
+        try:
+            while True:
+                n = await loop.sock_recv_into(src, buf)
+                if not n:
+                    break
+                if first is None:
+                    first = time.perf_counter_ns()
+                await loop.sock_sendall(dst, view[:n])
+                total += n
+        except OSError:
+            pass
+        finally:
+            setattr(self.stats, counter, getattr(self.stats, counter) + total)
+            try:
+                dst.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+        return total, first
+
+
+async def report_stats(proxy, collector):
+    while True:
+        await asyncio.sleep(STATS_INTERVAL)
+        s = proxy.stats.snapshot()
+        print(f"[PROXY {proxy.port}] {s['accepted']} conns ({s['connections_per_sec']:.1f}/s), "
+              f"{s['active']} active, {s['failed']} failed, "
+              f"route {s['avg_route_us']:.1f} us, resolve {s['avg_resolve_us']:.1f} us, "
+              f"connect {s['avg_connect_us']:.1f} us, "
+              f"backends {s['per_backend']}, probed {collector.snapshot()['probed']}")
+
+
+async def main_async(args):
+    collector = Collector(args.servers, rounds=None, interval=args.interval, deadline=args.deadline,
+                          policy=args.policy, eps=args.eps, anti_stick=args.anti_stick,
+                          max_probe_interval=args.max_probe_interval, probe_budget=args.probe_budget)
+    collector.start()
+    proxy = Proxy(CollectorRouter(collector), args.host, args.port,
+                  observe=collector.record_passive)
+    print(f"[PROXY {args.port}] Forwarding {args.host}:{args.port} -> {', '.join(args.servers)} "
+          f"({args.policy})")
+    asyncio.get_running_loop().create_task(report_stats(proxy, collector))
+    try:
+        await proxy.serve()
+    finally:
+        collector.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nexus forwarding proxy")
+    parser.add_argument("port", type=int)
+    parser.add_argument("servers", nargs="+", help="backends (URL or IP:PORT)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--interval", type=float, default=1.0, help="probe interval (seconds)")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE, help="probe round deadline (seconds)")
+    parser.add_argument("--max-probe-interval", type=float, default=DEFAULT_MAX_INTERVAL,
+                        help="longest gap between probes of a stable server (seconds)")
+    parser.add_argument("--probe-budget", type=float, default=None, help="probes per second, all servers")
+    parser.add_argument("--policy", choices=list(POLICIES), default=DEFAULT_POLICY)
+    parser.add_argument("--eps", type=float, default=0.2, help="exploration epsilon")
+    parser.add_argument("--anti-stick", type=float, default=0.03)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    try:
+        asyncio.run(main_async(parse_args(argv)))
+    except KeyboardInterrupt:
+        print("\n[PROXY] Shutting down")
+
+
+if __name__ == "__main__":
+    main()
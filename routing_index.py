@@ -0,0 +1,125 @@
+# routing_index.py
+# Incremental indexes over per-server keys for per-request routing decisions
+#
+# Both trees are flat arrays over a power-of-two number of leaves (padding
+# leaves never win), so an update walks one leaf-to-root path: O(log n).
+
+import random
+
+INF = float("inf")
+REFRESH_EVERY = 1 << 16   # SumTree updates between exact rebuilds (float drift)
+
+
+class RoutingIndex:
+    """
+    Tournament tree: every internal node holds the position of the smaller
+    of its two children's keys, so the overall minimum is always at the
+    root. best() is O(1), update() is O(log n). Keys can be anything
+    comparable (floats, or tuples such as (outstanding, score)); ties go
+    to the lower position.
+    """
+
+    def __init__(self, keys, pad=INF):
+        n = len(keys)
+        size = 1
+        while size < max(n, 1):
+            size *= 2
+        self.n = n
+        self.size = size
+        self.keys = list(keys) + [pad] * (size - n)
+        self.tree = [0] * size + list(range(size))
+        for node in range(size - 1, 0, -1):
+            self._play(node)
+
+    def _play(self, node):
+        tree, keys = self.tree, self.keys
+        left, right = tree[2 * node], tree[2 * node + 1]
+        tree[node] = left if keys[left] <= keys[right] else right
+
+    def update(self, i, key):
+        self.keys[i] = key
+        tree, keys = self.tree, self.keys
+        node = (i + self.size) >> 1
+        while node:
+            left, right = tree[2 * node], tree[2 * node + 1]
+            tree[node] = left if keys[left] <= keys[right] else right
+            node >>= 1
+
+    def best(self):
+        """Position of the minimum key."""
+        return self.tree[1]
+
+    def key(self, i):
+        return self.keys[i]
+
+    def runner_up(self, i):
+        """Position of the minimum key excluding position i: O(log n), read-only."""
+        tree, keys = self.tree, self.keys
+        best = None
+        node = i + self.size
+        while node > 1:
+            other = tree[node ^ 1]
+            if other < self.n and (best is None or keys[other] < keys[best]
+                                   or (keys[other] == keys[best] and other < best)):
+                best = other
+            node >>= 1
+        return best
+
+
+class SumTree:
+    """
+    Binary sum tree over non-negative weights: update() and weighted
+    sample() are both O(log n).
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        size = 1
+        while size < max(n, 1):
+            size *= 2
+        self.n = n
+        self.size = size
+        self.tree = [0.0] * size + list(weights) + [0.0] * (size - n)
+        self._rebuild()
+
+    def _rebuild(self):
+        tree = self.tree
+        for node in range(self.size - 1, 0, -1):
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+        self._updates = 0
+
+    def update(self, i, weight):
+        tree = self.tree
+        node = i + self.size
+        delta = weight - tree[node]
+        tree[node] = weight   # exact at the leaf; only the sums above drift
+        node >>= 1
+        while node:
+            tree[node] += delta
+            node >>= 1
+        self._updates += 1
+        if self._updates >= REFRESH_EVERY:
+            self._rebuild()
+
+    def total(self):
+        return self.tree[1]
+
+    def weight(self, i):
+        return self.tree[i + self.size]
+
+    def sample(self, rng=random.random):
+        """Position drawn with probability weight / total (None if all zero)."""
+        tree = self.tree
+        if tree[1] <= 0.0:
+            return None
+        x = rng() * tree[1]
+        node = 1
+        while node < self.size:
+            left = 2 * node
+            if x < tree[left]:
+                node = left
+            else:
+                x -= tree[left]
+                node = left + 1
+        i = node - self.size
+        return i if i < self.n else self.n - 1
@@ -0,0 +1,177 @@
+# scoring.py
+# Vectorized scoring: predictions, anomaly flags and scores for every server at once
+#
+# Metrics are passed structure-of-arrays style as (servers x window) float
+# matrices, oldest sample first and newest in the last column. Servers with
+# fewer samples than the window are left-padded with NaN.
+
+import numpy as np
+
+from predictor import SMOOTHING_ALPHA, PREDICT_WINDOW, REGRESSION_WEIGHT
+
+DEFAULT_WEIGHTS = {"alpha": 1.0, "beta": 0.5, "gamma": 0.3, "delta": 0.2, "epsilon": 0.4}
+ANOMALY_THRESHOLD = 2.0
+ANOMALY_PENALTY = 1.5
+OUTLIER_THRESHOLD = 3.0
+OUTLIER_MIN_SPREAD = 0.1   # peer spread floor, as a fraction of the peers' mean
+OUTLIER_MIN_GAP = 0.005    # seconds; smaller differences are never outliers
+OUTLIER_MIN_PEERS = 5      # peers a value is judged against; smaller fleets flag nothing
+
+
+def to_matrix(histories, servers, window):
+    """Build a (servers x window) matrix from per-server sequences; None -> NaN."""
+    out = np.full((len(servers), window), np.nan)
+    for i, server in enumerate(servers):
+        vals = list(histories[server])[-window:]
+        if vals:
+            out[i, window - len(vals):] = [np.nan if v is None else v for v in vals]
+    return out
+
+
+def mean_batch(matrix, fallback=np.nan):
+    """Row means ignoring NaN; rows with no samples get `fallback`."""
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=1)
+    sums = np.where(valid, matrix, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, fallback)
+
+
+def hybrid_predict_batch(matrix, alpha=SMOOTHING_ALPHA, window=PREDICT_WINDOW):
+    """
+    Row-wise predictor.hybrid_prediction: windowed EWMA over the whole row
+    blended with a one-step least-squares extrapolation over the last
+    `window` samples. Rows with no samples give NaN; gaps (NaN between
+    samples, e.g. rounds a server was not probed) are closed up first.
+    """
+    n_servers, width = matrix.shape
+    order = np.argsort(~np.isnan(matrix), axis=1, kind="stable")
+    matrix = np.take_along_axis(matrix, order, axis=1)
+    valid = ~np.isnan(matrix)
+    n = valid.sum(axis=1)
+    vals = np.where(valid, matrix, 0.0)
+    rows = np.arange(n_servers)
+
+    # EWMA: alpha * sum(decay^age * v) + decay^n * oldest
+    decay = 1.0 - alpha
+    ages = np.arange(width - 1, -1, -1)
+    weighted = vals @ (decay ** ages)
+    oldest = vals[rows, np.clip(width - n, 0, width - 1)]
+    smooth = alpha * weighted + decay ** n * oldest
+
+    # Least squares over x = 0..m-1, evaluated at x = m
+    window = min(window, width)
+    tail = vals[:, width - window:]
+    m = np.minimum(n, window).astype(float)
+    x = np.arange(window)[None, :] - (window - m)[:, None]
+    in_window = x >= 0
+    sy = np.where(in_window, tail, 0.0).sum(axis=1)
+    sxy = np.where(in_window, tail * x, 0.0).sum(axis=1)
+    sx = m * (m - 1) / 2.0
+    sxx = (m - 1) * m * (2 * m - 1) / 6.0
+    denom = m * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(denom > 0, (m * sxy - sx * sy) / np.where(denom > 0, denom, 1.0), 0.0)
+        regress = (sy - slope * sx) / m + slope * m
+
+    pred = REGRESSION_WEIGHT * regress + (1 - REGRESSION_WEIGHT) * smooth
+    return np.where(n > 0, pred, np.nan)
+
+
+def anomaly_batch(matrix, threshold=ANOMALY_THRESHOLD):
+    """Row-wise detect_anomaly: z-score of the newest sample against the rest."""
+    history, last = matrix[:, :-1], matrix[:, -1]
+    valid = ~np.isnan(history)
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, history, 0.0).sum(axis=1) / counts
+        var = np.where(valid, (history - mean[:, None]) ** 2, 0.0).sum(axis=1) / counts
+        z = np.abs(last - mean) / np.sqrt(var)
+        return (counts >= 2) & (var > 0) & ~np.isnan(last) & (z > threshold)
+
+
+def outlier_batch(values, threshold=OUTLIER_THRESHOLD, min_spread=OUTLIER_MIN_SPREAD,
+                  min_gap=OUTLIER_MIN_GAP, min_peers=OUTLIER_MIN_PEERS):
+    """
+    Across servers: flag each value more than `threshold` standard
+    deviations above the mean of the *other* servers (slow side only).
+    The spread is floored at min_spread * peer mean and a flagged value
+    must also exceed the peer mean by min_gap, so a tight fleet does not
+    flag a server for being a few percent or microseconds slower. NaN is
+    never flagged; with fewer than min_peers other valid values a handful
+    of peers cannot define "normal", so nothing is flagged.
+    """
+    values = np.asarray(values, dtype=float)
+    ok = ~np.isnan(values)
+    n = int(ok.sum())
+    if n - 1 < max(min_peers, 2):
+        return np.zeros(len(values), dtype=bool)
+    v = np.where(ok, values, 0.0)
+    peer_mean = (v.sum() - v) / (n - 1)
+    peer_var = np.maximum(((v * v).sum() - v * v) / (n - 1) - peer_mean ** 2, 0.0)
+    spread = np.maximum(np.sqrt(peer_var), min_spread * np.abs(peer_mean))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (v - peer_mean) / spread
+    return ok & (spread > 0) & (z > threshold) & (v - peer_mean > min_gap)
+
+
+def score_batch(pred_rtt, pred_load, pred_health, error_rate, pred_bandwidth,
+                alpha=1.0, beta=0.5, gamma=0.3, delta=0.2, epsilon=0.4):
+    """
+    Vectorized compute_score over 1-D arrays. Lower is better; a missing
+    RTT (NaN) scores inf, missing health or bandwidth take the full penalty.
+    """
+    pred_health = np.asarray(pred_health, dtype=float)
+    pred_bandwidth = np.asarray(pred_bandwidth, dtype=float)
+    health_penalty = np.where(np.isnan(pred_health), 1.0, (100 - pred_health) / 100.0)
+    with np.errstate(invalid="ignore"):
+        has_bandwidth = pred_bandwidth > 0
+    # Measured links can exceed the 1 Gbps scale (loopback does); cap the credit there
+    bandwidth_penalty = np.where(has_bandwidth, np.clip((1000 - pred_bandwidth) / 1000.0, 0.0, 1.0), 1.0)
+
+    score = (alpha * np.asarray(pred_rtt, dtype=float) +
+             beta * (np.asarray(pred_load, dtype=float) / 100.0) +
+             gamma * health_penalty +
+             delta * np.asarray(error_rate, dtype=float) +
+             epsilon * bandwidth_penalty)
+    return np.where(np.isnan(score), np.inf, score)
+
+
+def predict_batch(rtt, load, health, errors, bandwidth, predict="hybrid", rtt_fallback=np.nan):
+    """
+    Forecast every server's inputs to score_batch. predict="hybrid"
+    forecasts RTT, load and bandwidth with the hybrid predictor
+    (client.py); predict="mean" uses window means (dashboard). Health and
+    error rate are always window means.
+    """
+    forecast = hybrid_predict_batch if predict == "hybrid" else mean_batch
+    pred_rtt = forecast(rtt)
+    return {
+        "pred_rtt": np.where(np.isnan(pred_rtt), rtt_fallback, pred_rtt),
+        "pred_load": forecast(load),
+        "pred_health": mean_batch(health, fallback=50.0),
+        "error_rate": mean_batch(errors, fallback=0.0),
+        "pred_bandwidth": forecast(bandwidth),
+    }
+
+
+def score_predictions(pred, rtt, weights=None, anomaly_threshold=ANOMALY_THRESHOLD,
+                      anomaly_penalty=ANOMALY_PENALTY):
+    """Add 'anomaly' and 'score' to predict_batch's result (rtt is the RTT matrix)."""
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    anomaly = anomaly_batch(rtt, anomaly_threshold)
+    score = score_batch(pred["pred_rtt"], pred["pred_load"], pred["pred_health"],
+                        pred["error_rate"], pred["pred_bandwidth"], **weights)
+    return {**pred, "anomaly": anomaly, "score": np.where(anomaly, score * anomaly_penalty, score)}
+
+
+def evaluate(rtt, load, health, errors, bandwidth, weights=None, predict="hybrid",
+             rtt_fallback=np.nan, anomaly_threshold=ANOMALY_THRESHOLD,
+             anomaly_penalty=ANOMALY_PENALTY):
+    """
+    Score every server in one set of array operations: predict_batch then
+    score_predictions. Returns a dict of 1-D arrays aligned with the
+    matrix rows.
+    """
+    pred = predict_batch(rtt, load, health, errors, bandwidth, predict, rtt_fallback)
+    return score_predictions(pred, rtt, weights, anomaly_threshold, anomaly_penalty)
@@ -0,0 +1,115 @@
+# server_stats.py
+# Sharded server counters: no global lock on the request path
+#
+# Counters live in a (shards x fields) int64 table. Every thread adds into
+# its own shard, and every --workers process owns a disjoint range of
+# shards, so writers never contend across processes and rarely within one.
+# Readers sum the shards; a per-shard sequence number (seqlock) lets them
+# detect and re-read a shard caught mid-update, so a snapshot is always a
+# consistent set of completed requests.
+
+import itertools
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+FIELDS = ("load", "handled", "active", "errors", "queue")
+THREAD_SHARDS = 4    # shards per process; threads are assigned round-robin
+LOAD_MIN, LOAD_MAX = 2, 100
+
+_SEQ = 0             # column 0 of every shard row is its sequence number
+_COLUMNS = 1 + len(FIELDS)
+_INDEX = {f: 1 + i for i, f in enumerate(FIELDS)}
+_LOAD = _INDEX["load"]
+
+
+class ServerStats:
+    """
+    Sharded counters for one server (all of its worker processes).
+
+    add() applies a whole request's deltas to the calling thread's shard in
+    one step; snapshot() returns a consistent {field: total}; load() is a
+    cheap lock-free estimate for the latency/packet-loss simulation. Load
+    is the sum of the shards' load deltas, clamped on read. Process 0 is
+    the parent; workers attach() to 1..N.
+    """
+
+    def __init__(self, processes=1, shm=None):
+        self.shards = processes * THREAD_SHARDS
+        self.shm = shm
+        shape = (self.shards, _COLUMNS)
+        buf = shm.buf if shm is not None else bytearray(8 * self.shards * _COLUMNS)
+        # Same memory twice: NumPy for whole-table reads, a flat memoryview
+        # for the per-request writes (far cheaper than NumPy scalar ops)
+        self.table = np.ndarray(shape, dtype=np.int64, buffer=buf)
+        self.table[:] = 0
+        self._cells = memoryview(buf).cast("q")
+        self._load_cells = self._cells[_LOAD::_COLUMNS]
+        self.attach(0)
+
+    @classmethod
+    def shared(cls, processes):
+        """Counters in shared memory for `processes` forked workers."""
+        size = processes * THREAD_SHARDS * _COLUMNS * 8
+        return cls(processes, shared_memory.SharedMemory(create=True, size=size))
+
+    def attach(self, process):
+        """Bind this process to its own shard range (call once per worker)."""
+        self.first = process * THREAD_SHARDS
+        # Per-process: a lock per shard only serializes threads that share it
+        self.locks = [threading.Lock() for _ in range(THREAD_SHARDS)]
+        self._local = threading.local()
+        self._next = itertools.count()
+
+    def _shard(self):
+        local = self._local
+        try:
+            return local.shard
+        except AttributeError:
+            local.shard = next(self._next) % THREAD_SHARDS
+            return local.shard
+
+    def delta(self, **changes):
+        """Build a reusable delta for add()."""
+        return tuple((_INDEX[field], value) for field, value in changes.items())
+
+    def add(self, delta=(), load=0):
+        """Apply a delta (see delta()) plus a load change as one update."""
+        i = self._shard()
+        cells = self._cells
+        base = (self.first + i) * _COLUMNS
+        with self.locks[i]:
+            cells[base] += 1        # odd: update in progress
+            for column, value in delta:
+                cells[base + column] += value
+            if load:
+                cells[base + _LOAD] += load
+            cells[base] += 1        # even: update complete
+
+    def load(self):
+        """Current load, lock-free; may miss an update in flight."""
+        return min(LOAD_MAX, max(LOAD_MIN, sum(self._load_cells)))
+
+    def snapshot(self):
+        """Consistent totals: shards caught mid-update are re-read."""
+        rows = self.table.copy()
+        while True:
+            seq = self.table[:, _SEQ]
+            torn = (rows[:, _SEQ] & 1).astype(bool) | (rows[:, _SEQ] != seq)
+            if not torn.any():
+                break
+            rows[torn] = self.table[torn]
+        totals = rows[:, 1:].sum(axis=0).tolist()
+        out = dict(zip(FIELDS, totals))
+        out["load"] = min(LOAD_MAX, max(LOAD_MIN, out["load"]))
+        return out
+
+    def close(self):
+        if self.shm is not None:
+            self._load_cells.release()
+            self._cells.release()
+            self.table = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
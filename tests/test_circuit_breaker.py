@@ -0,0 +1,183 @@
+# tests/test_circuit_breaker.py
+# Breaker state machine (closed / open / half-open) and outlier ejection
+#
+# Run from the repository root: python -m pytest -q
+
+import math
+
+from circuit_breaker import (Breaker, CircuitBreakers, CLOSED, OPEN, HALF_OPEN,
+                             FAILURE_THRESHOLD, ERROR_WINDOW, BASE_EJECTION, MAX_EJECTION,
+                             HALF_OPEN_SUCCESSES)
+
+
+def tripped(now=0.0):
+    b = Breaker()
+    b.record(False, now, FAILURE_THRESHOLD)
+    return b
+
+
+def test_consecutive_failures_open_the_breaker():
+    b = Breaker()
+    for _ in range(FAILURE_THRESHOLD - 1):
+        b.record(False, 0.0)
+    assert b.state == CLOSED
+    b.record(False, 0.0)
+    assert b.state == OPEN
+    assert b.reason == f"{FAILURE_THRESHOLD} consecutive failures"
+    assert b.reopen_at == BASE_EJECTION
+
+
+def test_a_success_resets_the_failure_run():
+    b = Breaker()
+    for _ in range(5):
+        b.record(False, 0.0, FAILURE_THRESHOLD - 1)
+        b.record(True, 0.0, 5)
+    assert b.state == CLOSED
+
+
+def test_high_error_rate_opens_the_breaker():
+    b = Breaker()
+    for _ in range(5):
+        b.record(True, 0.0)
+        b.record(False, 0.0)
+    assert b.state == OPEN
+    assert b.reason.startswith("error rate")
+
+
+def test_outcomes_while_open_are_ignored():
+    b = tripped()
+    b.record(True, 1.0, 100)
+    assert b.state == OPEN
+    assert not b.half_open(BASE_EJECTION - 0.1)
+    assert b.state == OPEN
+
+
+def test_half_open_after_the_ejection_time():
+    b = tripped()
+    assert b.half_open(BASE_EJECTION)
+    assert b.state == HALF_OPEN
+
+
+def test_trial_successes_close_the_breaker():
+    b = tripped()
+    b.half_open(BASE_EJECTION)
+    for _ in range(HALF_OPEN_SUCCESSES - 1):
+        b.record(True, BASE_EJECTION)
+        assert b.state == HALF_OPEN
+    b.record(True, BASE_EJECTION + 1)
+    assert b.state == CLOSED
+    assert b.reason is None
+    assert b.closed_at == BASE_EJECTION + 1
+
+
+def test_failed_trial_reopens_for_twice_as_long():
+    b = tripped()
+    b.half_open(BASE_EJECTION)
+    b.record(False, 10.0)
+    assert b.state == OPEN
+    assert b.reason == "failed trial"
+    assert b.reopen_at == 10.0 + 2 * BASE_EJECTION
+
+
+def test_ejection_time_is_capped():
+    b = Breaker()
+    now = 0.0
+    for _ in range(20):
+        b.trip(now, "test")
+        now = b.reopen_at
+    b.trip(now, "test")
+    assert b.reopen_at - now == MAX_EJECTION
+
+
+def test_a_long_healthy_run_forgives_one_ejection():
+    b = tripped()
+    b.half_open(BASE_EJECTION)
+    b.record(True, BASE_EJECTION, HALF_OPEN_SUCCESSES)
+    assert b.ejections == 1
+    b.record(True, BASE_EJECTION, ERROR_WINDOW)
+    assert b.ejections == 0
+
+
+def test_breakers_report_trials_and_closing():
+    breakers = CircuitBreakers(["a", "b"])
+    breakers.record("a", False, 0.0, FAILURE_THRESHOLD)
+    assert breakers.ejected() == ["a"]
+    assert breakers.trials(1.0) == []
+    assert breakers.trials(BASE_EJECTION) == ["a"]
+    assert not breakers.record("a", True, BASE_EJECTION)
+    assert breakers.record("a", True, BASE_EJECTION)
+    assert breakers.closed("a")
+
+
+def test_small_fleets_are_never_judged_for_latency():
+    # Two peers cannot define "normal": ~30 % + 5 ms slower must not eject
+    breakers = CircuitBreakers(["a", "b", "c"])
+    assert breakers.eject_outliers([0.020, 0.021, 0.032], now=100.0) == []
+    assert breakers.ejected() == []
+
+
+def test_clear_latency_outlier_is_ejected():
+    servers = [f"s{i}" for i in range(7)]
+    breakers = CircuitBreakers(servers)
+    latencies = [0.020, 0.021, 0.019, 0.020, 0.022, 0.021, 0.200]
+    assert breakers.eject_outliers(latencies, now=100.0) == ["s6"]
+    assert breakers.breakers["s6"].state == OPEN
+    assert breakers.breakers["s6"].reason.startswith("latency outlier")
+
+
+def test_outlier_ejection_respects_the_ejected_fraction():
+    servers = [f"s{i}" for i in range(12)]
+    latencies = [0.020, 0.021, 0.019, 0.020, 0.022, 0.021, 0.200] + [math.nan] * 5
+
+    breakers = CircuitBreakers(servers)
+    for s in servers[7:]:
+        breakers.breakers[s].trip(0.0, "down")
+    assert breakers.eject_outliers(latencies, now=1.0) == ["s6"]
+
+    breakers = CircuitBreakers(servers)
+    for s in servers[6:]:
+        breakers.breakers[s].trip(0.0, "down")
+    latencies[5] = 0.200
+    assert breakers.eject_outliers(latencies, now=1.0) == []
+
+
+def test_recently_closed_servers_are_not_judged():
+    servers = [f"s{i}" for i in range(7)]
+    breakers = CircuitBreakers(servers)
+    breakers.breakers["s6"].closed_at = 95.0
+    latencies = [0.020, 0.021, 0.019, 0.020, 0.022, 0.021, 0.200]
+    assert breakers.eject_outliers(latencies, now=100.0, settle=10.0) == []
+    assert breakers.eject_outliers(latencies, now=105.0, settle=10.0) == ["s6"]
+
+
+def test_state_does_not_advance_the_breaker():
+    breakers = CircuitBreakers(["a"])
+    breakers.record("a", False, 0.0, FAILURE_THRESHOLD)
+    assert breakers.state("a") == {"state": OPEN, "reason": f"{FAILURE_THRESHOLD} consecutive failures"}
+    breakers.state("a")
+    assert breakers.breakers["a"].state == OPEN
+    assert breakers.trials(BASE_EJECTION) == ["a"]
+    assert breakers.state("a")["state"] == HALF_OPEN
+
+
+def test_busy_round_with_few_errors_stays_closed():
+    # 1 % errors over 300 proxied requests: neither a failure run nor a high error rate
+    breakers = CircuitBreakers(["a"])
+    for now in range(5):
+        breakers.record_batch("a", 297, 3, float(now))
+    assert breakers.state("a") == {"state": CLOSED, "reason": None}
+    breakers.record_batch("a", 90, 10, 5.0)
+    assert breakers.closed("a")
+    assert breakers.breakers["a"].error_rate() == 0.1
+
+
+def test_passive_round_without_successes_extends_the_failure_run():
+    breakers = CircuitBreakers(["a"])
+    breakers.record_batch("a", 0, FAILURE_THRESHOLD, 0.0)
+    assert breakers.state("a")["reason"] == f"{FAILURE_THRESHOLD} consecutive failures"
+
+
+def test_passive_error_rate_opens_the_breaker():
+    breakers = CircuitBreakers(["a"])
+    breakers.record_batch("a", 40, 60, 0.0)
+    assert breakers.state("a") == {"state": OPEN, "reason": "error rate 60%"}
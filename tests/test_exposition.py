@@ -0,0 +1,38 @@
+# tests/test_exposition.py
+# Histogram bucket labels in the Prometheus text and OpenMetrics renderings
+
+import re
+
+from collector import Collector
+from exposition import Histogram, RTT_BUCKETS, render
+
+LE = re.compile(r'nexus_round_rtt_seconds_bucket\{backend="[^"]+",le="([^"]+)"\} (\d+)')
+
+
+def rendered_buckets(openmetrics):
+    server = "127.0.0.1:1"
+    snap = Collector([server], rounds=1).snapshot()
+    rtt = Histogram(RTT_BUCKETS)
+    for value in (0.0007, 0.02, 0.02, 1.0, 3.0):
+        rtt.observe(value)
+    snap = {**snap, "stats": {**snap["stats"], "rtt": {server: rtt.state()}}}
+    return LE.findall(render(snap, openmetrics=openmetrics))
+
+
+def test_openmetrics_le_is_a_canonical_float():
+    buckets = rendered_buckets(openmetrics=True)
+    les = [le for le, _ in buckets]
+    assert les == [repr(float(b)) for b in RTT_BUCKETS] + ["+Inf"]
+    assert "1.0" in les and "1" not in les
+
+
+def test_prometheus_text_le_is_unchanged():
+    les = [le for le, _ in rendered_buckets(openmetrics=False)]
+    assert "1" in les and les[-1] == "+Inf"
+
+
+def test_bucket_counts_are_cumulative():
+    counts = [int(n) for _, n in rendered_buckets(openmetrics=True)]
+    assert counts == sorted(counts)
+    assert counts[-1] == 5
+    assert dict(zip(RTT_BUCKETS, counts))[1.0] == 4
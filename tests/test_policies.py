@@ -0,0 +1,55 @@
+# tests/test_policies.py
+# Indexed UCB1 and Thompson sampling against their brute-force definitions
+
+import math
+
+import numpy as np
+
+from policies import UCB1, Thompson, UCB_STALENESS, make_policy
+
+
+def ucb_bounds(policy):
+    bonus = policy.c * np.sqrt(2.0 * math.log(max(policy.total, 1)) / np.maximum(policy.picks, 1))
+    return np.array(policy.scores) - bonus
+
+
+def test_ucb1_tries_every_usable_server_first():
+    policy = UCB1([f"s{i}" for i in range(5)])
+    policy.observe([0.5, np.inf, 0.2, 0.9, 0.4])
+    assert [policy.select() for _ in range(4)] == ["s0", "s2", "s3", "s4"]
+
+
+def test_ucb1_pick_is_within_the_staleness_of_the_exact_bound():
+    rng = np.random.default_rng(1)
+    servers = [f"s{i}" for i in range(37)]
+    policy = UCB1(servers, ucb_c=0.3)
+    scores = rng.uniform(0.2, 1.5, len(servers))
+    policy.observe(scores)
+    for step in range(5000):
+        if step % 500 == 0:
+            scores = np.clip(scores + rng.normal(0, 0.05, len(scores)), 0.1, None)
+            policy.observe(scores)
+        bounds = ucb_bounds(policy)
+        picked = policy.position[policy.select()]
+        if policy.picks.min() > 1:
+            # Bonuses use a ln t at most UCB_STALENESS ** 2 behind the current one
+            slack = policy.c * math.sqrt(2.0 * math.log(policy.total)) * (1 - 1 / UCB_STALENESS)
+            assert bounds[picked] <= bounds.min() + slack + 1e-12
+
+
+def test_thompson_converges_on_the_best_server():
+    np.random.seed(0)
+    servers = [f"s{i}" for i in range(50)]
+    policy = Thompson(servers, prior_sigma=0.05)
+    scores = np.linspace(1.0, 2.0, len(servers))
+    picks = []
+    for _ in range(100):
+        policy.observe(scores)
+        picks += [policy.select() for _ in range(50)]
+    assert picks[-1000:].count("s0") > 800
+
+
+def test_thompson_never_picks_an_unusable_server():
+    policy = make_policy("thompson", ["a", "b", "c"])
+    policy.observe([np.inf, 0.5, np.nan])
+    assert {policy.select() for _ in range(200)} == {"b"}
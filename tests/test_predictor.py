@@ -0,0 +1,75 @@
+# tests/test_predictor.py
+# Streaming and batch predictors against the reference hybrid_prediction()
+
+import math
+from collections import deque
+
+import numpy as np
+
+from predictor import (HybridPredictor, hybrid_prediction, HISTORY_SIZE, REFRESH_EVERY,
+                       REGRESSION_WEIGHT)
+from scoring import hybrid_predict_batch
+
+RTOL = 1e-8
+
+
+def test_streaming_predictor_matches_the_reference():
+    rng = np.random.default_rng(4)
+    # A drifting walk well away from zero, so running sums accumulate error
+    series = 50.0 + np.cumsum(rng.normal(0.0, 1.0, 3 * REFRESH_EVERY + 100))
+    predictor = HybridPredictor()
+    history = deque(maxlen=HISTORY_SIZE)
+    for value in series.tolist():
+        predictor.update(value)
+        history.append(value)
+        expected = hybrid_prediction(list(history))
+        assert len(predictor) == len(history)
+        assert math.isclose(predictor.predict(), expected, rel_tol=RTOL, abs_tol=1e-12)
+
+
+def test_streaming_predictor_with_other_window_sizes():
+    rng = np.random.default_rng(5)
+    predictor = HybridPredictor(history_size=7, window=3, alpha=0.5)
+    history = deque(maxlen=7)
+    for value in rng.uniform(0.001, 0.2, REFRESH_EVERY + 50).tolist():
+        predictor.update(value)
+        history.append(value)
+        expected = (REGRESSION_WEIGHT * _regression(list(history)[-3:])
+                    + (1 - REGRESSION_WEIGHT) * _ewma(list(history), 0.5))
+        assert math.isclose(predictor.predict(), expected, rel_tol=RTOL)
+
+
+def test_empty_predictor_predicts_nothing():
+    assert HybridPredictor().predict() is None
+
+
+def test_batch_predictor_matches_the_reference_across_gaps():
+    rng = np.random.default_rng(6)
+    width = HISTORY_SIZE
+    matrix = rng.uniform(0.005, 0.3, (200, width))
+    # Unprobed rounds: random gaps, including leading, trailing and all-NaN rows
+    matrix[rng.random(matrix.shape) < 0.3] = np.nan
+    matrix[0] = np.nan
+    matrix[1, :-1] = np.nan
+    matrix[2, 1:] = np.nan
+    predictions = hybrid_predict_batch(matrix)
+    for row, got in zip(matrix, predictions):
+        values = row[~np.isnan(row)].tolist()
+        if not values:
+            assert np.isnan(got)
+        else:
+            assert math.isclose(got, hybrid_prediction(values), rel_tol=RTOL)
+
+
+def _ewma(values, alpha):
+    smoothed = values[0]
+    for v in values[1:]:
+        smoothed = alpha * v + (1 - alpha) * smoothed
+    return smoothed
+
+
+def _regression(y):
+    if len(y) == 1:
+        return y[0]
+    slope, intercept = np.polyfit(np.arange(len(y)), y, 1)
+    return intercept + slope * len(y)
@@ -0,0 +1,69 @@
+# tests/test_protocol.py
+# Metrics encodings: binary METRICS_RECORD round trips and the JSON fallback
+
+import json
+import math
+
+import pytest
+
+from protocol import (METRICS_RECORD, METRICS_VERSION, ProtocolError, decode_metrics,
+                      encode_metrics, parse_metrics)
+
+EDGE = {
+    'load': 47,
+    'active_connections': 3,
+    'total_handled': 120_345,
+    'total_errors': 17,
+    'queue_depth': 2,
+    'health_score': 53,
+    'jitter': 0.00412,
+    'latency': 0.0731,
+}
+IPERF = {**EDGE, 'iperf_port': 5201, 'bandwidth_mbps': 941.5}
+
+FLOATS = ('jitter', 'latency', 'bandwidth_mbps')   # sent as float32
+
+
+def assert_metrics_equal(got, expected):
+    assert got.keys() == expected.keys()
+    for key, value in expected.items():
+        if key in FLOATS:
+            assert math.isclose(got[key], value, rel_tol=1e-6)
+        else:
+            assert got[key] == value
+
+
+@pytest.mark.parametrize("metrics", [EDGE, IPERF], ids=["edge", "iperf"])
+def test_binary_round_trip(metrics):
+    data = encode_metrics(metrics)
+    assert len(data) == METRICS_RECORD.size
+    assert data[0] == METRICS_VERSION
+    assert_metrics_equal(parse_metrics(data), metrics)
+
+
+def test_missing_bandwidth_and_iperf_port_are_left_out():
+    # Bandwidth goes out as NaN and the iperf port as 0; neither comes back
+    data = encode_metrics(EDGE)
+    fields = METRICS_RECORD.unpack(data)
+    assert math.isnan(fields[-1])
+    assert fields[7] == 0
+    decoded = decode_metrics(data)
+    assert 'bandwidth_mbps' not in decoded
+    assert 'iperf_port' not in decoded
+
+
+def test_json_payload_is_parsed_as_json():
+    metrics = {**IPERF, 'simulated': False}
+    assert parse_metrics(json.dumps(metrics).encode()) == metrics
+
+
+def test_unknown_version_is_rejected():
+    data = bytearray(encode_metrics(EDGE))
+    data[0] = METRICS_VERSION + 1
+    with pytest.raises(ProtocolError):
+        parse_metrics(bytes(data))
+
+
+def test_truncated_record_is_rejected():
+    with pytest.raises(ProtocolError):
+        parse_metrics(encode_metrics(EDGE)[:-1])
@@ -0,0 +1,92 @@
+# tests/test_routing_index.py
+# RoutingIndex and SumTree against brute force after random incremental updates
+
+import random
+
+import numpy as np
+import pytest
+
+from routing_index import RoutingIndex, SumTree, INF, REFRESH_EVERY
+
+SIZES = [1, 2, 3, 5, 8, 13, 100]   # powers of two and not
+
+
+def brute_best(keys, exclude=None):
+    candidates = [i for i in range(len(keys)) if i != exclude]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda i: (keys[i], i))
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_best_and_runner_up_track_random_updates(n):
+    rng = random.Random(n)
+    keys = [rng.choice([rng.uniform(0, 1), INF]) for _ in range(n)]
+    index = RoutingIndex(keys)
+    for _ in range(500):
+        i = rng.randrange(n)
+        # Few distinct values, so ties are common; ties go to the lower position
+        keys[i] = rng.choice([round(rng.uniform(0, 1), 1), INF])
+        index.update(i, keys[i])
+        assert index.best() == brute_best(keys)
+        assert index.key(i) == keys[i]
+        j = rng.randrange(n)
+        assert index.runner_up(j) == brute_best(keys, exclude=j)
+
+
+def test_tuple_keys():
+    keys = [(0, 0.5), (0, 0.2), (1, 0.1)]
+    index = RoutingIndex(keys, pad=(INF, INF))
+    assert index.best() == 1
+    index.update(1, (2, 0.2))
+    assert index.best() == 0
+    assert index.runner_up(0) == 2
+
+
+@pytest.mark.parametrize("n", SIZES)
+def test_sum_tree_totals_track_random_updates(n):
+    rng = random.Random(n)
+    weights = [rng.uniform(0, 5) for _ in range(n)]
+    tree = SumTree(weights)
+    for _ in range(500):
+        i = rng.randrange(n)
+        weights[i] = rng.choice([0.0, rng.uniform(0, 5)])
+        tree.update(i, weights[i])
+        assert tree.weight(i) == weights[i]
+        assert tree.total() == pytest.approx(sum(weights), rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize("n", [3, 6, 11])
+def test_sum_tree_samples_in_proportion_to_weight(n):
+    rng = random.Random(n)
+    tree = SumTree([1.0] * n)
+    weights = [1.0] * n
+    for _ in range(200):
+        i = rng.randrange(n)
+        weights[i] = rng.choice([0.0, rng.uniform(0.5, 4.0)])
+        tree.update(i, weights[i])
+    if not sum(weights):
+        weights[0] = 1.0
+        tree.update(0, 1.0)
+
+    draws = 60_000
+    counts = np.bincount([tree.sample(rng.random) for _ in range(draws)], minlength=n)
+    expected = np.array(weights) / sum(weights) * draws
+    # Zero-weight positions are never drawn; the rest pass a chi-square test
+    assert not counts[expected == 0].any()
+    live = expected > 0
+    chi2 = (((counts[live] - expected[live]) ** 2) / expected[live]).sum()
+    assert chi2 < 3 * live.sum() + 30
+
+
+def test_sum_tree_with_no_weight_samples_nothing():
+    tree = SumTree([0.0] * 5)
+    assert tree.sample() is None
+
+
+def test_sum_tree_rebuild_keeps_the_total_exact():
+    tree = SumTree([0.0, 0.0, 0.0])
+    for k in range(REFRESH_EVERY + 1):
+        tree.update(k % 3, 0.1 * (k % 7))
+    expected = sum(tree.weight(i) for i in range(3))
+    assert tree.total() == pytest.approx(expected, rel=1e-12)
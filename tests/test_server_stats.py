@@ -0,0 +1,89 @@
+# tests/test_server_stats.py
+# Sharded counters: lock-free snapshots stay consistent under concurrent writers
+
+import multiprocessing
+import threading
+
+from server_stats import ServerStats, LOAD_MIN, LOAD_MAX, THREAD_SHARDS
+
+WRITERS = 2 * THREAD_SHARDS    # more threads than shards, so some share one
+REQUESTS = 5000
+ERROR_EVERY = 7
+
+
+def run_requests(stats, requests=REQUESTS, start=None):
+    if start is not None:
+        start.wait()
+    begin = stats.delta(handled=1, active=1, queue=1)
+    end = stats.delta(active=-1, queue=-1)
+    error = stats.delta(errors=1)
+    for i in range(requests):
+        stats.add(begin, load=3)
+        if i % ERROR_EVERY == 0:
+            stats.add(error)
+        stats.add(end, load=-3)
+
+
+def check_consistent(snap, writers):
+    # Every snapshot is a set of completed add()s: begin/end deltas move
+    # active and queue together, and no end is seen without its begin
+    assert 0 <= snap["active"] <= writers
+    assert snap["queue"] == snap["active"]
+    assert snap["handled"] >= snap["active"]
+    assert LOAD_MIN <= snap["load"] <= LOAD_MAX
+
+
+def check_totals(snap, writers):
+    assert snap["handled"] == writers * REQUESTS
+    assert snap["errors"] == writers * len(range(0, REQUESTS, ERROR_EVERY))
+    assert snap["active"] == snap["queue"] == 0
+
+
+def test_snapshots_are_consistent_under_concurrent_writers():
+    stats = ServerStats()
+    stats.add(load=30)
+    start = threading.Barrier(WRITERS + 1)
+    threads = [threading.Thread(target=run_requests, args=(stats, REQUESTS, start)) for _ in range(WRITERS)]
+    for t in threads:
+        t.start()
+    start.wait()
+    while True:
+        check_consistent(stats.snapshot(), WRITERS)
+        assert LOAD_MIN <= stats.load() <= LOAD_MAX
+        if not any(t.is_alive() for t in threads):
+            break
+    for t in threads:
+        t.join()
+    snap = stats.snapshot()
+    check_totals(snap, WRITERS)
+    assert snap["load"] == 30
+
+
+def test_load_is_clamped_on_read():
+    stats = ServerStats()
+    stats.add(load=500)
+    assert stats.load() == stats.snapshot()["load"] == LOAD_MAX
+    stats.add(load=-1000)
+    assert stats.load() == stats.snapshot()["load"] == LOAD_MIN
+
+
+def _worker(stats, process):
+    stats.attach(process)
+    run_requests(stats)
+
+
+def test_worker_processes_write_disjoint_shards():
+    ctx = multiprocessing.get_context("fork")
+    stats = ServerStats.shared(3)
+    try:
+        workers = [ctx.Process(target=_worker, args=(stats, p)) for p in (1, 2)]
+        for w in workers:
+            w.start()
+        while any(w.is_alive() for w in workers):
+            check_consistent(stats.snapshot(), len(workers))
+        for w in workers:
+            w.join()
+            assert w.exitcode == 0
+        check_totals(stats.snapshot(), len(workers))
+    finally:
+        stats.close()
@@ -0,0 +1,107 @@
+# throughput.py
+# Built-in bandwidth test: a streaming endpoint and the matching client
+#
+# The client sends the number of bytes it wants (8-byte big-endian). The
+# server answers with the number it will send, then streams them from a
+# preallocated file with socket.sendfile (zero-copy where the OS allows).
+# Tests are served one at a time, so measurements never overlap on a
+# server; the client starts its clock at the reply header, so time spent
+# queued behind another test is not counted.
+
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+from protocol import recv_exact
+
+REQUEST = struct.Struct("!Q")
+DEFAULT_TEST_BYTES = 4 * 1024 * 1024
+MAX_TEST_BYTES = 64 * 1024 * 1024
+CHUNK_BYTES = 1024 * 1024        # size of the preallocated payload file
+RECV_BUFFER = 256 * 1024
+TEST_TIMEOUT = 5.0
+
+
+def _mbps(nbytes, seconds):
+    return nbytes * 8 / max(seconds, 1e-9) / 1e6
+
+
+class ThroughputServer:
+    """
+    Serves throughput tests on its own port from a background thread.
+    last_mbps is the throughput of the most recent completed test, timed
+    on the server from the first byte sent until the client closed.
+    """
+
+    def __init__(self, host, port, max_bytes=MAX_TEST_BYTES):
+        self.host = host
+        self.port = port
+        self.max_bytes = max_bytes
+        self.last_mbps = None
+        self.last_test_at = None
+        self.tests = 0
+        self._payload = tempfile.TemporaryFile()
+        self._payload.write(bytes(CHUNK_BYTES))
+        self._payload.flush()
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen(16)
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            conn, _ = self._sock.accept()
+            try:
+                self._run_test(conn)
+            except (OSError, ConnectionError):
+                pass
+            finally:
+                conn.close()
+
+    def _run_test(self, conn):
+        conn.settimeout(TEST_TIMEOUT)
+        request = recv_exact(conn, REQUEST.size)
+        if request is None:
+            return
+        (wanted,) = REQUEST.unpack(request)
+        count = min(wanted, self.max_bytes)
+        conn.sendall(REQUEST.pack(count))
+
+        start = time.perf_counter()
+        remaining = count
+        while remaining:
+            n = min(remaining, CHUNK_BYTES)
+            conn.sendfile(self._payload, offset=0, count=n)
+            remaining -= n
+        conn.recv(1)    # returns once the client has read everything and closed
+        self.last_mbps = _mbps(count, time.perf_counter() - start)
+        self.last_test_at = time.time()
+        self.tests += 1
+
+
+def measure_throughput(host, port, nbytes=DEFAULT_TEST_BYTES, timeout=TEST_TIMEOUT):
+    """
+    Download `nbytes` from a ThroughputServer and return the achieved
+    throughput in Mbps. Raises OSError/ConnectionError on failure.
+    """
+    with socket.create_connection((host, port), timeout=timeout) as s:
+        s.sendall(REQUEST.pack(nbytes))
+        header = recv_exact(s, REQUEST.size)
+        if header is None:
+            raise ConnectionError("throughput server closed the connection")
+        (count,) = REQUEST.unpack(header)
+
+        view = memoryview(bytearray(RECV_BUFFER))
+        received = 0
+        start = time.perf_counter()
+        while received < count:
+            n = s.recv_into(view)
+            if not n:
+                raise ConnectionError("throughput test ended early")
+            received += n
+        return _mbps(received, time.perf_counter() - start)